@@ -1,17 +1,21 @@
 import os
-import gzip
-import time
 
 from hashlib import blake2b
-from threading import Lock, current_thread
+import multiprocessing as mp
+
+from threading import Condition, Lock, current_thread
 from pathlib import Path
-from contextlib import nullcontext, contextmanager
+from contextlib import nullcontext, contextmanager, closing
 from collections.abc import Iterator
 from collections import defaultdict
+from itertools import chain
 from abc import abstractmethod, ABC
 from typing import Union, Dict, TypeVar, Iterable, Optional, Callable, Generic, Sequence, ContextManager
 
 from coba.exceptions import CobaException
+from coba.primitives import Dense, Sparse
+from coba.utilities import peek_first
+from coba.pipes import RowBlockSink, RowBlockSource, Codec, GzipCodec, detect_codec
 
 _K = TypeVar("_K")
 _V = TypeVar("_V")
@@ -86,16 +90,29 @@ class MemoryCacher(Cacher[_K, _V]):
 class DiskCacher(Cacher[str, Iterable[str]]):
     """A cacher that writes to disk.
 
-    The DiskCacher compresses all values before writing to conserve disk space.
+    The DiskCacher compresses all lines of text before writing to conserve disk space.
+    Values which are parsed rows (i.e., Dense or Sparse) are written in a binary block
+    format instead. Those are memory-mapped when read so that they never need parsing.
+
+    Remarks:
+        The codec used to compress can be set in a .coba config file. For example,
+        { "cacher": { "DiskCacher": { "cache_dir": "~/.cache/coba", "codec": { "GzipCodec": 1 } } } }.
+        Cached files are read with whatever codec they were written with so changing
+        the codec does not invalidate an existing cache. For the same reason cached lines
+        are always written to files with a .gz suffix, even when the codec isn't gzip. The
+        suffix is only kept for backwards compatibility; the codec is detected from the
+        leading bytes of a file when it is read.
     """
 
-    def __init__(self, cache_dir: Union[str, Path]) -> None:
+    def __init__(self, cache_dir: Union[str, Path], codec: Codec = None) -> None:
         """Instantiate a DiskCacher.
 
         Args:
             cache_dir: The directory path where all given keys will be cached as files
+            codec: The codec used to compress cached lines (gzip at level 6 by default).
         """
         self.cache_directory = cache_dir
+        self._codec = codec or GzipCodec()
 
     @property
     def cache_directory(self) -> Optional[str]:
@@ -109,14 +126,15 @@ class DiskCacher(Cacher[str, Iterable[str]]):
         self._cache_dir = str(cache_dir)
 
     def __contains__(self, key: str) -> bool:
-        return self._cache_path(key).exists()
+        return self._cache_path(key).exists() or self._rows_path(key).exists()
 
     def rmv(self, key: str) -> None:
         if self._cache_path(key).exists(): self._cache_path(key).unlink()
+        if self._rows_path(key).exists(): self._rows_path(key).unlink()
 
     def get_set(self, key: str, getter: Union[Callable[[], Iterable[str]],Iterable[str]]) -> ContextManager[Iterable[str]]:
 
-        if key in self and os.path.getsize(self._cache_path(key)) == 0:
+        if key in self and any(p.exists() and os.path.getsize(p) == 0 for p in [self._cache_path(key),self._rows_path(key)]):
             self.rmv(key)
 
         if key not in self:
@@ -125,48 +143,70 @@ class DiskCacher(Cacher[str, Iterable[str]]):
                 if isinstance(lines,str): lines = [lines]
                 Path(self._cache_dir).expanduser().mkdir(parents=True, exist_ok=True)
 
-                with gzip.open(self._cache_path(key), "wt+", 6, "utf-8") as f:
-                    for line in lines:
-                        f.write(line.rstrip('\r\n'))
-                        f.write('\n')
+                first,lines = peek_first(lines)
+
+                if isinstance(first,(Dense,Sparse)):
+                    RowBlockSink(self._rows_path(key)).write(lines)
+                else:
+                    with self._codec.open(self._cache_path(key), "wt") as f:
+                        for line in lines:
+                            f.write(line.rstrip('\r\n'))
+                            f.write('\n')
             except:
                 if key in self:
                     self.rmv(key)
                 raise
 
-        return gzip.open(self._cache_path(key),mode='rt',encoding='utf-8')
+        if self._rows_path(key).exists():
+            return closing(RowBlockSource(self._rows_path(key)).read())
+
+        #cached lines are always compressed so a file without a known codec has been corrupted
+        return (detect_codec(self._cache_path(key)) or self._codec).open(self._cache_path(key), 'rt')
 
     def _cache_name(self, key: str) -> str:
         if not all(c.isalnum() or c in (' ','.','_') for c in key):
             raise CobaException(f"A key was given to DiskCacher which couldn't be made into a file, {key}")
+        #the suffix doesn't follow the codec so that files written by other codecs are still found
         return f"{key}.gz"
 
     def _cache_path(self, key: str) -> Path:
         return Path(self._cache_dir).expanduser()/self._cache_name(key)
 
+    def _rows_path(self, key: str) -> Path:
+        return self._cache_path(key).with_suffix('.rows')
+
 class ConcurrentCacher(Cacher[_K, _V]):
-    """A cacher that is multiprocess safe."""
+    """A cacher that is multiprocess safe.
+
+    Remarks:
+        Read/write locks are tracked per key in a shared open-addressed table whose
+        slots hold a 64-bit hash of the key and its lock state. Waiting on a lock
+        blocks on a shared condition which is notified every time a lock is released.
+    """
 
-    def __init__(self, cache:Cacher[_K, _V], list: Sequence = None, lock: Lock = None):
+    def __init__(self, cache:Cacher[_K, _V], list: Sequence = None, lock: Condition = None):
         """Instantiate a ConcurrentCacher.
 
         Args:
             cache: Base cacher to make read/write safe across multiple processes.
-            list: Shared memory object that allows tracking of read/write locks.
-            lock: Synchronization object to be used to ensure read/write safety.
+            list: Shared memory object that allows tracking of read/write locks. Every
+                lock takes two 64-bit entries (the key's hash and the lock's state).
+            lock: Synchronization object to be used to ensure read/write safety. A
+                Condition is expected but a Lock will be wrapped in a Condition.
         """
-        self._digest_size = 2
+        self._digest_size = 8
 
         self._cache = cache
-        self._lock  = lock or Lock()
-        self._array = list or [0]*2**(8*self._digest_size)
+        self._lock  = self._condition(lock)
+        self._array = list or [0]*2**15
+        self._slots = len(self._array)//2
 
         self._write_waits = 0 # for testing purposes only. won't be accurate in production.
         self._read_waits  = 0 # for testing purposes only. won't be accurate in production.
 
         self._locks = defaultdict(int) # for safety to make sure our current process/thread isn't waiting on itself
 
-        assert len(self._array) >= 2**(8*self._digest_size)
+        assert self._slots > 0
 
     def __contains__(self, key: _K) -> bool:
         return key in self._cache
@@ -216,50 +256,49 @@ class ConcurrentCacher(Cacher[_K, _V]):
     def _acquire_read_lock(self, key):
         if self._has_write_lock(key):
             raise CobaException("The concurrent cacher was asked to enter an unrecoverable state.")
-        index = self._index(key)
-        self._read_waits += 1
-        while True:
-            with self._lock:
-                if self._array[index] >= 0:
-                    self._locks[(current_thread().ident,key)] += 1
-                    self._array[index] += 1
-                    self._read_waits -= 1
-                    break
-            time.sleep(1)
+        with self._lock:
+            self._read_waits += 1
+            while True:
+                index = self._index(key)
+                if index is not None and self._array[index] >= 0: break
+                self._lock.wait()
+            self._locks[(current_thread().ident,key)] += 1
+            self._array[index] += 1
+            self._read_waits -= 1
 
     def _release_read_lock(self, key):
-        index = self._index(key)
         with self._lock:
-            self._array[index] -= 1
+            self._array[self._index(key)] -= 1
             self._locks[(current_thread().ident,key)] -= 1
+            self._lock.notify_all()
 
     def _acquire_write_lock(self, key) -> ContextManager:
         if self._has_write_lock(key) or self._has_read_lock(key):
             raise CobaException("The concurrent cacher was asked to enter an unrecoverable state.")
-        index = self._index(key)
-        self._write_waits += 1
-        while True:
-            with self._lock:
-                if self._array[index] == 0:
-                    self._locks[(current_thread().ident,key)] = -1
-                    self._array[index] = -1
-                    self._write_waits -= 1
-                    break
-            time.sleep(1)
+        with self._lock:
+            self._write_waits += 1
+            while True:
+                index = self._index(key)
+                if index is not None and self._array[index] == 0: break
+                self._lock.wait()
+            self._locks[(current_thread().ident,key)] = -1
+            self._array[index] = -1
+            self._write_waits -= 1
 
     def _release_write_lock(self, key):
-        index = self._index(key)
         with self._lock:
-            self._array[index] = 0
+            self._array[self._index(key)] = 0
             self._locks[(current_thread().ident,key)] = 0
+            self._lock.notify_all()
 
     def _switch_write_to_read_lock(self, key) -> None:
-        index = self._index(key)
-        assert self._array[index] == -1, "You don't have write permissions"
-        assert self._locks[(current_thread().ident,key)] == -1, "You don't have write permissions"
         with self._lock:
+            index = self._index(key)
+            assert self._array[index] == -1, "You don't have write permissions"
+            assert self._locks[(current_thread().ident,key)] == -1, "You don't have write permissions"
             self._array[index] = 1
             self._locks[(current_thread().ident,key)] = 1
+            self._lock.notify_all()
 
     def _has_read_lock(self, key) -> bool:
         return self._locks[(current_thread().ident,key)] > 0
@@ -267,5 +306,33 @@ class ConcurrentCacher(Cacher[_K, _V]):
     def _has_write_lock(self, key) -> bool:
         return self._locks[(current_thread().ident,key)] == -1
 
-    def _index(self, key) -> int:
-        return int.from_bytes(blake2b(str(key).encode('utf-8'),digest_size=self._digest_size).digest(),"big")
+    def _index(self, key) -> Optional[int]:
+        """Find (or claim) the state index of a key's lock. This must be called while holding the lock.
+
+        Returns:
+            The index of the key's state in the shared array or None if every slot is in use.
+        """
+        #zero marks a slot that has never been used so we never let a hash be zero
+        hash  = int.from_bytes(blake2b(str(key).encode('utf-8'),digest_size=self._digest_size).digest(),"big",signed=True) or 1
+        array = self._array
+        start = hash % self._slots
+        free  = None
+
+        for slot in chain(range(start,self._slots),range(start)):
+            if array[2*slot] == hash: return 2*slot+1
+            if array[2*slot] == 0:
+                if free is None: free = slot
+                break
+            if free is None and array[2*slot+1] == 0: free = slot
+
+        #probing stops at the first unused slot so a slot that is no longer locked can be reclaimed
+        if free is None: return None
+        array[2*free] = hash
+        return 2*free+1
+
+    @staticmethod
+    def _condition(lock) -> Condition:
+        if lock is None: return Condition()
+        if hasattr(lock,'notify_all'): return lock
+        if isinstance(lock,type(Lock())): return Condition(lock)
+        return mp.get_context("spawn").Condition(lock)
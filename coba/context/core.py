@@ -4,7 +4,7 @@ import collections
 import traceback
 
 from pathlib import Path
-from typing import Iterable, Dict, Any, Sequence, Union, Literal
+from typing import Iterable, Dict, Any, Sequence, Union, Literal, Optional
 
 from coba.exceptions import CobaException
 from coba.registry import JsonMakerV1, CobaRegistry
@@ -35,12 +35,31 @@ class ExperimentConfig:
     These can be overridden directly calling `config` on an Experiment.
     """
 
-    def __init__(self, processes:int, maxchunksperchild:int, maxtasksperchunk:int, chunk_by: Literal["source","task"]):
+    def __init__(self, processes:int, maxchunksperchild:int, maxtasksperchunk:int, chunk_by: Literal["source","task"], affinity: bool = False):
         """Instantiate an ExperimentConfig."""
         self.processes        : int                      = processes
         self.maxchunksperchild: int                      = maxchunksperchild
         self.maxtasksperchunk : int                      = maxtasksperchunk
         self.chunk_by         : Literal["source","task"] = chunk_by
+        self.affinity         : bool                     = affinity
+
+def _memory_size(value: Union[None,int,str]) -> Optional[int]:
+    #memory sizes can be given as a number of bytes or as a string such as "8GB"
+    units = {'B':1, 'KB':2**10, 'MB':2**20, 'GB':2**30, 'TB':2**40}
+
+    if value is None or isinstance(value,int) and not isinstance(value,bool) and value > 0:
+        return value
+
+    if isinstance(value,str):
+        number = value.strip().upper().rstrip('BKMGT ')
+        unit   = value.strip().upper()[len(number):].strip() or 'B'
+        unit   = unit if unit.endswith('B') else unit + 'B'
+        try:
+            if unit in units and float(number) > 0: return int(float(number)*units[unit])
+        except ValueError:
+            pass
+
+    raise CobaException(f"Invalid cache_memory: {value}. A positive number of bytes or a string such as '8GB' was expected.")
 
 class CobaContext_meta(type):
     """Global execution context.
@@ -52,6 +71,7 @@ class CobaContext_meta(type):
     _cacher        = None
     _logger        = None
     _experiment    = None
+    _cache_memory  = None
     _search_paths  = [Path.home(), Path.cwd(), Path(sys.path[0])]
     _store         = {}
     _learning_info = {}
@@ -101,7 +121,8 @@ class CobaContext_meta(type):
                     "api_keys"  : collections.defaultdict(lambda:None),
                     "cacher"    : { "DiskCacher": "~/.cache/coba"},
                     "logger"    : { "IndentLogger": "Console" },
-                    "experiment": { "processes": 1, "maxchunksperchild": 0, "maxtasksperchunk":0, "chunk_by": "source" }
+                    "experiment": { "processes": 1, "maxchunksperchild": 0, "maxtasksperchunk":0, "chunk_by": "source", "affinity": False },
+                    "cache_memory": None
                 }
 
                 for key,value in cls._load_file_configs().items():
@@ -119,7 +140,8 @@ class CobaContext_meta(type):
                     'api_keys'  : _raw_config['api_keys'],
                     'cacher'    : JsonMakerV1(CobaRegistry.registry).make(_raw_config['cacher']),
                     'logger'    : JsonMakerV1(CobaRegistry.registry).make(_raw_config['logger']),
-                    'experiment': ExperimentConfig(**_raw_config['experiment'])
+                    'experiment': ExperimentConfig(**_raw_config['experiment']),
+                    'cache_memory': _memory_size(_raw_config['cache_memory'])
                 }
             except CobaException as e:
                 messages = [
@@ -191,6 +213,22 @@ class CobaContext_meta(type):
         cls._experiment = cls._experiment if cls._experiment else cls._config['experiment']
         return cls._experiment
 
+    @property
+    def cache_memory(cls) -> Optional[int]:
+        """Global memory budget (in bytes) shared by every Cache in a process.
+
+        Remarks:
+            When caches hold more than this the least recently used are spilled to temporary
+            files. These can be set as a number of bytes or as a string such as "8GB". When
+            None (the default) caches are never spilled.
+        """
+        cls._cache_memory = cls._cache_memory if cls._cache_memory is not None else cls._config['cache_memory']
+        return cls._cache_memory
+
+    @cache_memory.setter
+    def cache_memory(cls, value: Union[None,int,str]) -> None:
+        cls._cache_memory = _memory_size(value)
+
     @property
     def search_paths(cls) -> Sequence[Path]:
         """Global search paths for config files."""
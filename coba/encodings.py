@@ -1,7 +1,5 @@
 """This module contains utility classes for transforming data between encodings."""
 
-import time
-
 from numbers import Number
 from abc import ABC, abstractmethod
 from collections import Counter, OrderedDict, defaultdict
@@ -9,6 +7,7 @@ from itertools import count, accumulate, chain
 from typing import Iterator, Sequence, Generic, TypeVar, Any, Tuple, Union, Mapping
 
 from coba.exceptions import CobaException
+from coba.utilities import PackageChecker
 from coba.primitives import Sparse, Dense, Categorical
 
 _T_out = TypeVar('_T_out', bound=Any, covariant=True)
@@ -305,15 +304,12 @@ class InteractionsEncoder:
         str_interactions = [i for i in interactions if isinstance(i,str)   ]
         num_interactions = [i for i in interactions if isinstance(i,Number)]
 
-        self.times       = [0,0,0,0]
-        self.n           = 0
         self._constant   = sum(num_interactions)
         self._cross_pows = OrderedDict(zip(interactions,map(OrderedDict,map(Counter,str_interactions))))
         self._ns_max_pow = { n:int(max(p.get(n,0) for p in self._cross_pows.values())) for n in set(''.join(str_interactions)) }
+        self._pow_plans  = {}
 
     def encode(self, **ns_raw_values: Union[str, float, Sequence[Union[str,float]], Mapping[Union[str,int],Union[str,float]]]) -> Union[Sequence[float], Mapping[str,float]]:
-        self.n+= 1
-
         ns_raw_values = { k:v if v is not None else [] for k,v in ns_raw_values.items() }
 
         is_str = lambda v: isinstance(v,str)
@@ -334,53 +330,130 @@ class InteractionsEncoder:
         def handle_str(v: Mapping[str,Union[str,float]]) -> Mapping[str,float]:
             return { (f"{x}{y}" if is_str(y) else x):(1 if is_str(y) else y) for x,y in v.items() }
 
-        start = time.time()
         if is_sparse:
             ns_values = { ns:handle_str(make_dict(V))            for ns,V in ns_raw_values.items() if ns in self._ns_max_pow }
             ns_values = { ns:{f"{ns}{k}":v for k,v in V.items()} for ns,V in ns_values.items()     if ns in self._ns_max_pow }
         else:
             ns_values = { ns:make_list(v) for ns,v in ns_raw_values.items() if ns in self._ns_max_pow}
-        self.times[0] += time.time()-start
 
         pows = self._pows
         cross = self._cross
 
         if is_sparse:
-            start = time.time()
             key_pows = { ns: pows(list(ns_values[ns].keys()  ), max_pow) for ns, max_pow in self._ns_max_pow.items() }
             val_pows = { ns: pows(list(ns_values[ns].values()), max_pow) for ns, max_pow in self._ns_max_pow.items() }
-            self.times[1] += time.time()-start
 
-            start = time.time()
             key_crosses = [ cross(key_pows, cross_pow) for cross_pow in self._cross_pows.values() ]
             val_crosses = [ cross(val_pows, cross_pow) for cross_pow in self._cross_pows.values() ]
-            self.times[2] += time.time()-start
 
-            start = time.time()
             encoded = dict(zip(chain.from_iterable(key_crosses), chain.from_iterable(val_crosses)))
-            self.times[3] += time.time()-start
 
             if self._constant: encoded['const'] = self._constant
 
             return encoded
 
         else:
-            start = time.time()
             val_pows = { ns: pows(ns_values[ns], max_pow) for ns, max_pow in self._ns_max_pow.items() }
-            self.times[1] += time.time()-start
 
-            start = time.time()
             val_crosses = [ cross(val_pows, cross_pow) for cross_pow in self._cross_pows.values() ]
-            self.times[2] += time.time()-start
 
-            start = time.time()
             encoded = sum(val_crosses,[])
-            self.times[3] += time.time()-start
 
             if self._constant: encoded = [self._constant] + encoded
 
             return encoded
 
+    def encodes(self, batch: str = 'a', **ns_raw_values: Union[float, Sequence[float]]) -> 'np.ndarray':
+        """Encode many rows of dense values into a matrix.
+
+        Args:
+            batch: The namespace whose value is a sequence with one entry per row (e.g., actions).
+            ns_raw_values: The dense values for every namespace. Namespaces other than
+                `batch` are shared by every row (e.g., the context).
+
+        Returns:
+            A matrix whose i-th row equals `encode` given the i-th value of `batch`. Terms
+            that don't include `batch` are only calculated once and shared by every row.
+        """
+        PackageChecker.numpy("InteractionsEncoder.encodes")
+        import numpy as np
+
+        as_list = lambda v: [] if v is None else v if isinstance(v,Dense) else [v]
+
+        rows   = ns_raw_values.pop(batch)
+        arrays = { ns: np.array(as_list(v),dtype=float) for ns,v in ns_raw_values.items() }
+
+        arrays[batch] = np.array([as_list(row) for row in rows],dtype=float).reshape(len(rows),-1)
+
+        return self.encodes_arrays(**arrays)
+
+    def encodes_arrays(self, **ns_values: 'np.ndarray') -> 'np.ndarray':
+        """Encode arrays of dense values.
+
+        Args:
+            ns_values: An array for every namespace whose last axis holds the namespace's values.
+                The leading axes of the arrays are broadcast against each other (e.g., contexts
+                with shape (n,1,d) and actions with shape (n,k,e) give an (n,k,f) array).
+
+        Returns:
+            An array whose last axis holds the values `encode` would return for that position.
+        """
+        PackageChecker.numpy("InteractionsEncoder.encodes_arrays")
+        import numpy as np
+
+        ns_values = { ns: np.asarray(v,dtype=float) for ns,v in ns_values.items() }
+        shape     = np.broadcast_shapes(*[v.shape[:-1] for v in ns_values.values()])
+
+        ns_pows = { ns: self._pows_array(ns_values[ns], max_pow) for ns, max_pow in self._ns_max_pow.items() }
+        crosses = [ self._cross_array(ns_pows, cross_pow) for cross_pow in self._cross_pows.values() ]
+
+        if self._constant: crosses = [np.full(1,float(self._constant))] + crosses
+        if not crosses: crosses = [np.empty(0)]
+
+        return np.concatenate([ np.broadcast_to(c, shape+c.shape[-1:]) for c in crosses ], axis=-1)
+
+    def _pows_array(self, values: 'np.ndarray', degree: int) -> Sequence['np.ndarray']:
+        #The vectorized equivalent of _pows. Every monomial is calculated in the exact
+        #same order as _pows (i.e., value*term) so the two give identical floats.
+        import numpy as np
+
+        terms = [np.ones(values.shape[:-1]+(1,))]
+
+        for d in range(1,degree+1):
+            first, rest = self._pow_plan(values.shape[-1], d)
+            terms.append(values[...,first]*terms[d-1][...,rest])
+
+        return terms
+
+    def _pow_plan(self, n_values: int, degree: int) -> Tuple['np.ndarray','np.ndarray']:
+        #Plans are the indexes of the values and lower degree terms multiplied together
+        #by _pows. These only depend on the number of values so we only build them once.
+        key = (n_values,degree)
+
+        if key not in self._pow_plans:
+            import numpy as np
+
+            starts, length = [1]*n_values, 1
+            for d in range(1,degree+1):
+                first = [ i for i,s in zip(range(n_values),starts) for _ in range(s-1,length) ]
+                rest  = [ j for _,s in zip(range(n_values),starts) for j in range(s-1,length) ]
+                self._pow_plans[(n_values,d)] = (np.array(first,dtype=int), np.array(rest,dtype=int))
+                starts = list(accumulate(starts[:1]+starts[-1:]+starts[1:-1]))
+                length = len(first)
+
+        return self._pow_plans[key]
+
+    def _cross_array(self, ns_pows: Mapping[str,Sequence['np.ndarray']], cross_pow: Mapping[str,int]) -> 'np.ndarray':
+        #The vectorized equivalent of _cross. Rows are along the first axis of any batched namespace.
+        values = [ ns_pows[ns][p] for ns,p in cross_pow.items() ]
+        cross  = values[0]
+
+        for vs in values[1:]:
+            cross = cross[...,:,None]*vs[...,None,:]
+            cross = cross.reshape(cross.shape[:-2]+(cross.shape[-2]*cross.shape[-1],))
+
+        return cross
+
     def _pows(self, values: Sequence[Union[str,float]], degree):
         #WARNING: This function has been extremely optimized. Please baseline performance before and after making any changes.
         #WARNING: You can find three existing performance tests in test_performance.
@@ -4,10 +4,10 @@ from coba.environments.core       import Environments
 from coba.environments.filters    import Shuffle, Take, Identity, Reservoir, Riffle, Cache
 from coba.environments.filters    import Slice, Sort, Scale, Cycle, Impute, Flatten, Params
 from coba.environments.filters    import Binary, Densify, Sparsify, Where, Noise, Grounded, OpeRewards
-from coba.environments.filters    import Repr, Finalize, Unbatch, Batch, BatchSafe, Chunk, Logged
+from coba.environments.filters    import Repr, Finalize, Finalized, Unbatch, Batch, BatchSafe, Chunk, Logged
 
 from coba.environments.synthetics import LambdaSimulation, LinearSyntheticSimulation, NeighborsSyntheticSimulation
 from coba.environments.synthetics import KernelSyntheticSimulation, MLPSyntheticSimulation, BanditSyntheticSimulation
-from coba.environments.openml     import OpenmlSimulation, OpenmlSource
+from coba.environments.openml     import OpenmlSimulation, OpenmlSource, OpenmlPrefetcher
 from coba.environments.supervised import SupervisedSimulation, CsvSource, ArffSource, LibSvmSource, ManikSource
 from coba.environments.results    import ResultEnvironment
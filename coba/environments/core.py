@@ -19,7 +19,7 @@ from coba.multiprocessing import CobaMultiprocessor
 from coba.results         import Result, Missing
 
 from coba.environments.templates  import EnvironmentsTemplateV1, EnvironmentsTemplateV2
-from coba.environments.openml     import OpenmlSimulation
+from coba.environments.openml     import OpenmlSimulation, OpenmlPrefetcher
 from coba.environments.synthetics import LinearSyntheticSimulation, NeighborsSyntheticSimulation, BanditSyntheticSimulation
 from coba.environments.synthetics import KernelSyntheticSimulation, MLPSyntheticSimulation, LambdaSimulation
 from coba.environments.supervised import SupervisedSimulation
@@ -617,15 +617,15 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
         return Environments([Pipes.join(env,make_dense()) for env in self._envs])
 
     @overload
-    def shuffle(self, seed: int = 1) -> 'Environments':
+    def shuffle(self, seed: int = 1, *, max_items: int = None) -> 'Environments':
         ...
 
     @overload
-    def shuffle(self, seeds: Iterable[int]) -> 'Environments':
+    def shuffle(self, seeds: Iterable[int], *, max_items: int = None) -> 'Environments':
         ...
 
     @overload
-    def shuffle(self, *, n:int) -> 'Environments':
+    def shuffle(self, *, n:int, max_items: int = None) -> 'Environments':
         ...
 
     def shuffle(self, *args,**kwargs) -> 'Environments':
@@ -638,6 +638,8 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
                 the only difference is the order of interactions.
             n: The number of shuffling orders to produce. Equivalent
                 to `shuffle(seeds=range(n))`.
+            max_items: The maximum number of interactions to hold in memory
+                while shuffling. Any more are spilled to temporary files.
 
         Returns:
             An Environments object.
@@ -650,10 +652,19 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
         else:
             seeds = flat(kwargs.get('seed',kwargs.get('seeds',args)))
 
+        max_items = kwargs.get('max_items')
+
         if seeds != 0 and not seeds: seeds = [1]
         if isinstance(seeds,int): seeds = [seeds]
 
-        shuffled = self.filter([Shuffle(seed) for seed in seeds])
+        envs = self
+
+        if len(seeds) > 1 and max_items is None:
+            #Every shuffle reads from a single shared cache. Once
+            #the cache is full shuffles only permute indexes into it.
+            envs = Environments([env if isinstance(env[-1],pipes.Cache) else Pipes.join(env,Cache(25)) for env in self._envs])
+
+        shuffled = envs.filter([Shuffle(seed,max_items) for seed in seeds])
 
         #Experience has shown that most of the time we want to sort.
         #This doesn't change the experiment results. It simply makes it
@@ -757,7 +768,8 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
         shift: Union[float,Literal["min","mean","med"]] = "min",
         scale: Union[float,Literal["minmax","std","iqr","maxabs"]] = "minmax",
         targets:Literal["context"] = "context",
-        using: Optional[int] = None) -> 'Environments':
+        using: Optional[int] = None,
+        stream: bool = False) -> 'Environments':
         """Scale and shift features.
 
         Args:
@@ -765,6 +777,8 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
             scale: The statistic to use to scale each context feature.
             target: The target data we wish to scale in the environment.
             using: The number of interactions to use when calculating statistics.
+            stream: Indicates that statistics should be estimated in a single pass without holding
+                interactions in memory. Each interaction is scaled with the statistics seen so far.
 
         Remarks:
             For example, `scale('mean', 'std')` would standardize all context features
@@ -775,13 +789,14 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
             An Environments object.
         """
         if isinstance(targets,str): targets = [targets]
-        for t in targets: self = self.filter(Scale(shift, scale, t, using))
+        for t in targets: self = self.filter(Scale(shift, scale, t, using, stream))
         return self
 
     def impute(self,
         stats: Union[Literal["mean","median","mode"],Sequence[Literal["mean","median","mode"]]] = "mean",
         indicator:bool = True,
-        using: Optional[int] = None) -> 'Environments':
+        using: Optional[int] = None,
+        stream: bool = False) -> 'Environments':
         """Impute missing data.
 
         Args:
@@ -790,6 +805,8 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
                 be applied for different types.
             indicator: Indicates whether a binary feature should be added for missingness.
             using: The number of interactions to use to calculate imputation statistics.
+            stream: Indicates that statistics should be estimated in a single pass without holding
+                interactions in memory. Each missing value is imputed with the statistics seen so far.
 
         Returns:
             An Environments object.
@@ -797,7 +814,7 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
         if isinstance(stats,str): stats = [stats]
         envs = self
         for stat in stats:
-            envs = self.filter(Impute(stat, indicator, using))
+            envs = self.filter(Impute(stat, indicator, using, stream))
         return envs
 
     def where(self,*,
@@ -1052,6 +1069,22 @@ class Environments(collections.abc.Sequence, Sequence[Environment]):
         """
         return Environments([Pipes.join(env,Cache(25)) for env in self._envs])
 
+    def prefetch(self, max_workers: int = 3) -> 'Environments':
+        """Download and cache all openml sources before any environments are read.
+
+        Args:
+            max_workers: The maximum number of openml sources to download at the same time.
+
+        Remarks:
+            Downloads are written to CobaContext.cacher so prefetching does nothing if
+            caching has been turned off (i.e., the cacher is a NullCacher).
+
+        Returns:
+            The same Environments object.
+        """
+        OpenmlPrefetcher(max_workers).prefetch(self._envs)
+        return self
+
     def filter(self, filter: Union[EnvironmentFilter,Sequence[EnvironmentFilter]]) -> 'Environments':
         """Apply custom filter to Environments.
 
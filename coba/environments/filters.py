@@ -7,8 +7,8 @@ from math import isnan
 from statistics import median, stdev, mode, fmean
 from numbers import Number
 from zlib import crc32
-from operator import eq, methodcaller, itemgetter
-from collections import defaultdict
+from operator import eq, add, mul, methodcaller, itemgetter
+from collections import defaultdict, deque
 from functools import lru_cache
 from itertools import islice, chain, tee, compress, repeat
 from typing import Optional, Sequence, Union, Iterable, Any, Tuple, Callable, Mapping, Literal
@@ -17,10 +17,11 @@ from coba              import pipes, primitives
 from coba.context      import CobaContext
 from coba.random       import CobaRandom
 from coba.exceptions   import CobaException
-from coba.statistics   import iqr
+from coba.statistics   import iqr, OnlineVariance, OnlineQuantile
 from coba.utilities    import peek_first, PackageChecker, try_else, minimize
-from coba.primitives   import is_batch, Learner, Interaction, EnvironmentFilter, BinaryReward, DiscreteReward
+from coba.primitives   import is_batch, Learner, Interaction, Environment, EnvironmentFilter, BinaryReward, DiscreteReward
 from coba.pipes        import Pipes, SparseDense
+from coba.pipes.filters import _memory
 from coba.safety       import SafeLearner
 
 class Identity(pipes.Identity, EnvironmentFilter):
@@ -39,7 +40,11 @@ class Shuffle(pipes.Shuffle, EnvironmentFilter):
     """Shuffle interaction order."""
 
     def filter(self, interactions: Iterable[Interaction]) -> Sequence[Interaction]:
-        first, interactions = peek_first(interactions)
+        if isinstance(interactions, Sequence):
+            #we don't peek at sequences so that shuffles can share them
+            first = interactions[0] if interactions else None
+        else:
+            first, interactions = peek_first(interactions)
 
         if not interactions:
             yield from []
@@ -73,10 +78,55 @@ class Reservoir(pipes.Reservoir, EnvironmentFilter):
     pass
 
 class Cache(pipes.Cache, EnvironmentFilter):
-    """Cache given interactions."""
+    """Cache given interactions.
+
+    Remarks:
+        Interactions are stored as tuples of values that share a tuple of keys. These take
+        less than half the memory of dicts. A new dict is made every time an interaction is
+        read so filters after the cache are free to modify the interactions they are given.
+        Once every interaction is cached they are returned as a read-only sequence.
+    """
+
+    class Records(Sequence[Interaction]):
+        """A read-only sequence of cached interactions."""
+
+        def __init__(self, records: Sequence[tuple], unpack: Callable[[tuple],Interaction]) -> None:
+            self._records = records
+            self._unpack  = unpack
+
+        def __len__(self) -> int:
+            return len(self._records)
+
+        def __getitem__(self, index: int) -> Interaction:
+            if isinstance(index,slice): return list(map(self._unpack,self._records[index]))
+            return self._unpack(self._records[index])
+
+        def __iter__(self) -> Iterable[Interaction]:
+            return map(self._unpack,self._records)
+
+    def __init__(self, n_slice: int = 25, protected: bool = False) -> None:
+        super().__init__(n_slice, protected)
+        self._keys = {}
 
     def filter(self, items: Iterable[Interaction]) -> Iterable[Interaction]:
-        yield from map(methodcaller('copy'), super().filter(items))
+        if self._iter is None and self._cache is not None:
+            #spilled caches have no list so they are streamed from disk instead
+            _memory.touch(self)
+            return Cache.Records(self._cache, self._unpack)
+        return self._filter(items)
+
+    def _filter(self, items: Iterable[Interaction]) -> Iterable[Interaction]:
+        if self._empty:
+            items = map(self._pack,items)
+        yield from map(self._unpack, super().filter(items))
+
+    def _pack(self, interaction: Interaction) -> tuple:
+        keys = tuple(interaction)
+        keys = self._keys.setdefault(keys,keys)
+        return (keys, *interaction.values())
+
+    def _unpack(self, record: tuple) -> Interaction:
+        return dict(zip(record[0],record[1:]))
 
 class Scale(EnvironmentFilter):
     """Scale and shift features."""
@@ -85,7 +135,8 @@ class Scale(EnvironmentFilter):
         shift: Union[Number,Literal["min","mean","median"]] = 0,
         scale: Union[Number,Literal["minmax","std","iqr","maxabs"]] = "minmax",
         target: Literal["context"] = "context",
-        using: Optional[int] = None):
+        using: Optional[int] = None,
+        stream: bool = False):
         """Instantiate a Scale filter.
 
         Args:
@@ -93,6 +144,12 @@ class Scale(EnvironmentFilter):
             scale: The statistic to use to scale each context feature.
             target: The target data we wish to scale in the environment.
             using: The number of interactions to use when calculating the necessary statistics.
+            stream: Indicates that statistics should be calculated in a single pass with online
+                estimators. Each interaction is then scaled using the statistics of itself and
+                every interaction before it (until `using` interactions have been seen). This
+                means interactions are never held in memory though early interactions will be
+                scaled with less accurate statistics. Medians and IQRs are estimated with the
+                P-Square algorithm when streaming.
         """
 
         assert isinstance(shift,Number) or shift in ["min","mean","med","median"]
@@ -104,14 +161,17 @@ class Scale(EnvironmentFilter):
         self._scale  = scale
         self._using  = using
         self._target = target
+        self._stream = stream
 
     @property
     def params(self) -> Mapping[str, Any]:
-        return {
+        params = {
             "shift": self._shift,
             "scale": self._scale,
             "scale_using": self._using,
         }
+        if self._stream: params["scale_stream"] = True
+        return params
 
     def filter(self, interactions: Iterable[Interaction]) -> Iterable[Interaction]:
 
@@ -124,14 +184,18 @@ class Scale(EnvironmentFilter):
             yield from interactions
             return
 
-        remaining_interactions = iter(interactions)
-        fitting_interactions   = list(islice(remaining_interactions,self._using))
-
         first_context = first['context']
 
         if isinstance(first_context, primitives.Sparse) and self._target=="context" and self._shift != 0:
             raise CobaException("Shift is required to be 0 for sparse environments. Otherwise the environment will become dense.")
 
+        if self._stream:
+            yield from self._stream_filter(first_context, interactions)
+            return
+
+        remaining_interactions = iter(interactions)
+        fitting_interactions   = list(islice(remaining_interactions,self._using))
+
         is_dense_context  = isinstance(first_context, primitives.Dense)
         is_sparse_context = isinstance(first_context, primitives.Sparse)
         is_value_context  = not (is_dense_context or is_sparse_context)
@@ -152,18 +216,24 @@ class Scale(EnvironmentFilter):
             yield from chain(fitting_interactions,remaining_interactions)
             return
 
-        #get the potential columns to scale
-        if is_dense_context and len(potential_keys) == 1:
-            cols = [map(itemgetter(potential_keys[0]),fitting_contexts)]
-        if is_dense_context and len(potential_keys) >= 2:
-            cols = zip(*map(itemgetter(*potential_keys),fitting_contexts))
-        if is_sparse_context:
-            cols = [ map(methodcaller("get",k,0), fitting_contexts) for k in potential_keys]
-        if is_value_context:
-            cols = [fitting_contexts]
-
         #get the shift/scale values for columns
-        scaling_vals = list(map(self._get_shift_and_scale,cols))
+        scaling_vals = None
+        if is_dense_context and PackageChecker.numpy(strict=False):
+            scaling_vals = self._get_dense_shifts_and_scales(potential_keys, fitting_contexts)
+
+        if scaling_vals is None:
+            #get the potential columns to scale
+            if is_dense_context and len(potential_keys) == 1:
+                cols = [map(itemgetter(potential_keys[0]),fitting_contexts)]
+            if is_dense_context and len(potential_keys) >= 2:
+                cols = zip(*map(itemgetter(*potential_keys),fitting_contexts))
+            if is_sparse_context:
+                cols = [ map(methodcaller("get",k,0), fitting_contexts) for k in potential_keys]
+            if is_value_context:
+                cols = [fitting_contexts]
+
+            scaling_vals = list(map(self._get_shift_and_scale,cols))
+
         if all((v is None for v in scaling_vals)):
             yield from chain(fitting_interactions, remaining_interactions)
             return
@@ -173,12 +243,7 @@ class Scale(EnvironmentFilter):
 
         #now shift and scale
         if is_dense_context:
-            scaling_tuples = list(zip(scaling_keys,scaling_vals))
-            for interaction in chain(fitting_interactions, remaining_interactions):
-                context = interaction['context']
-                for i,(shift,scale) in scaling_tuples:
-                    context[i] = (context[i]+shift)*scale
-                yield interaction
+            yield from self._scale_dense(dict(zip(scaling_keys,scaling_vals)), chain(fitting_interactions, remaining_interactions))
 
         if is_sparse_context:
             scaling_dict = dict(zip(scaling_keys,scaling_vals))
@@ -197,6 +262,74 @@ class Scale(EnvironmentFilter):
                     new['context'] = (new['context']+shift)*scale
                 yield new
 
+    def _scale_dense(self, scaling_dict: Mapping[int,Tuple[float,float]], interactions: Iterable[Interaction]) -> Iterable[Interaction]:
+        scaling_tuples = list(scaling_dict.items())
+        n_features     = max(scaling_dict)+1
+
+        #when every feature is scaled we can shift and scale an entire context at once
+        if len(scaling_dict) == n_features:
+            shifts,scales = zip(*map(scaling_dict.__getitem__,range(n_features)))
+        else:
+            shifts,scales = None,None
+
+        for interaction in interactions:
+            context = interaction['context']
+            if shifts and context.__class__ is list and len(context) == n_features:
+                context[:] = map(mul,map(add,context,shifts),scales)
+            else:
+                for i,(shift,scale) in scaling_tuples:
+                    context[i] = (context[i]+shift)*scale
+            yield interaction
+
+    def _get_dense_shifts_and_scales(self, keys: Sequence[int], contexts: Sequence[Sequence]) -> Optional[Sequence[Optional[Tuple[float,float]]]]:
+        import numpy as np
+
+        try:
+            #None becomes nan which every statistic below ignores
+            if keys == list(range(len(contexts[0]))):
+                values = np.array(contexts, dtype=float)
+            else:
+                getter = itemgetter(*keys) if len(keys) > 1 else lambda c,k=keys[0]: (c[k],)
+                values = np.array(list(map(getter,contexts)), dtype=float)
+        except (TypeError,ValueError):
+            #some column has a value that isn't a number so we fall back to fitting columns one at a time
+            return None
+
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            #columns without any values will give warnings and nans which we handle below
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+
+            n = np.count_nonzero(~np.isnan(values),axis=0)
+
+            if self._shift == "min":
+                shift = -np.nanmin(values,axis=0)
+            elif self._shift == "mean":
+                shift = -np.nanmean(values,axis=0)
+            elif self._shift in ["med","median"]:
+                shift = -np.nanmedian(values,axis=0)
+            else:
+                shift = np.full(len(keys),float(self._shift))
+
+            if self._scale == "minmax":
+                scale = np.nanmax(values,axis=0)-np.nanmin(values,axis=0)
+            elif self._scale == "std":
+                scale = np.nanstd(values,axis=0,ddof=1)
+                n = np.where(n > 1, n, 0) #stdev isn't defined for fewer than two values
+            elif self._scale == "iqr":
+                p25,p75 = np.nanpercentile(values,[25,75],axis=0)
+                scale = p75-p25
+            elif self._scale == "maxabs":
+                scale = np.nanmax(np.abs(values+shift),axis=0)
+            else:
+                scale = None
+
+        if scale is None:
+            scale = [ self._scale ] * len(keys)
+        else:
+            scale = [ 1 if s < .000001 else 1/s for s in scale.tolist() ]
+
+        return [ (sh,sc) if c else None for sh,sc,c in zip(shift.tolist(),scale,n.tolist()) ]
+
     def _get_shift_and_scale(self,values) -> Tuple[float,float]:
         try:
             values = [v for v in values if v is not None]
@@ -241,35 +374,165 @@ class Scale(EnvironmentFilter):
             scale_den = iqr(values)
         elif scale == "maxabs":
             scale_num = 1
-            scale_den = max(map(abs,map(shift.__add__,values)))
+            scale_den = max(map(abs,map(add,repeat(shift),values)))
 
         return scale_num if scale_den < .000001 else scale_num/scale_den
 
+    def _stream_filter(self, first_context: Any, interactions: Iterable[Interaction]) -> Iterable[Interaction]:
+
+        is_dense_context  = isinstance(first_context, primitives.Dense)
+        is_sparse_context = isinstance(first_context, primitives.Sparse)
+
+        if is_sparse_context and self._scale == "iqr":
+            raise CobaException("IQR can't be estimated for sparse environments when streaming.")
+
+        if is_dense_context:
+            scalable = { i for i,v in enumerate(first_context) if isinstance(v,(int,float)) }
+        elif is_sparse_context:
+            unscalable = { k for k,v in first_context.items() if not isinstance(v,(int,float)) }
+
+        stats   = {}
+        n_seen  = 0
+        fitting = True
+
+        for index, interaction in enumerate(interactions):
+
+            if fitting and self._using is not None and index >= self._using:
+                fitting = False
+
+            if fitting: n_seen += 1
+
+            if is_dense_context:
+                context = interaction['context']
+                for i in scalable:
+                    value = context[i]
+                    if value is None: continue
+                    stat = stats.get(i) or stats.setdefault(i,OnlineScaleStats(self._shift,self._scale))
+                    if fitting: stat.update(value)
+                    shift,scale = stat.shift_and_scale(0)
+                    context[i] = (value+shift)*scale
+
+            elif is_sparse_context:
+                context = interaction['context']
+                for k in context.keys() - unscalable:
+                    value = context[k]
+                    if value is None: continue
+                    stat = stats.get(k) or stats.setdefault(k,OnlineScaleStats(self._shift,self._scale))
+                    if fitting: stat.update(value)
+                    shift,scale = stat.shift_and_scale(n_seen)
+                    context[k] = (value+shift)*scale
+
+            else:
+                interaction = interaction.copy()
+                value = interaction['context']
+                if value is not None:
+                    stat = stats.get(0) or stats.setdefault(0,OnlineScaleStats(self._shift,self._scale))
+                    if fitting: stat.update(value)
+                    shift,scale = stat.shift_and_scale(0)
+                    interaction['context'] = (value+shift)*scale
+
+            yield interaction
+
+class OnlineScaleStats:
+    """Track the shift and scale of a feature with constant memory.
+
+    Remarks:
+        Features that are missing from sparse contexts are treated as zeros. This means
+        `shift_and_scale` must be told how many contexts have been seen in total.
+    """
+
+    def __init__(self, shift: Union[Number,str], scale: Union[Number,str]) -> None:
+        self._shift = shift
+        self._scale = scale
+        self._count = 0
+        self._min   = float('inf')
+        self._max   = -float('inf')
+        self._var   = OnlineVariance()
+        self._med   = OnlineQuantile(.5) if shift in ["med","median"] else None
+        self._p25   = OnlineQuantile(.25) if scale == "iqr" else None
+        self._p75   = OnlineQuantile(.75) if scale == "iqr" else None
+
+    def update(self, value: float) -> None:
+        if value != value: return #nan
+
+        self._count += 1
+        if value < self._min: self._min = value
+        if value > self._max: self._max = value
+
+        if self._shift == "mean" or self._scale == "std": self._var.update(value)
+        if self._med: self._med.update(value)
+        if self._p25:
+            self._p25.update(value)
+            self._p75.update(value)
+
+    def shift_and_scale(self, n_seen: int = 0) -> Tuple[float,float]:
+        if not self._count: return 0,1
+
+        n_zero = max(n_seen-self._count,0)
+        shift  = self._shift
+        scale  = self._scale
+
+        if shift == "min":
+            shift = -min(self._min,0) if n_zero else -self._min
+        elif shift == "mean":
+            shift = -self._var.mean
+        elif shift in ["med","median"]:
+            shift = -self._med.quantile
+
+        if scale == "minmax":
+            lo,hi = (min(self._min,0),max(self._max,0)) if n_zero else (self._min,self._max)
+            den   = hi-lo
+        elif scale == "std":
+            mean,var = self._var.mean, self._var.variance
+            if n_zero:
+                #combine the variance of our values with the variance of the missing zeros
+                m2   = (0 if var != var else var*(self._count-1)) + mean*mean*self._count*n_zero/n_seen
+                var  = m2/(n_seen-1)
+            den = var**(1/2) if var == var else 0
+        elif scale == "iqr":
+            den = self._p75.quantile-self._p25.quantile
+        elif scale == "maxabs":
+            den = max(abs(self._min+shift),abs(self._max+shift))
+        else:
+            return shift, scale
+
+        return shift, (1 if den < .000001 else 1/den)
+
 class Impute(EnvironmentFilter):
     """Impute missing values (nan) in Interaction contexts."""
 
     def __init__(self,
         stat : Literal["mean","median","mode"] = "mean",
         indicator: bool = True,
-        using: Optional[int] = None):
+        using: Optional[int] = None,
+        stream: bool = False):
         """Impute missing data.
 
         Args:
             stats: The statistic to use for imputation.
             indicator: Indicates whether a binary feature should be added for missingness.
             using: The number of interactions to use to calculate imputation statistics.
+            stream: Indicates that statistics should be calculated in a single pass with online
+                estimators. Missing values are then imputed using the statistics of every
+                interaction before them (until `using` interactions have been seen). This
+                means interactions are never held in memory. Because missingness isn't known
+                ahead of time dense indicators are added for every imputable feature. Medians
+                are estimated with the P-Square algorithm when streaming.
         """
 
         assert stat in ["mean","median","mode"]
 
-        self._stat  = stat
-        self._miss  = indicator
-        self._using = using
-        self._times = [0,0,0,0]
+        self._stat   = stat
+        self._miss   = indicator
+        self._using  = using
+        self._stream = stream
+        self._times  = [0,0,0,0]
 
     @property
     def params(self) -> Mapping[str, Any]:
-        return { "impute_stat": self._stat, "impute_using": self._using, "impute_indicator":self._miss }
+        params = { "impute_stat": self._stat, "impute_using": self._using, "impute_indicator":self._miss }
+        if self._stream: params["impute_stream"] = True
+        return params
 
     def filter(self, interactions: Iterable[Interaction]) -> Iterable[Interaction]:
         first, interactions = peek_first(Mutable().filter(interactions))
@@ -281,6 +544,10 @@ class Impute(EnvironmentFilter):
             yield from interactions
             return
 
+        if self._stream:
+            yield from self._stream_filter(first['context'], interactions)
+            return
+
         is_dense  = isinstance(first['context'], primitives.Dense)
         is_sparse = isinstance(first['context'], primitives.Sparse)
         is_value  = not is_dense and not is_sparse
@@ -311,7 +578,13 @@ class Impute(EnvironmentFilter):
 
         start = time.time()
         #get unimputed values
-        if is_dense:
+        dense_imputations = None
+        if is_dense and imputable_cols and self._stat != "mode" and PackageChecker.numpy(strict=False):
+            dense_imputations = self._get_dense_imputations(imputable_cols, list(map(itemgetter("context"),using_interactions)))
+
+        if is_dense and dense_imputations is not None:
+            unimputed = []
+        elif is_dense:
             if len(imputable_cols) == 0:
                 unimputed = []
             elif len(imputable_cols) == 1:
@@ -332,7 +605,16 @@ class Impute(EnvironmentFilter):
 
         start = time.time()
         #calculate imputation statistics
-        if is_dense:
+        if is_dense and dense_imputations is not None:
+            imputations = {}
+            impute_binary = {}
+            for i, (imputation, any_missing) in zip(imputable_cols,dense_imputations):
+                if imputation is not None:
+                    imputations[i] = imputation
+                    if self._miss and any_missing:
+                        impute_binary[i] = len(impute_binary)
+
+        elif is_dense:
             imputations = {}
             impute_binary = {}
             for i, col in zip(imputable_cols,unimputed):
@@ -364,7 +646,10 @@ class Impute(EnvironmentFilter):
 
             context = interaction['context']
 
-            if is_dense:
+            if is_dense and None not in context:
+                if impute_binary: context += [0]*len(impute_binary)
+
+            elif is_dense:
                 is_missing = [0]*len(impute_binary)
                 for k,v in enumerate(context):
                     if v is None and k in imputations:
@@ -408,6 +693,130 @@ class Impute(EnvironmentFilter):
         except:
             return None
 
+    def _get_dense_imputations(self, cols: Sequence[int], contexts: Sequence[Sequence]) -> Optional[Sequence[Tuple[Optional[float],bool]]]:
+        import numpy as np
+
+        try:
+            #None becomes nan which the statistics below ignore
+            if cols == list(range(len(contexts[0]))):
+                values = np.array(contexts, dtype=float)
+            else:
+                getter = itemgetter(*cols) if len(cols) > 1 else lambda c,k=cols[0]: (c[k],)
+                values = np.array(list(map(getter,contexts)), dtype=float)
+        except (TypeError,ValueError):
+            #some column has a value that isn't a number so we fall back to imputing columns one at a time
+            return None
+
+        missing = np.isnan(values)
+
+        with warnings.catch_warnings():
+            #columns without any values will give warnings and nans which we handle below
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            imputations = np.nanmean(values,axis=0) if self._stat == "mean" else np.nanmedian(values,axis=0)
+
+        has_values = (~missing).any(axis=0).tolist()
+        imputations = [ i if h else None for i,h in zip(imputations.tolist(),has_values) ]
+
+        return list(zip(imputations, missing.any(axis=0).tolist()))
+
+    def _stream_filter(self, first_context: Any, interactions: Iterable[Interaction]) -> Iterable[Interaction]:
+
+        is_dense  = isinstance(first_context, primitives.Dense)
+        is_sparse = isinstance(first_context, primitives.Sparse)
+        numeric   = self._stat in ["mean","median"]
+
+        if is_sparse and self._stat == "median":
+            raise CobaException("The median can't be estimated for sparse environments when streaming.")
+
+        if is_dense:
+            imputable_cols = [i for i,v in enumerate(first_context) if not numeric or v is None or isinstance(v,(int,float))]
+        elif is_sparse:
+            unimputable_cols = {k for k,v in first_context.items() if numeric and v is not None and not isinstance(v,(int,float))}
+
+        stats   = defaultdict(lambda: OnlineImputeStats(self._stat))
+        n_seen  = 0
+
+        for index, interaction in enumerate(interactions):
+            fitting = self._using is None or index < self._using
+            context = interaction['context']
+
+            if fitting: n_seen += 1
+
+            if is_dense:
+                missing = []
+                for i in imputable_cols:
+                    value = context[i]
+                    if value is not None:
+                        if fitting: stats[i].update(value)
+                    else:
+                        missing.append(i)
+
+                for i in missing:
+                    context[i] = stats[i].imputation(0)
+
+                if self._miss:
+                    is_missing = dict.fromkeys(imputable_cols,0)
+                    is_missing.update(dict.fromkeys(missing,1))
+                    context += is_missing.values()
+
+            elif is_sparse:
+                missing = []
+                for k in context.keys()-unimputable_cols:
+                    value = context[k]
+                    if fitting: stats[k].update(value)
+                    if value is None: missing.append(k)
+
+                for k in missing:
+                    context[k] = stats[k].imputation(n_seen)
+                    if self._miss: context[f"{k}_is_missing"] = 1
+
+            else:
+                if fitting and context is not None: stats[0].update(context)
+                value = stats[0].imputation(0) if context is None else context
+                interaction["context"] = [value, int(context is None)] if self._miss else value
+
+            yield interaction
+
+class OnlineImputeStats:
+    """Track the imputation value of a feature with constant memory.
+
+    Remarks:
+        Features that are missing from sparse contexts are treated as zeros. This means
+        `imputation` must be told how many contexts have been seen in total.
+    """
+
+    def __init__(self, stat: Literal["mean","median","mode"]) -> None:
+        self._stat    = stat
+        self._present = 0
+        self._count   = 0
+        self._sum     = 0
+        self._median  = OnlineQuantile(.5) if stat == "median" else None
+        self._counts  = defaultdict(int) if stat == "mode" else None
+
+    def update(self, value: Any) -> None:
+        self._present += 1
+        if value is None: return
+
+        self._count += 1
+
+        if self._stat == "mean": self._sum += value
+        if self._median: self._median.update(value)
+        if self._counts is not None: self._counts[value] += 1
+
+    def imputation(self, n_seen: int) -> Any:
+        n_zero = max(n_seen-self._present,0)
+
+        if not self._count and not n_zero: return None
+
+        if self._stat == "mean":
+            return self._sum/(self._count+n_zero)
+        if self._stat == "median":
+            return self._median.quantile
+
+        counts = self._counts
+        if n_zero: counts = {**counts, 0: counts.get(0,0)+n_zero}
+        return max(counts, key=counts.__getitem__)
+
 class Sparsify(EnvironmentFilter):
     """Ensure that features are sparse."""
 
@@ -837,13 +1246,35 @@ class Riffle(EnvironmentFilter):
 
     def filter(self, interactions: Iterable[Interaction]) -> Iterable[Interaction]:
 
-        rng          = CobaRandom(self._seed)
         interactions = list(interactions)
+        spacing      = self._spacing
+        n_riffled    = int(len(interactions)/(spacing+1))
+        n_remaining  = len(interactions)-n_riffled
 
-        for i in range(int(len(interactions)/(self._spacing+1))):
-            interactions.insert(i*self._spacing+rng.randint(0,self._spacing), interactions.pop())
+        #Riffling pops interactions off the end and inserts each one at a random offset within
+        #its space. Later interactions are always inserted further along than earlier spaces,
+        #so everything before the current space is final and can be merged into our output.
+        #Only the current space is held in a deque which keeps the merge linear.
+        riffled = []
+        pending = deque()
+        next_i  = 0
 
-        return interactions
+        for i,offset in enumerate(CobaRandom(self._seed).randints(n_riffled,0,spacing)):
+            index = i*spacing+offset-len(riffled)
+
+            while len(pending) < index:
+                pending.append(interactions[next_i])
+                next_i += 1
+
+            pending.insert(index, interactions[-1-i])
+
+            while pending and len(riffled) < (i+1)*spacing:
+                riffled.append(pending.popleft())
+
+        riffled.extend(pending)
+        riffled.extend(interactions[next_i:n_remaining])
+
+        return riffled
 
 class Noise(EnvironmentFilter):
     """Add noise to values."""
@@ -1404,6 +1835,16 @@ class Chunk(EnvironmentFilter):
         will be resued by all pipes downstream of the chunk.
     """
 
+    def __init__(self, split: bool = False) -> None:
+        """Instantiate a Chunk filter.
+
+        Args:
+            split: Indicates that tasks downstream of the chunk can be given to
+                different processes. Each process then executes the filters before
+                the chunk at most once for every run of tasks it is given in a row.
+        """
+        self.split = split
+
     def filter(self, items: Iterable[Interaction]) -> Iterable[Interaction]:
         return items
 
@@ -1654,3 +2095,30 @@ class Finalize(EnvironmentFilter):
                 if rwds_is_list: new['rewards'  ] = DiscreteReward(new['actions'],new['rewards'  ])
                 if fbks_is_list: new['feedbacks'] = DiscreteReward(new['actions'],new['feedbacks'])
                 yield new
+
+class Finalized(Environment):
+    """An environment whose finalized interactions are memoized.
+
+    Remarks:
+        The wrapped environment is read and finalized once. Afterwards interactions are
+        read from memory. Evaluators recognize this class and don't finalize it again.
+    """
+
+    def __init__(self, environment: Environment) -> None:
+        """Instantiate a Finalized environment.
+
+        Args:
+            environment: The environment to finalize.
+        """
+        self._environment = environment
+        self._finalized   = Pipes.join(environment, BatchSafe(Finalize()), Cache(25))
+
+    @property
+    def params(self) -> Mapping[str,Any]:
+        return self._environment.params
+
+    def read(self) -> Iterable[Interaction]:
+        return self._finalized.read()
+
+    def __str__(self) -> str:
+        return str(self._environment)
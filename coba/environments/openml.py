@@ -1,21 +1,32 @@
+import io
 import time
 import json
+import zlib
+import hashlib
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from http.client import IncompleteRead
 
 from urllib import request
 from operator import attrgetter
-from typing import Tuple, Sequence, Any, Iterable, Dict, MutableSequence, MutableMapping, Union, overload
+from typing import Tuple, Sequence, Any, Iterable, Dict, MutableSequence, MutableMapping, Optional, Union, overload
 
 from coba.random import random
-from coba.pipes import Pipes, HttpSource, ArffReader, DropRows, LabelRows
-from coba.context import CobaContext
+from coba.pipes import Pipes, SourceFilters, HttpSource, ArffReader, DropRows, LabelRows, LazyDense, LazySparse
+from coba.context import CobaContext, ConcurrentCacher, NullCacher
 from coba.primitives import Sparse, Dense, Source
 from coba.exceptions import CobaException
+from coba.utilities import peek_first
 
 from coba.environments.supervised import SupervisedSimulation
 
 class OpenmlSource(Source[Iterable[Tuple[Union[MutableSequence, MutableMapping],Any]]]):
     """Load an openml.org dataset."""
 
+    _url = "https://openml.org"
+
     @overload
     def __init__(self, *, data_id:int, drop_missing:bool=True, target:str = None):
         """Instantiate an OpenmlSource.
@@ -104,12 +115,11 @@ class OpenmlSource(Source[Iterable[Tuple[Union[MutableSequence, MutableMapping],
             label_type = 'c' if task_type==1 else 'r' if task_type==2 else None
             drop_row = attrgetter('missing') if self._drop_missing else None
 
-            lines = self._get_arff_lines(data_descr["file_id"], None)
-            reader= ArffReader()
+            rows  = self._get_arff_rows(data_descr["file_id"])
             drop  = DropRows(drop_cols=ignore, drop_row=drop_row)
             label = LabelRows(self._target, label_type)
 
-            yield from Pipes.join(reader, drop, label).filter(lines)
+            yield from Pipes.join(drop, label).filter(rows)
 
         except KeyboardInterrupt:
             #we don't want to clear the cache in the case of a KeyboardInterrupt
@@ -128,6 +138,38 @@ class OpenmlSource(Source[Iterable[Tuple[Union[MutableSequence, MutableMapping],
             if semaphore_acquired:
                 openml_semaphore.release()
 
+    def prefetch(self) -> None:
+        """Download and cache everything needed to read the source."""
+
+        old_data_id = self._data_id
+
+        try:
+            if self._source_already_cached(): return
+
+            if self._task_id:
+                self._data_id = self._get_task_descr(self._task_id)['data']
+
+            if self._data_id:
+                data_descr = self._get_data_descr(self._data_id)
+                self._get_feat_descr(self._data_id)
+
+                #read will raise an exception for deactivated sources so there is no need to download them
+                if data_descr.get('status') != 'deactivated':
+                    arff_url = f"{self._url}/data/v1/download/{data_descr['file_id']}"
+                    arff_get = lambda: self._parse_arff(self._http_download(arff_url, data_descr.get('md5_checksum')))
+                    with CobaContext.cacher.get_set(self._cache_keys['arff'], arff_get):
+                        pass
+
+        except (KeyboardInterrupt, CobaException):
+            raise
+
+        except Exception:
+            self._clear_cache()
+            raise
+
+        finally:
+            self._data_id = old_data_id
+
     def _clean_name(self, name: str) -> str:
         return name.strip().strip('\'"').replace('\\','') if name else name
 
@@ -160,38 +202,99 @@ class OpenmlSource(Source[Iterable[Tuple[Union[MutableSequence, MutableMapping],
             return
 
         except request.HTTPError as e:
-            status, content = e.code, e.fp.read()
-
-            if status == 412 and 'please provide api key' in content.lower():
-                raise CobaException(
-                    "Openml has requested an API key to access openml's rest API. A key can be obtained by creating "
-                    "an openml account at openml.org. Once a key has been obtained it should be placed within "
-                    "~/.coba as { \"api_keys\" : { \"openml\" : \"<your key here>\", } }.")
-
-            if status == 412 and 'authentication failed' in content.lower():
-                raise CobaException(
-                    "The API key you provided no longer seems to be valid. You may need to create a new one by "
-                    "logging into your openml account and regenerating a key. After regenerating the new key "
-                    "should be placed in ~/.coba as { \"api_keys\" : { \"openml\" : \"<your key here>\", } }.")
-
-            if status == 404:
-                raise CobaException("We're sorry but we were unable to find the requested dataset on openml.")
-
-            raise CobaException(f"An error was returned by openml: {content}")
-
+            self._raise_http_error(e)
+
+    def _http_download(self, url: str, checksum: str = None, tries: int = 0) -> Iterable[str]:
+        # Unlike _http_request this downloads the entire response to a temporary file before any lines
+        # are yielded. This lets us resume interrupted downloads with range requests and verify the
+        # download's checksum without ever holding the whole file in memory.
+        api_key = CobaContext.api_keys.get('openml')
+        if api_key: url = f"{url}?api_key={api_key}"
+
+        MB       = 1024*1024
+        encoding = None
+
+        with ExitStack() as stack:
+            file = stack.enter_context(tempfile.TemporaryFile())
+
+            while True:
+                headers = {'Accept-Encoding':'gzip, deflate'}
+                if file.tell(): headers['Range'] = f"bytes={file.tell()}-"
+
+                try:
+                    with request.urlopen(request.Request(url,headers=headers), timeout=20) as response:
+                        if response.status != 206:
+                            #the server ignored our range request
+                            file.seek(0)
+                            file.truncate()
+                        encoding = response.headers.get('Content-Encoding')
+                        expected = file.tell() + int(response.headers.get('Content-Length') or 0)
+                        while chunk := response.read(MB): file.write(chunk)
+                        #http.client doesn't always raise when a connection closes early so we check ourselves
+                        if file.tell() < expected: raise IncompleteRead(b"", expected-file.tell())
+                    break
+
+                except request.HTTPError as e:
+                    self._raise_http_error(e)
+
+                except (TimeoutError, ConnectionError, IncompleteRead, request.URLError):
+                    if tries >= 3: raise
+                    tries += 1
+
+            file.seek(0)
+
+            if encoding in ['gzip','deflate']:
+                decompressor = zlib.decompressobj(16+zlib.MAX_WBITS if encoding == 'gzip' else -zlib.MAX_WBITS)
+                compressed   = file
+                file         = stack.enter_context(tempfile.TemporaryFile())
+                while chunk := compressed.read(MB): file.write(decompressor.decompress(chunk))
+                file.write(decompressor.flush())
+                compressed.close()
+                file.seek(0)
+
+            if checksum:
+                md5 = hashlib.md5()
+                while chunk := file.read(MB): md5.update(chunk)
+                if md5.hexdigest() != checksum:
+                    raise CobaException(f"The download from {url} did not match its expected checksum.")
+                file.seek(0)
+
+            for line in io.TextIOWrapper(file, encoding='utf-8'):
+                yield line.rstrip('\n')
+
+    def _raise_http_error(self, e: request.HTTPError) -> None:
+        status, content = e.code, e.fp.read()
+        if isinstance(content,bytes): content = content.decode('utf-8','replace')
+
+        if status == 412 and 'please provide api key' in content.lower():
+            raise CobaException(
+                "Openml has requested an API key to access openml's rest API. A key can be obtained by creating "
+                "an openml account at openml.org. Once a key has been obtained it should be placed within "
+                "~/.coba as { \"api_keys\" : { \"openml\" : \"<your key here>\", } }.")
+
+        if status == 412 and 'authentication failed' in content.lower():
+            raise CobaException(
+                "The API key you provided no longer seems to be valid. You may need to create a new one by "
+                "logging into your openml account and regenerating a key. After regenerating the new key "
+                "should be placed in ~/.coba as { \"api_keys\" : { \"openml\" : \"<your key here>\", } }.")
+
+        if status == 404:
+            raise CobaException("We're sorry but we were unable to find the requested dataset on openml.")
+
+        raise CobaException(f"An error was returned by openml: {content}")
 
     def _get_data_descr(self, data_id:int) -> Dict[str,Any]:
-        descr_txt = " ".join(self._get_data(f'https://openml.org/api/v1/json/data/{data_id}', self._cache_keys['data']))
+        descr_txt = " ".join(self._get_data(f'{self._url}/api/v1/json/data/{data_id}', self._cache_keys['data']))
         descr_obj = json.loads(descr_txt)["data_set_description"]
         return descr_obj
 
     def _get_feat_descr(self, data_id:int) -> Sequence[Dict[str,Any]]:
-        descr_txt = " ".join(self._get_data(f'https://openml.org/api/v1/json/data/features/{data_id}', self._cache_keys['feat']))
+        descr_txt = " ".join(self._get_data(f'{self._url}/api/v1/json/data/features/{data_id}', self._cache_keys['feat']))
         descr_obj = json.loads(descr_txt)["data_features"]["feature"]
         return descr_obj
 
     def _get_task_descr(self, task_id) -> Dict[str,Any]:
-        descr_txt = " ".join(self._get_data(f'https://openml.org/api/v1/json/task/{task_id}', self._cache_keys['task']))
+        descr_txt = " ".join(self._get_data(f'{self._url}/api/v1/json/task/{task_id}', self._cache_keys['task']))
         descr_obj = json.loads(descr_txt)['task']
 
         task_type   = int(descr_obj.get('task_type_id',0))
@@ -201,10 +304,32 @@ class OpenmlSource(Source[Iterable[Tuple[Union[MutableSequence, MutableMapping],
 
         return { 'id': task_id, 'type': task_type, 'data': data_id, 'target': target}
 
-    def _get_arff_lines(self, file_id:str, md5_checksum:str) -> Iterable[str]:
-            arff_url = f"https://openml.org/data/v1/download/{file_id}"
-            arff_key = self._cache_keys['arff']
-            return self._get_data(arff_url, arff_key, md5_checksum)
+    def _get_arff_rows(self, file_id:str) -> Iterable[Union[Dense,Sparse]]:
+        arff_url = f"{self._url}/data/v1/download/{file_id}"
+        arff_key = self._cache_keys['arff']
+
+        #We cache parsed rows rather than arff lines so that cached datasets never need to be parsed again.
+        try:
+            with CobaContext.cacher.get_set(arff_key, lambda: self._parse_arff(self._http_request(arff_url))) as rows:
+                first,rows = peek_first(rows)
+                #caches created before rows were cached will still contain arff lines
+                yield from self._parse_arff(rows) if isinstance(first,str) else rows
+
+        except (KeyboardInterrupt, CobaException):
+            #these don't indicate a corrupted cache (the original raise should clear if needed)
+            raise
+
+        except Exception:
+            self._clear_cache()
+            raise
+
+    def _parse_arff(self, lines: Iterable[str]) -> Iterable[Union[Dense,Sparse]]:
+        #ArffReader rows are parsed lazily so we parse them here before they are cached
+        for row in ArffReader().filter(lines):
+            if isinstance(row,Dense):
+                yield LazyDense(list(row), None, row.headers, row.missing)
+            else:
+                yield LazySparse(dict(row.items()), missing=row.missing)
 
     def _clear_cache(self) -> None:
         for key in self._cache_keys.values():
@@ -235,6 +360,61 @@ class OpenmlSource(Source[Iterable[Tuple[Union[MutableSequence, MutableMapping],
             'arff': f"openml_{self._data_id or 0:0>6}_arff",
         }
 
+class OpenmlPrefetcher:
+    """Download and cache the openml sources of environments before they are read.
+
+    Remarks:
+        Sources are downloaded on a small pool of threads so that downloads overlap with each other
+        rather than happening one at a time as environments are read. Everything is written to
+        CobaContext.cacher so that later reads of the sources never need to go to openml.
+    """
+
+    def __init__(self, max_workers: int = 3) -> None:
+        """Instantiate an OpenmlPrefetcher.
+
+        Args:
+            max_workers: The maximum number of sources to download at the same time. We default to
+                three in an attempt to be considerate to openml.
+        """
+        self._max_workers = max_workers
+
+    def prefetch(self, environments: Iterable[Source]) -> int:
+        """Download and cache the openml sources of the given environments.
+
+        Args:
+            environments: The environments whose openml sources should be prefetched.
+
+        Returns:
+            The number of openml sources that were prefetched without error.
+        """
+        sources = {}
+        for env in environments:
+            source = self._find_source(env)
+            if source: sources.setdefault((source._data_id,source._task_id),source)
+
+        if not sources or isinstance(CobaContext.cacher,NullCacher): return 0
+
+        old_cacher = CobaContext.cacher
+        #sources with different task_ids can share a dataset so we make sure threads never write the same key
+        CobaContext.cacher = ConcurrentCacher(old_cacher)
+
+        try:
+            with ThreadPoolExecutor(min(self._max_workers,len(sources))) as executor:
+                futures = [ executor.submit(source.prefetch) for source in sources.values() ]
+            failures = [ f.exception() for f in futures if f.exception() ]
+        finally:
+            CobaContext.cacher = old_cacher
+
+        #a failed prefetch isn't fatal because the source will raise again when it is read
+        for failure in failures: CobaContext.logger.log(failure)
+
+        return len(futures)-len(failures)
+
+    def _find_source(self, env: Source) -> Optional[OpenmlSource]:
+        while env is not None and not isinstance(env,OpenmlSource):
+            env = env[0] if isinstance(env,SourceFilters) else getattr(env,'_source',None)
+        return env
+
 class OpenmlSimulation(SupervisedSimulation):
     """A supervised simulation created from an openml dataset.
     Download a dataset from openml.org and create a SupervisedSimulation.
@@ -8,8 +8,40 @@ from coba.random import CobaRandom
 from coba.exceptions import CobaException
 from coba.primitives import Context, Action
 from coba.primitives import Environment, SimulatedInteraction
+from coba.utilities import PackageChecker
 from coba.encodings import InteractionsEncoder, OneHotEncoder
 
+def _feature_blocks(
+    n_interactions: int,
+    n_actions: int,
+    n_context_features: int,
+    n_action_features: int,
+    draw: Callable[[int],Sequence[float]],
+    block_size: int = 2**10) -> Iterable[Tuple[list,list,'np.ndarray','np.ndarray']]:
+    #Every interaction draws its context features and then its action features. This
+    #means drawing a block of interactions at once consumes the random stream in the
+    #exact same order as drawing them one at a time so both give identical features.
+    import numpy as np
+
+    width   = n_context_features + n_actions*n_action_features
+    onehots = OneHotEncoder().fit_encodes(range(n_actions))
+
+    for start in range(0, n_interactions, block_size):
+        n = min(block_size, n_interactions-start)
+
+        values = np.array(draw(n*width),dtype=float).reshape(n,width)
+        X      = values[:,:n_context_features]
+        A      = values[:,n_context_features:].reshape(n,n_actions,n_action_features)
+
+        contexts = X.tolist() if n_context_features else [None]*n
+        actions  = A.tolist() if n_action_features  else [onehots]*n
+
+        yield contexts, actions, X, A
+
+def _interactions(contexts: list, actions: list, rewards: 'np.ndarray') -> Iterable[SimulatedInteraction]:
+    for context, acts, rwds in zip(contexts, actions, rewards.tolist()):
+        yield {'context': context, 'actions': acts, 'rewards': rwds}
+
 class LambdaSimulation(Environment):
     """A contextual bandit environment created from generative lambda functions."""
 
@@ -260,16 +292,37 @@ class LinearSyntheticSimulation(Environment):
             output_scalars[i] = 1/output_range            #scale to ~[0,1]
             output_biases[i]  = .5-mean(col)/output_range #center at ~.5
 
-        for _ in range(self._n_interactions):
-            context = next(context_iter)
-            actions = next(actions_iter)
+        if PackageChecker.numpy(strict=False):
+            import numpy as np
+
+            W = np.array(output_weights)
+            B = np.array(output_biases)
+            S = np.array(output_scalars)
 
-            if n_action_features:
-                rewards = [f(feats_encoder.encode(x=context,a=action))[0] for action in actions]
-            else:
-                rewards = f(feats_encoder.encode(x=context))
+            for contexts, actions, X, A in _feature_blocks(self._n_interactions, n_actions, n_context_features, n_action_features, phis):
+                if n_action_features:
+                    feats = feats_encoder.encodes_arrays(x=X[:,None,:],a=A)
+                else:
+                    feats = feats_encoder.encodes_arrays(x=X)
 
-            yield {'context': context, 'actions': actions, 'rewards': rewards}
+                if not feature_count: feats = np.ones(feats.shape[:-1]+(1,))
+
+                rewards = B + S * (feats @ W.T)
+                if n_action_features: rewards = rewards[...,0]
+
+                yield from _interactions(contexts, actions, rewards)
+
+        else:
+            for _ in range(self._n_interactions):
+                context = next(context_iter)
+                actions = next(actions_iter)
+
+                if n_action_features:
+                    rewards = [f(feats_encoder.encode(x=context,a=action))[0] for action in actions]
+                else:
+                    rewards = f(feats_encoder.encode(x=context))
+
+                yield {'context': context, 'actions': actions, 'rewards': rewards}
 
     @property
     def params(self) -> Mapping[str, Any]:
@@ -346,17 +399,35 @@ class NeighborsSyntheticSimulation(Environment):
 
         self.worlds = worlds
 
-        for _ in range(n_interactions):
+        if PackageChecker.numpy(strict=False):
+            import numpy as np
+
+            points  = [ np.array([w[0] for w in world],dtype=float) for world in worlds ]
+            rewards = [ np.array([w[1] for w in world],dtype=float) for world in worlds ]
+
+            def nearest(x, i):
+                return rewards[i][((x[...,None,:]-points[i])**2).sum(axis=-1).argmin(axis=-1)]
 
-            context = next(context_iter)
-            actions = next(actions_iter)
+            for contexts, actions, X, A in _feature_blocks(n_interactions, n_actions, n_context_feats, n_action_feats, phis):
+                if n_action_feats:
+                    R = nearest(np.concatenate([np.broadcast_to(X[:,None,:],A.shape[:2]+X.shape[1:]),A],axis=-1),0)
+                else:
+                    R = np.stack([nearest(X,i) for i in range(n_actions)],axis=-1)
 
-            if n_action_feats:
-                rewards = [ f((context or [])+action)[0] for action in actions]
-            else:
-                rewards = f(context)
+                yield from _interactions(contexts, actions, R)
 
-            yield {'context': context, 'actions': actions, 'rewards': rewards}
+        else:
+            for _ in range(n_interactions):
+
+                context = next(context_iter)
+                actions = next(actions_iter)
+
+                if n_action_feats:
+                    rewards = [ f((context or [])+action)[0] for action in actions]
+                else:
+                    rewards = f(context)
+
+                yield {'context': context, 'actions': actions, 'rewards': rewards}
 
     @property
     def params(self) -> Mapping[str, Any]:
@@ -485,17 +556,43 @@ class KernelSyntheticSimulation(Environment):
             output_scalars[i] = 1/output_range            #scale to ~[0,1]
             output_biases[i]  = .5-mean(col)/output_range #center at ~.5
 
-        for _ in range(n_interactions):
+        if PackageChecker.numpy(strict=False):
+            import numpy as np
+
+            def kernels(x, exemplars):
+                #The kernel between every x and every exemplar as a (...,n_exemplars) array.
+                if kernel in ["linear","polynomial"]:
+                    gram = x @ exemplars.T
+                    return gram if kernel == "linear" else (gram+1)**self._degree
+                sq_dist = ((x[...,None,:]-exemplars)**2).sum(axis=-1)
+                if kernel == "exponential":
+                    return np.exp(-np.sqrt(sq_dist)/self._gamma)
+                return np.exp(-sq_dist/self._gamma)
+
+            def F(x):
+                return np.stack([ bias + scalar*(kernels(x,np.array(exemplars)) @ np.array(weights))
+                    for exemplars,weights,bias,scalar in zip(output_exemplars,output_weights,output_biases,output_scalars) ], axis=-1)
+
+            for contexts, actions, X, A in _feature_blocks(n_interactions, n_actions, n_context_features, n_action_features, phis):
+                if n_action_features:
+                    R = F(np.concatenate([np.broadcast_to(X[:,None,:],A.shape[:2]+X.shape[1:]),A],axis=-1))[...,0]
+                else:
+                    R = F(X)
+
+                yield from _interactions(contexts, actions, R)
 
-            context = next(context_iter)
-            actions = next(actions_iter)
+        else:
+            for _ in range(n_interactions):
+
+                context = next(context_iter)
+                actions = next(actions_iter)
 
-            if n_action_features:
-                rewards = [f((context or [])+action)[0] for action in actions]
-            else:
-                rewards = f(context)
+                if n_action_features:
+                    rewards = [f((context or [])+action)[0] for action in actions]
+                else:
+                    rewards = f(context)
 
-            yield {'context': context, 'actions': actions, 'rewards': rewards}
+                yield {'context': context, 'actions': actions, 'rewards': rewards}
 
     @property
     def params(self) -> Mapping[str, Any]:
@@ -608,17 +705,36 @@ class MLPSyntheticSimulation(Environment):
             output_val = [ sum(map(mul,hidden_out,weights))               for weights in output_weights ]
             return output_val
 
-        for _ in range(self._n_interactions):
+        if PackageChecker.numpy(strict=False):
+            import numpy as np
+
+            H = np.array(hidden_weights)
+            O = np.array(output_weights)
+
+            def F(x):
+                with np.errstate(over='ignore'):
+                    return (1/(1+np.exp(-(x @ H.T)))) @ O.T
+
+            for contexts, actions, X, A in _feature_blocks(self._n_interactions, n_actions, n_context_features, n_action_features, rng.gausses):
+                if n_action_features:
+                    R = F(np.concatenate([np.broadcast_to(X[:,None,:],A.shape[:2]+X.shape[1:]),A],axis=-1))[...,0]
+                else:
+                    R = F(X)
+
+                yield from _interactions(contexts, actions, R)
+
+        else:
+            for _ in range(self._n_interactions):
 
-            context = next(context_iter)
-            actions = next(actions_iter)
+                context = next(context_iter)
+                actions = next(actions_iter)
 
-            if n_action_features:
-                rewards = [ f( (context or []) + action )[0] for action in actions ]
-            else:
-                rewards = f(context or [1])
+                if n_action_features:
+                    rewards = [ f( (context or []) + action )[0] for action in actions ]
+                else:
+                    rewards = f(context or [1])
 
-            yield {'context': context, 'actions': actions, 'rewards': rewards}
+                yield {'context': context, 'actions': actions, 'rewards': rewards}
 
     @property
     def params(self) -> Mapping[str, Any]:
@@ -2,12 +2,14 @@ import time
 import warnings
 
 from operator import mul
+from itertools import tee
 from statistics import mean
 from bisect import insort
 
-from typing import Any, Iterable, Sequence, Mapping, Optional, Literal
+from typing import Any, Iterable, Sequence, Mapping, Optional, Literal, Union
 
 from coba.exceptions  import CobaException
+from coba.pipes       import Pipes
 from coba.random      import CobaRandom
 from coba.context     import CobaContext
 from coba.safety      import SafeLearner
@@ -22,6 +24,11 @@ def get_ope_loss(learner) -> float:
     except AttributeError:
         return float("nan")
 
+def _finalize(environment: Environment):
+    # Finalized environments have already been finalized so we don't do it twice
+    from coba.environments import Finalize, Finalized, Identity
+    return Identity() if isinstance(environment, Finalized) else Finalize()
+
 class SequentialCB(Evaluator):
     """Sequential evaluation for CB learners."""
 
@@ -32,7 +39,8 @@ class SequentialCB(Evaluator):
         record: Sequence[Literal['reward','time','probability','action','context','actions','rewards']] = ['reward','action','probability'],
         learn : Optional[Literal['on','off','ips','dr','dm']] = 'on',
         eval  : Optional[Literal['on','ips','dr','dm']] ='on',
-        seed  : float = None) -> None:
+        seed  : float = None,
+        block : int = None) -> None:
         """Instantiate a SequentialCB evaluator.
 
         Args:
@@ -51,12 +59,20 @@ class SequentialCB(Evaluator):
                 *dm* --- dm-reward (requires 'actions', 'action', and 'reward'),
                 *None* --- no reward is recorded.
             seed: Determine which action is played when learners return an action PMF.
+            block: Evaluate interactions in blocks of this size. Learners are given the entire
+                block in one predict/learn call and results are returned as a mapping of columns
+                rather than one mapping per interaction. A value of None evaluates interactions
+                one at a time.
         """
 
+        if block is not None and (not isinstance(block,int) or block < 1):
+            raise CobaException(f"Invalid value for block: {block}. A positive integer or None was expected.")
+
         self._record = [record] if isinstance(record,str) else record
         self._learn  = learn or ''
         self._eval   = eval or ''
         self._seed   = seed
+        self._block  = block
 
         if 'ope_loss' in self._record:
             # OPE loss metric is only available for VW models
@@ -66,7 +82,9 @@ class SequentialCB(Evaluator):
 
     @property
     def params(self) -> Mapping[str,Any]:
-        return {'learn': self._learn, 'eval': self._eval, 'seed': self._seed }
+        params = {'learn': self._learn, 'eval': self._eval, 'seed': self._seed }
+        if self._block: params['block'] = self._block
+        return params
 
     def _required(self, has_score:bool) -> set:
         learn,eval = self._learn,self._eval
@@ -253,18 +271,130 @@ class SequentialCB(Evaluator):
             if out:
                 yield out
 
-    def evaluate(self, environment: Optional[Environment], learner: Optional[Learner]) -> Iterable[Mapping[Any,Any]]:
+    def _columns(self, results: Iterable[Mapping[Any,Any]]) -> Mapping[Any,Sequence[Any]]:
+        #Batched values are spread across rows and non-batched values are repeated
+        #for every row in a block. This mirrors what Unbatch does with row results.
+        columns = {}
+        n_rows  = 0
+
+        for out in results:
+            batched_vals = [v for v in out.values() if is_batch(v)]
+            n_block      = len(batched_vals[0]) if batched_vals else 1
+
+            for key,val in out.items():
+                if key not in columns: columns[key] = [None]*n_rows
+                try:
+                    columns[key].extend([val[i] for i in range(n_block)])
+                except Exception:
+                    columns[key].extend([val]*n_block)
+
+            n_rows += n_block
+
+            for col in columns.values():
+                if len(col) < n_rows: col.extend([None]*(n_rows-len(col)))
+
+        return columns
+
+    def evaluate(self, environment: Optional[Environment], learner: Optional[Learner]) -> Union[Mapping[Any,Sequence[Any]],Iterable[Mapping[Any,Any]]]:
+        if self._block:
+            return self._evaluate_blocks(environment, learner)
+        else:
+            return self._evaluate_rows(environment, learner)
+
+    def evaluates(self, environment: Environment, learners: Sequence[Learner]) -> Sequence[Union[Mapping[Any,Sequence[Any]],Sequence[Mapping[Any,Any]],Exception]]:
+        """Evaluate several learners with a single read of an environment.
+
+        Args:
+            environment: The environment to evaluate the learners on.
+            learners: The learners to evaluate.
+
+        Remarks:
+            Every learner is given the same stream of finalized interactions in lockstep so
+            the environment is read and finalized once rather than once per learner. The
+            results for each learner are identical to calling `evaluate` with it alone.
+
+        Returns:
+            The results for each learner in the given order. When a learner fails its
+            exception is returned in place of its results.
+        """
+
+        first, interactions = peek_first(environment.read())
+        seed = self._seed if self._seed is not None else CobaContext.store.get("experiment_seed")
+
+        empty = (lambda: {}) if self._block else (lambda: [])
+
+        if not interactions: return [ empty() for _ in learners ]
+
+        from coba.environments import Unbatch, Batch, BatchSafe
+
+        outputs  = [ [] for _ in learners ]
+        learners = [ SafeLearner(learner, seed) for learner in learners ]
+
+        for i,learner in enumerate(learners):
+            try:
+                self._validate(first,learner.has_score)
+            except Exception as e:
+                outputs[i] = e
+
+        if self._block:
+            first, stream = peek_first(Pipes.join(Unbatch(), _finalize(environment), Batch(self._block)).filter(interactions))
+            if not stream: return [ o if isinstance(o,Exception) else empty() for o in outputs ]
+        else:
+            stream = BatchSafe(_finalize(environment)).filter(interactions)
+
+        alive   = [ i for i,o in enumerate(outputs) if not isinstance(o,Exception) ]
+        results = dict(zip(alive, ( self._results(learners[i], first, s) for i,s in zip(alive,tee(stream,len(alive))) )))
+
+        #We advance every learner one result at a time so that the interactions buffered
+        #by tee stay bounded. Finished or failed learners are dropped so their tee
+        #iterators are released and stop holding interactions.
+        while results:
+            for i in list(results):
+                try:
+                    outputs[i].append(next(results[i]))
+                except StopIteration:
+                    del results[i]
+                except Exception as e:
+                    outputs[i] = e
+                    del results[i]
+
+        for i,output in enumerate(outputs):
+            if not isinstance(output,Exception):
+                outputs[i] = self._columns(output) if self._block else list(Unbatch().filter(output))
+
+        return outputs
+
+    def _evaluate_blocks(self, environment: Environment, learner: Learner) -> Mapping[Any,Sequence[Any]]:
+
+        first, interactions = peek_first(environment.read())
+        seed = self._seed if self._seed is not None else CobaContext.store.get("experiment_seed")
+
+        if not interactions: return {}
+
+        from coba.environments import Unbatch, Batch
+
+        learner = SafeLearner(learner, seed)
+        self._validate(first,learner.has_score)
+
+        blocks       = Pipes.join(Unbatch(), _finalize(environment), Batch(self._block))
+        first,blocks = peek_first(blocks.filter(interactions))
+
+        if not blocks: return {}
+
+        return self._columns(self._results(learner, first, blocks))
+
+    def _evaluate_rows(self, environment: Environment, learner: Learner) -> Iterable[Mapping[Any,Any]]:
 
         first, interactions = peek_first(environment.read())
         seed = self._seed if self._seed is not None else CobaContext.store.get("experiment_seed")
 
         if not interactions: return []
 
-        from coba.environments import Finalize, Unbatch, BatchSafe
+        from coba.environments import Unbatch, BatchSafe
 
         learner = SafeLearner(learner, seed)
         self._validate(first,learner.has_score)
-        results = self._results(learner, first, BatchSafe(Finalize()).filter(interactions))
+        results = self._results(learner, first, BatchSafe(_finalize(environment)).filter(interactions))
 
         #We Unbatch to work with Result
         yield from Unbatch().filter(results)
@@ -402,7 +532,7 @@ class RejectionCB(Evaluator):
     def evaluate(self, environment: Optional[Environment], learner: Optional[Learner]) -> Iterable[Mapping[Any,Any]]:
 
         #import here to avoid circular dependencies...
-        from coba.environments import OpeRewards, Finalize, BatchSafe
+        from coba.environments import OpeRewards, BatchSafe
 
         interactions = environment.read()
         learner      = SafeLearner(learner, self._seed if self._seed is not None else CobaContext.store.get("experiment_seed"))
@@ -451,7 +581,7 @@ class RejectionCB(Evaluator):
 
         ope_type = self._ope.upper() if self._ope else None
 
-        interactions = BatchSafe(Finalize()).filter(interactions)
+        interactions = BatchSafe(_finalize(environment)).filter(interactions)
 
         if ope_type:
             interactions = BatchSafe(OpeRewards(ope_type,features=[1,'a','xa'])).filter(interactions)
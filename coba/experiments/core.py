@@ -7,14 +7,14 @@ from typing import Sequence, Optional, Union, overload, Tuple
 from coba.evaluators import SequentialCB
 
 from coba.pipes import Pipes, DiskSink, ListSink, DiskSource, ListSource, Identity, Insert
-from coba.results import Result, TransactionDecode, TransactionEncode, TransactionResult
+from coba.results import Result, TransactionDecode, TransactionEncode, TransactionResult, ColumnarEncode, ColumnarSink, ColumnarSource
 from coba.context import CobaContext, ExceptLog, StampLog, NameLog, DecoratedLogger, ExceptionLogger
 from coba.exceptions import CobaException
 from coba.multiprocessing import CobaMultiprocessor
 from coba.primitives import Learner, Environment, Evaluator
 from coba.utilities import PackageChecker
 
-from coba.experiments.process import MakeTasks, ChunkTasks, ProcessTasks
+from coba.experiments.process import MakeTasks, ChunkTasks, ClaimChunks, ProcessTasks
 
 class Experiment:
     """Experiment for environments, learners and evaluators."""
@@ -83,11 +83,13 @@ class Experiment:
         self._processes        : Optional[int] = None
         self._maxchunksperchild: Optional[int] = None
         self._maxtasksperchunk : Optional[int] = None
+        self._affinity         : Optional[bool] = None
 
     def config(self,
         processes: int = None,
         maxchunksperchild: int = None,
-        maxtasksperchunk: int = None) -> 'Experiment':
+        maxtasksperchunk: int = None,
+        affinity: bool = None) -> 'Experiment':
         """Configure how the experiment will be executed.
 
         Args:
@@ -97,6 +99,8 @@ class Experiment:
             maxtasksperchunk: The maximum number of tasks a chunk can have. If a chunk has too many
                 tasks it will be split into smaller chunks. A value of 0 means that chunks are never
                 broken down into smaller chunks.
+            affinity: Indicates that chunks from the same environment chunk should always be sent
+                to the same process so that cached environment state can be reused across chunks.
 
         Returns:
             The configured Experiment.
@@ -109,6 +113,7 @@ class Experiment:
         self._processes         = processes
         self._maxchunksperchild = maxchunksperchild
         self._maxtasksperchunk  = maxtasksperchunk
+        self._affinity          = affinity
 
         return self
 
@@ -127,17 +132,27 @@ class Experiment:
         """The maximum number of tasks allowed in a chunk before breaking a chunk into smaller chunks."""
         return self._maxtasksperchunk if self._maxtasksperchunk is not None else CobaContext.experiment.maxtasksperchunk
 
+    @property
+    def affinity(self) -> bool:
+        """Indicates that chunks sharing an environment chunk should be evaluated by the same process."""
+        return self._affinity if self._affinity is not None else CobaContext.experiment.affinity
+
     def run(self,
             result_file:str = None,
             quiet:bool = False,
             processes:int = None,
             maxchunksperchild: int = None,
             maxtasksperchunk: int = None,
-            seed: Optional[int] = 1) -> Result:
+            seed: Optional[int] = 1,
+            affinity: bool = None,
+            shard: str = None,
+            prefetch: bool = False,
+            lockstep: bool = False) -> Result:
         """Run the experiment and return the results.
 
         Args:
-            result_file: The file for writing and restoring results.
+            result_file: The file for writing and restoring results. Files ending in .cbr are
+                written in a binary columnar format that is memory-mapped when loaded.
             quiet: Indicates that logged output should be turned off.
             processes: The number of processes to create for evaluating the experiment.
             maxchunksperchild: The number of chunks each process evaluates before being restarted. A
@@ -147,13 +162,32 @@ class Experiment:
                 tasks it will be split into smaller chunks. A value of 0 means that chunks are never
                 broken down into smaller chunks.
             seed: The seed that will determine all randomness within the experiment.
+            affinity: Indicates that chunks from the same environment chunk should always be sent
+                to the same process so that cached environment state can be reused across chunks.
+            shard: The name of this worker when an experiment is split across multiple machines. When
+                given, result_file must be a directory shared by every worker. Workers claim chunks by
+                writing lease files into the directory and log their results to `<shard>.log`. Every
+                worker must be given the same experiment and a unique name. The returned Result merges
+                all shard logs in the directory (see Result.from_file).
+            prefetch: Indicates that every openml source in the experiment should be downloaded and
+                cached (several at a time) before any environments are evaluated.
+            lockstep: Indicates that all learners evaluated on the same environment should be given
+                a single shared read of it in lockstep. This only reads and finalizes each environment
+                once but holds the results of all its learners in memory until they have all finished.
 
         Returns:
             Result of the experiment.
         """
 
-        self.config(processes,maxchunksperchild,maxtasksperchunk)
+        self.config(processes,maxchunksperchild,maxtasksperchunk,affinity)
         mp,mc,mt = self.processes,self.maxchunksperchild,self.maxtasksperchunk
+        af = (lambda chunk: getattr(chunk,'key',None)) if self.affinity else None
+
+        if shard:
+            if not result_file: raise CobaException("A shared result directory must be given in order to run a shard.")
+            shard_dir   = Path(result_file)
+            result_file = str(shard_dir/f"{shard}.log")
+            shard_dir.mkdir(parents=True, exist_ok=True)
 
         CobaContext.store['experiment_seed'] = seed
         is_multiproc = mp > 1 or mc != 0
@@ -180,11 +214,18 @@ class Experiment:
 
         meta = {'n_learners':n_given_lrns,'n_environments':n_given_envs,'description':self._description,'seed':seed}
 
+        if prefetch:
+            from coba.environments import OpenmlPrefetcher
+            CobaContext.logger.log("Prefetching Openml Sources")
+            OpenmlPrefetcher().prefetch(list(dict.fromkeys(e for e,_,_ in self._triples)))
+
         workitems = MakeTasks(self._triples,restored)
-        chunker   = ChunkTasks(mt)
-        process   = CobaMultiprocessor(ProcessTasks(), mp, mc, False)
-        encode    = TransactionEncode(restored)
-        sink      = DiskSink(result_file,batch=1) if result_file else ListSink(foreach=True)
+        chunker   = ChunkTasks(mt, restored, lockstep)
+        claimer   = ClaimChunks(shard_dir, shard, self._triples) if shard else Identity()
+        process   = CobaMultiprocessor(ProcessTasks(lockstep), mp, mc, False, af)
+        columnar  = bool(result_file) and str(result_file).endswith('.cbr')
+        encode    = ColumnarEncode() if columnar else TransactionEncode(restored)
+        sink      = ColumnarSink(result_file) if columnar else DiskSink(result_file,batch=1) if result_file else ListSink(foreach=True)
         source    = DiskSource(result_file) if result_file else ListSource(sink.items)
         decode    = TransactionDecode()
         result    = TransactionResult()
@@ -194,7 +235,7 @@ class Experiment:
             lrn_mismatch = restored and n_given_lrns != restored.experiment.get('n_learners',n_given_lrns)
             env_mismatch = restored and n_given_envs != restored.experiment.get('n_environments',n_given_envs)
             if lrn_mismatch or env_mismatch: raise CobaException("The experiment does not match the given logs")
-            Pipes.join(workitems, chunker, process, preamble, encode, sink).run()
+            Pipes.join(workitems, chunker, claimer, process, preamble, encode, sink).run()
         except KeyboardInterrupt: #pragma: no cover
             CobaContext.logger.log("Experiment Aborted (aborted via Ctrl-C)")
         except Exception as ex: #pragma: no cover
@@ -206,7 +247,9 @@ class Experiment:
         CobaContext.logger = old_logger
         del CobaContext.store['experiment_seed']
 
-        return Pipes.join(source,decode,result).read()
+        if shard: return Result.from_file(str(shard_dir))
+
+        return ColumnarSource(result_file).read() if columnar else Pipes.join(source,decode,result).read()
 
     def _parse_init_args(self,*args,**kwargs) -> Tuple[Sequence[Tuple[Environment,Learner]], Evaluator, Optional[str]]:
         #we know this with 100% certainty
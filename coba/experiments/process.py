@@ -1,7 +1,10 @@
+import os
+
 from copy import deepcopy
 from itertools import islice
+from pathlib import Path
 from collections import defaultdict, Counter
-from typing import Any, Iterable, Sequence, Optional, Tuple
+from typing import Any, Iterable, Sequence, Mapping, Optional, Tuple, Callable
 
 from coba.context import CobaContext
 from coba.utilities import peek_first
@@ -31,6 +34,78 @@ class Task:
         and self.val    == o.val    \
         and self.copy   == o.copy   \
 
+def share_prefixes(envs: Iterable[Environment]) -> Mapping[Environment,Environment]:
+    """Make environments with a common pipeline prefix read that prefix once.
+
+    Args:
+        envs: The environments that are going to be evaluated.
+
+    Remarks:
+        Environments that aren't already chunked are grouped by the first pipe in
+        their pipeline. When a group has more than one environment a split Chunk and
+        Cache is placed after the longest prefix the group shares (if the prefix already
+        ends in a Cache only a split Chunk is placed before it). Split chunks keep the
+        prefix cached in each process without putting every task into one chunk. Pipes
+        are the same if they are the same object or if they have the same type, params
+        and state.
+
+    Returns:
+        A mapping from each given environment to the environment that should be evaluated.
+    """
+    from coba.environments import Chunk, Cache
+    from coba.pipes import Pipes, Cache as PipesCache
+
+    shared = {}
+    groups = []
+
+    for env in envs:
+        if env in shared: continue
+        shared[env] = env
+
+        try:
+            pipes = list(env)
+        except Exception:
+            pipes = [env]
+
+        if not pipes or any(isinstance(p,Chunk) for p in pipes): continue
+
+        for group in groups:
+            if _same_pipe(group[0][1][0],pipes[0]):
+                group.append((env,pipes))
+                break
+        else:
+            groups.append([(env,pipes)])
+
+    for group in filter(lambda g: len(g) > 1, groups):
+        first  = group[0][1]
+        n_same = min(_n_same_pipes(first,pipes) for _,pipes in group)
+
+        if isinstance(first[n_same-1],PipesCache):
+            prefix = [*first[:n_same-1], Chunk(split=True), first[n_same-1]]
+        else:
+            prefix = [*first[:n_same], Chunk(split=True), Cache(25)]
+        for env,pipes in group:
+            shared[env] = Pipes.join(*prefix, *pipes[n_same:])
+
+    return shared
+
+def _n_same_pipes(pipes1: Sequence[Any], pipes2: Sequence[Any]) -> int:
+    n = 0
+    for pipe1,pipe2 in zip(pipes1,pipes2):
+        if not _same_pipe(pipe1,pipe2): break
+        n += 1
+    return n
+
+def _same_pipe(pipe1: Any, pipe2: Any) -> bool:
+    #Params alone don't identify a pipe (e.g., LambdaSimulation and Noise have the same
+    #params for different callables) so we also require that the pipes have equal state.
+    if pipe1 is pipe2: return True
+    if type(pipe1) is not type(pipe2): return False
+    try:
+        return pipe1.params == pipe2.params and vars(pipe1) == vars(pipe2)
+    except Exception:
+        return False
+
 class MakeTasks(Source[Iterable[Task]]):
 
     def __init__(self,
@@ -57,13 +132,17 @@ class MakeTasks(Source[Iterable[Task]]):
 
         learner_counts = Counter([l for _,l,_ in self._triples])
 
+        #environments that share a pipeline prefix are rewritten
+        #so that they all read the prefix from a single chunk.
+        shared = share_prefixes(e for e,_,_ in self._triples)
+
         for env, lrn, val in self._triples:
 
             if env not in envs:
                 eid = len(envs)
                 envs[env] = eid
                 if eid not in restored_envs:
-                    yield Task((eid,env),None,None)
+                    yield Task((eid,shared[env]),None,None)
 
             if lrn not in lrns:
                 lid = len(lrns)
@@ -79,12 +158,27 @@ class MakeTasks(Source[Iterable[Task]]):
 
             eid,lid,vid = (envs[env],lrns[lrn],vals[val])
             if val and (eid,lid,vid) not in restored_outs:
-                yield Task((eid,env),(lid,lrn),(vid,val),copy=learner_counts[lrn]>1)
+                yield Task((eid,shared[env]),(lid,lrn),(vid,val),copy=learner_counts[lrn]>1)
+
+class TaskChunk(list):
+    """A list of tasks that share a key.
+
+    Remarks:
+        Tasks downstream of the same environment Chunk share a key. Chunks
+        with the same key can be sent to the same process so that cached
+        environment state is reused rather than recomputed.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = (), key: Optional[int] = None) -> None:
+        super().__init__(tasks)
+        self.key = key
 
 class ChunkTasks(Filter[Iterable[Task], Iterable[Sequence[Task]]]):
 
-    def __init__(self, max_tasks: int = None) -> None:
+    def __init__(self, max_tasks: int = None, restored: Optional[Result] = None, lockstep: bool = False) -> None:
         self._max_tasks = max_tasks or None
+        self._restored  = restored or Result()
+        self._lockstep  = lockstep
 
     def filter(self, items: Iterable[Task]) -> Iterable[Sequence[Task]]:
         return self._chunks(items)
@@ -100,16 +194,95 @@ class ChunkTasks(Filter[Iterable[Task], Iterable[Sequence[Task]]]):
             chunks[self._get_last_chunk(task.env)].append(task)
 
         for task in tasks_sans_env:
-            yield [task]
-
-        for task in chunks.pop('not_chunked',[]):
-            yield [task]
+            yield TaskChunk([task])
 
         chunks_sorter = lambda c: min([c.env_id for c in c])
         chunk_sorter  = lambda t: (t.env_id, t.lrn_id if t.lrn else -1)
 
-        for chunk in sorted(chunks.values(), key=chunks_sorter):
-            yield from self._max_chunker(sorted(chunk, key=chunk_sorter), self._max_tasks)
+        singles = [ [task] for task in chunks.pop('not_chunked',[]) ]
+
+        if self._lockstep:
+            #tasks must be in the same chunk in order to share an environment read
+            by_env = defaultdict(list)
+            for [task] in singles: by_env[task.env_id].append(task)
+            singles = list(by_env.values())
+        groups  = [ (chunk, sorted(tasks, key=chunk_sorter)) for chunk,tasks in sorted(chunks.items(), key=lambda c: chunks_sorter(c[1])) ]
+
+        #We dispatch the most expensive work first (i.e., longest processing time first). Idle
+        #processes take the next chunk off the shared queue so the cheap work at the end fills
+        #in around the expensive work rather than one large environment running alone at the end.
+        #The parts of a split chunk are kept next to each other so that a process taking them
+        #in a row only executes the filters before the chunk once.
+        cost  = self._task_costs(tasks_with_env)
+        units = [(-sum(map(cost,single)),None,single) for single in singles]
+
+        for key, (chunk, tasks) in enumerate(groups):
+            if chunk.split:
+                for part in self._split(tasks):
+                    units.append((-sum(map(cost,tasks)),key,part))
+            else:
+                units.append((-sum(map(cost,tasks)),key,tasks))
+
+        units = sorted(units, key=lambda u: (u[0],-1 if u[1] is None else u[1],-sum(map(cost,u[2]))))
+
+        for _, key, unit in units:
+            for tasks in self._max_chunker(unit, self._max_tasks if key is not None else None):
+                yield TaskChunk(tasks, key)
+
+    def _split(self, tasks: Sequence[Task]) -> Iterable[Sequence[Task]]:
+        if not self._lockstep:
+            return [ [task] for task in tasks ]
+
+        #tasks must be in the same chunk in order to share an environment read
+        by_env = defaultdict(list)
+        for task in tasks: by_env[task.env_id].append(task)
+        return list(by_env.values())
+
+    def _task_costs(self, tasks: Sequence[Task]) -> Callable[[Task],float]:
+        #The cost of a task is the estimated number of interactions in its environment
+        #multiplied by its learner's relative time per interaction. Environment sizes
+        #come from an explicit `cost` param, restored interactions, or a `take` param.
+        #Learner speeds come from restored predict and learn times. Anything unknown is
+        #given the largest known size and the average speed.
+
+        interactions = self._restored.interactions
+
+        env_sizes = defaultdict(int)
+        lrn_times = defaultdict(lambda: [0,0])
+
+        if 'environment_id' in interactions.columns:
+            env_ids, lrn_ids = interactions['environment_id'], interactions['learner_id']
+            time_cols = [interactions[col] for col in ['predict_time','learn_time'] if col in interactions.columns]
+
+            for (env_id,_,_), n in Counter(zip(env_ids,lrn_ids,interactions['evaluator_id'])).items():
+                env_sizes[env_id] = max(env_sizes[env_id], n)
+
+            for i,lrn_id in enumerate(lrn_ids):
+                times = [col[i] for col in time_cols if isinstance(col[i],(int,float))]
+                if times:
+                    lrn_times[lrn_id][0] += sum(times)
+                    lrn_times[lrn_id][1] += 1
+
+        env_hints = {}
+        for task in tasks:
+            if task.env_id not in env_hints:
+                try:
+                    params = task.env.params
+                except Exception:
+                    params = {}
+                env_hints[task.env_id] = params.get('cost') or env_sizes.get(task.env_id) or params.get('take')
+
+        lrn_speeds = { lrn_id: total/n for lrn_id, (total,n) in lrn_times.items() if total > 0 }
+        avg_speed  = sum(lrn_speeds.values())/len(lrn_speeds) if lrn_speeds else 1
+        lrn_speeds = { lrn_id: speed/avg_speed for lrn_id, speed in lrn_speeds.items() }
+        env_size   = max(filter(None,env_hints.values()), default=1)
+
+        def cost(task: Task) -> float:
+            size  = env_hints.get(task.env_id) or env_size
+            speed = lrn_speeds.get(task.lrn_id,1) if task.lrn_id is not None else 1
+            return size*speed
+
+        return cost
 
     def _get_last_chunk(self, env):
         from coba.environments import Chunk
@@ -128,21 +301,104 @@ class ChunkTasks(Filter[Iterable[Task], Iterable[Sequence[Task]]]):
             yield batch
             batch = list(islice(chunk,max_tasks))
 
+class ClaimChunks(Filter[Iterable[Sequence[Task]], Iterable[Sequence[Task]]]):
+    """Only pass chunks whose lease this shard is able to claim.
+
+    Remarks:
+        Leases are files in a directory shared by every shard. A lease is claimed by atomically
+        creating its file and writing the shard's name into it. Lease names only depend on the
+        experiment's triples (and not on what has been restored) so every shard agrees on them.
+        A shard that is restarted with the same name reclaims the leases it already owns.
+    """
+
+    def __init__(self, directory: str, shard: str, triples: Sequence[Tuple[Environment,Learner,Evaluator]]) -> None:
+        self._leases = Path(directory) / "leases"
+        self._shard  = shard
+
+        #environments are given ids in the order they first appear (see MakeTasks). All environments
+        #downstream of the same Chunk share a lease named after the smallest of their ids.
+        env_ids = {}
+        for env,_,_ in triples: env_ids.setdefault(env,len(env_ids))
+
+        #this must agree with the environments MakeTasks creates
+        env_ids = { shared: env_ids[env] for env,shared in share_prefixes(env_ids).items() }
+
+        self._groups = {}
+        groups = {}
+        for env, env_id in env_ids.items():
+            last_chunk = ChunkTasks()._get_last_chunk(env)
+            #tasks downstream of a split chunk are claimed one at a time
+            if last_chunk != 'not_chunked' and not last_chunk.split:
+                self._groups[env_id] = groups.setdefault(id(last_chunk),env_id)
+
+    def filter(self, chunks: Iterable[Sequence[Task]]) -> Iterable[Sequence[Task]]:
+        self._leases.mkdir(parents=True, exist_ok=True)
+
+        for chunk in chunks:
+            name = self._lease_name(chunk)
+            if name is None or self._claim(name):
+                yield chunk
+
+    def _lease_name(self, chunk: Sequence[Task]) -> Optional[str]:
+        tasks = [task for task in chunk if task.env_id is not None]
+
+        if not tasks:
+            #learner and evaluator parameters are cheap so every shard records them
+            return None
+
+        if tasks[0].env_id in self._groups:
+            return f"env-{self._groups[tasks[0].env_id]}"
+
+        return "task-" + "-".join(str(i) for i in (tasks[0].env_id, tasks[0].lrn_id, tasks[0].val_id) if i is not None)
+
+    def _claim(self, name: str) -> bool:
+        path = self._leases / f"{name}.lease"
+
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                return path.read_text() == self._shard
+            except OSError: #pragma: no cover
+                return False
+
+        with os.fdopen(fd,'w') as f:
+            f.write(self._shard)
+
+        return True
+
 class ProcessTasks(Filter[Iterable[Task], Iterable[Any]]):
 
+    def __init__(self, lockstep: bool = False) -> None:
+        #The environment prefix (i.e., everything up to and including the
+        #cache after a Chunk) of the most recent keyed chunk. Only one
+        #prefix is kept at a time so that memory stays bounded to one chunk.
+        self._resident = (None, None)
+
+        #When lockstep is True evaluation tasks in a chunk that share an environment
+        #and an evaluator with an `evaluates` method are evaluated in a single pass.
+        self._lockstep = lockstep
+
     def filter(self, chunk: Iterable[Task]) -> Iterable[Any]:
 
+        key   = getattr(chunk, 'key', None)
         chunk = list(chunk)
         empty_envs = set()
 
         #We sort to make sure cached envs are grouped. This allows us to free envs from memory as we go.
         chunk = sorted(chunk, key=lambda item: self._env_ids(item)+self._lrn_ids(item), reverse=True)
 
+        #The number of passes each env will have in this chunk. Envs with more than one pass are
+        #finalized once and memoized. Only the finalized form of the most recent env is kept.
+        passes    = self._passes(chunk)
+        finalized = (None, None)
+
         while chunk:
             try:
                 task = chunk.pop()
 
                 env_id,env = (task.env_id,task.env)
+                if key is not None and env is not None: env = self._reside(key, env)
                 lrn_id,lrn = (task.lrn_id,task.lrn)
                 val_id,val = (task.val_id,task.val)
 
@@ -174,14 +430,82 @@ class ProcessTasks(Filter[Iterable[Task], Iterable[Any]]):
                     with CobaContext.logger.time(f"Recording Evaluator {val_id} parameters..."):
                         yield ["T3", val_id, SafeEvaluator(val).params]
 
-                if is_e and is_l and is_v and env_id not in empty_envs:
+                if is_e and is_l and is_v and env_id not in empty_envs and self._finalizes(val):
+                    if finalized[0] != env_id: finalized = (env_id, self._finalize(env, passes[env_id]))
+                    env = finalized[1]
+
+                if is_e and is_l and is_v and env_id not in empty_envs and self._lockstep and hasattr(val,'evaluates'):
+                    tasks = [task] + [ t for t in chunk if self._same_evaluation(task,t) ]
+                    chunk = [ t for t in chunk if not self._same_evaluation(task,t) ]
+                    lrns  = [ lrn ] + [ deepcopy(t.lrn) if t.copy else t.lrn for t in tasks[1:] ]
+
+                    with CobaContext.logger.time(f"Evaluating Learners {[t.lrn_id for t in tasks]} on Environment {env_id}..."):
+                        for t, lrn, results in zip(tasks, lrns, val.evaluates(env,lrns)):
+                            if isinstance(results,Exception):
+                                CobaContext.logger.log(results)
+                            else:
+                                yield ["T4", (env_id, t.lrn_id, val_id), results]
+                                if hasattr(lrn,'finish') and t.copy: lrn.finish()
+
+                elif is_e and is_l and is_v and env_id not in empty_envs:
                     with CobaContext.logger.time(f"Evaluating Learner {lrn_id} on Environment {env_id}..."):
-                        yield ["T4", (env_id, lrn_id, val_id), list(SafeEvaluator(val).evaluate(env,lrn))]
+                        results = SafeEvaluator(val).evaluate(env,lrn)
+                        #evaluators can return a mapping of columns rather than a sequence of rows
+                        results = results if isinstance(results,Mapping) else list(results)
+                        yield ["T4", (env_id, lrn_id, val_id), results]
                         if hasattr(lrn,'finish') and task.copy: lrn.finish()
 
             except Exception as e:
                 CobaContext.logger.log(e)
 
+    def _reside(self, key: int, env: Environment) -> Environment:
+        from coba.environments import Chunk
+        from coba.pipes import Pipes, Cache
+
+        try:
+            pipes = list(env)
+            index = max(i for i,p in enumerate(pipes) if isinstance(p,Chunk))
+        except Exception:
+            return env
+
+        if index+1 < len(pipes) and isinstance(pipes[index+1],Cache):
+            index += 1
+        else:
+            #without a cache there is no state worth keeping
+            return env
+
+        if self._resident[0] != key:
+            self._resident = (key, pipes[:index+1])
+
+        return Pipes.join(*self._resident[1], *pipes[index+1:])
+
+    def _passes(self, chunk: Sequence[Task]) -> Mapping[int,int]:
+        evals = [ t for t in chunk if t.env_id is not None and t.lrn_id is not None and self._finalizes(t.val) ]
+        if self._lockstep:
+            evals = set((t.env_id, t.val_id, None if hasattr(t.val,'evaluates') else t.lrn_id) for t in evals)
+            return Counter(e[0] for e in evals)
+        return Counter(t.env_id for t in evals)
+
+    def _finalizes(self, val: Evaluator) -> bool:
+        from coba.evaluators import SequentialCB, RejectionCB
+        return isinstance(getattr(val,'evaluator',val), (SequentialCB, RejectionCB))
+
+    def _finalize(self, env: Environment, passes: int) -> Environment:
+        from coba.environments import Finalized
+        from coba.pipes import Cache
+
+        try:
+            is_cached = any(isinstance(p,Cache) for p in env)
+        except Exception:
+            is_cached = False
+
+        #Without a cache upstream reading an env is not repeatable work
+        #we are allowed to hold in memory so we only memoize cached envs.
+        return Finalized(env) if is_cached and passes > 1 else env
+
+    def _same_evaluation(self, task: Task, other: Task) -> bool:
+        return other.env_id == task.env_id and other.val_id == task.val_id and other.lrn_id is not None
+
     def _env_ids(self, item: Task):
         return (item.env_id if item.env else -1,)
 
@@ -2,7 +2,7 @@ from typing import Any, Mapping, Sequence, Tuple
 
 from coba.exceptions import CobaException
 from coba.utilities import PackageChecker
-from coba.primitives import Learner, Context, Action, Actions, Prob
+from coba.primitives import is_batch, Learner, Context, Action, Actions, Prob
 from coba.encodings import InteractionsEncoder
 from coba.learners.utilities import PMFPredictor
 
@@ -10,22 +10,34 @@ class LinTSLearner(Learner):
     """A contextual bandit learner using Thompson Sampling for exploration.
 
     This is an implementation of the Agrawal et al. (2013) Thompson Sapmling
-    algorithm. The `Sherman-Morrison formula`__ is utilized to iteratively
-    calculate the inversion matrix. Expected reward is represented as a
-    linear function of context and action features.
+    algorithm. Rather than iteratively calculating the inversion matrix with
+    the `Sherman-Morrison formula`__ a square root of the inversion matrix is
+    updated in place using Potter's rank-1 update. Sampling from the posterior
+    then only requires multiplying the square root by a standard normal vector
+    rather than factoring the inversion matrix on every prediction. Expected
+    reward is represented as a linear function of context and action features.
 
     Remarks:
         A small note on the stability of the Sherman-Morrison formula can be found `here`__.
 
+        When `diagonal` is True only the diagonal of the inversion matrix is kept. This
+        makes predicting and learning linear in the number of features. It is only exact
+        when no two features are ever non-zero together (e.g., `features=['xa']` with one-hot
+        contexts and actions). With the default features the constant and 'a' features are
+        non-zero alongside 'xa' so the diagonal is an approximation.
+
     References:
         Agrawal, Shipra, and Navin Goyal. "Thompson sampling for contextual bandits with
         linear payoffs." International conference on machine learning. PMLR, 2013.
 
+        Potter, James E., and Robert G. Stern. "Statistical filtering of space navigation
+        measurements." Proceedings of the AIAA Guidance and Control Conference. 1963.
+
     __ https://en.wikipedia.org/wiki/Sherman%E2%80%93Morrison_formula
     __ https://scicomp.stackexchange.com/q/20386/46891
     """
 
-    def __init__(self, v: float = 1, features: Sequence[str] = [1, 'a', 'ax'], seed: int = 1) -> None:
+    def __init__(self, v: float = 1, features: Sequence[str] = [1, 'a', 'ax'], seed: int = 1, diagonal: bool = False) -> None:
         """Instantiate a LinUCBLearner.
 
         Args:
@@ -36,20 +48,25 @@ class LinTSLearner(Learner):
                 Context features are indicated by x's while action features are indicated by
                 a's. For example, xaa means to cross context and action and action features.
             seed: A seed for a random number generation.
+            diagonal: Indicates that only the diagonal of the inversion matrix should be kept. This
+                is useful when there are thousands of features.
         """
         PackageChecker.numpy("LinTSLearner")
 
         self._X         = features
         self._X_encoder = InteractionsEncoder(features)
 
-        self._B_inv  = None
-        self._mu_hat = None
-        self._v      = v
-        self._pred   = PMFPredictor(self._pmf,seed)
+        self._B_inv_sqrt = None
+        self._mu_hat     = None
+        self._v          = v
+        self._diagonal   = diagonal
+        self._pred       = PMFPredictor(self._pmf,seed,batched=True)
 
     @property
     def params(self) -> Mapping[str, Any]:
-        return {'family': 'LinTS', 'v': self._v, 'features': self._X, 'seed': self._pred.seed}
+        params = {'family': 'LinTS', 'v': self._v, 'features': self._X, 'seed': self._pred.seed}
+        if self._diagonal: params['diagonal'] = True
+        return params
 
     def _initialize(self, context, action) -> None:
         if isinstance(action, dict) or isinstance(context, dict):
@@ -61,28 +78,37 @@ class LinTSLearner(Learner):
         d  = len(self._X_encoder.encode(x=context or [],a=action))
         np = __import__('numpy')
 
-        self._np     = np
-        self._nrng   = np.random.default_rng(1)
-        self._mu_hat = np.zeros(d)
-        self._B_inv  = np.identity(d)
+        #B_inv == B_inv_sqrt @ B_inv_sqrt.T (or B_inv_sqrt**2 along the diagonal when diagonal)
+        self._np         = np
+        self._nrng       = np.random.default_rng(1)
+        self._mu_hat     = np.zeros(d)
+        self._B_inv_sqrt = np.ones(d) if self._diagonal else np.identity(d)
 
     def _pmf(self, context, actions):
-        if self._B_inv is None: self._initialize(context,actions[0])
+        contexts,actionss = (context,actions) if is_batch(actions) else ([context],[actions])
 
+        if self._B_inv_sqrt is None: self._initialize(contexts[0],actionss[0][0])
         np = self._np
 
-        context  = context or []
-        features = np.array([self._X_encoder.encode(x=context,a=action) for action in actions])
+        features = [ self._X_encoder.encodes(x=c or [],a=A) for c,A in zip(contexts,actionss) ]
 
         if self._v == 0:
-            mu_tilde = self._mu_hat
+            mu_tildes = np.tile(self._mu_hat,(len(features),1))
         else:
-            mu_tilde = self._nrng.multivariate_normal(self._mu_hat, self._v*self._B_inv, method='cholesky')
+            #one posterior sample for every row in the batch
+            Z = self._nrng.standard_normal((len(features),len(self._mu_hat)))
+            Z = Z*self._B_inv_sqrt if self._diagonal else Z @ self._B_inv_sqrt.T
+            mu_tildes = self._mu_hat + np.sqrt(self._v)*Z
 
-        point_estimates = mu_tilde @ features.T
-        max_indexes     = np.where(point_estimates.round(5) == np.amax(point_estimates).round(5))[0]
+        pmfs = []
+        for mu_tilde, F in zip(mu_tildes, features):
+            point_estimates = F @ mu_tilde
+            max_estimate    = point_estimates.max()
+            #rounding error in the square-root updates means tied actions may differ slightly
+            is_max          = (point_estimates.round(5) == max_estimate.round(5)) | np.isclose(point_estimates, max_estimate, rtol=1e-9, atol=1e-12)
+            pmfs.append((is_max/is_max.sum()).tolist())
 
-        return [int(ind in max_indexes)/len(max_indexes) for ind in range(len(actions))]
+        return pmfs if is_batch(actions) else pmfs[0]
 
     def score(self, context: 'Context', actions: 'Actions', action: 'Action') -> 'Prob':
         return self._pred.score(context,actions,action)
@@ -91,16 +117,23 @@ class LinTSLearner(Learner):
         return self._pred.predict(context,actions)
 
     def learn(self, context: 'Context', action: 'Action', reward: float, probability: float) -> None:
-        if self._B_inv is None: self._initialize(context,action)
+        contexts,actions,rewards = (context,action,reward) if is_batch(action) else ([context],[action],[reward])
 
+        if self._B_inv_sqrt is None: self._initialize(contexts[0],actions[0])
         np = self._np
 
-        context  = context or []
-        features = np.array(self._X_encoder.encode(x=context,a=action)).T
-
-        r = self._mu_hat @ features
-        w = self._B_inv  @ features
-        v = w            @ features
-
-        self._mu_hat = self._mu_hat + (reward-r)/(1+v)*w
-        self._B_inv  = self._B_inv - np.outer(w,w)/(1+v)
+        for context,action,reward in zip(contexts,actions,rewards):
+            features = self._X_encoder.encodes(x=context or [],a=[action])[0]
+
+            if self._diagonal:
+                w = (self._B_inv_sqrt**2)*features
+                v = w @ features
+                self._B_inv_sqrt = np.sqrt(self._B_inv_sqrt**2 - w*w/(1+v))
+            else:
+                p = self._B_inv_sqrt.T @ features
+                w = self._B_inv_sqrt   @ p
+                v = p @ p
+                if v: self._B_inv_sqrt -= (1-1/np.sqrt(1+v))/v * np.outer(w,p)
+
+            r = self._mu_hat @ features
+            self._mu_hat = self._mu_hat + (reward-r)/(1+v)*w
@@ -2,20 +2,28 @@ from typing import Any, Mapping, Sequence, Tuple
 
 from coba.exceptions import CobaException
 from coba.utilities import PackageChecker
-from coba.primitives import Learner, Context, Action, Actions, Prob
+from coba.primitives import is_batch, Learner, Context, Action, Actions, Prob
 from coba.encodings import InteractionsEncoder
 from coba.learners.utilities import PMFPredictor
 
 class LinUCBLearner(Learner):
     """A contextual bandit learner using upper confidence bounds to explore.
 
-    This is an implementation of the Chu et al. (2011) LinUCB algorithm. The
-    `Sherman-Morrison formula`__ is utilized to iteratively calculate the
-    inversion matrix. Expected reward is represented as a linear function
-    of context and action features.
+    This is an implementation of the Chu et al. (2011) LinUCB algorithm. Rather
+    than iteratively calculating the inversion matrix with the `Sherman-Morrison
+    formula`__ a square root of the inversion matrix is updated in place using
+    Potter's rank-1 update. This is more numerically stable and never requires
+    the inversion matrix itself. Expected reward is represented as a linear
+    function of context and action features.
 
     Remarks:
-        The Sherman-Morrsion implementation used below is given in long form `here`__.
+        The Sherman-Morrsion implementation this is equivalent to is given in long form `here`__.
+
+        When `diagonal` is True only the diagonal of the inversion matrix is kept. This
+        makes predicting and learning linear in the number of features. It is only exact
+        when no two features are ever non-zero together (e.g., `features=['xa']` with one-hot
+        contexts and actions). With the default features the constant and 'a' features are
+        non-zero alongside 'xa' so the diagonal is an approximation.
 
     References:
         Chu, Wei, Lihong Li, Lev Reyzin, and Robert Schapire. "Contextual bandits
@@ -23,11 +31,14 @@ class LinUCBLearner(Learner):
         Conference on Artificial Intelligence and Statistics, pp. 208-214. JMLR Workshop
         and Conference Proceedings, 2011.
 
+        Potter, James E., and Robert G. Stern. "Statistical filtering of space navigation
+        measurements." Proceedings of the AIAA Guidance and Control Conference. 1963.
+
     __ https://en.wikipedia.org/wiki/Sherman%E2%80%93Morrison_formula
     __ https://research.navigating-the-edge.net/assets/publications/linucb_alternate_formulation.pdf
     """
 
-    def __init__(self, alpha: float = 1, features: Sequence[str] = [1, 'a', 'ax'], seed:int = 1) -> None:
+    def __init__(self, alpha: float = 1, features: Sequence[str] = [1, 'a', 'ax'], seed:int = 1, diagonal: bool = False) -> None:
         """Instantiate a LinUCBLearner.
 
         Args:
@@ -39,21 +50,26 @@ class LinUCBLearner(Learner):
                 are indicated by x's while action features are indicated by a's. For example, xaa means to cross the
                 features between context and actions and actions.
             seed: A seed for a random number generation.
+            diagonal: Indicates that only the diagonal of the inversion matrix should be kept. This
+                is useful when there are thousands of features.
         """
         PackageChecker.numpy("LinUCBLearner")
 
-        self._alpha = alpha
+        self._alpha    = alpha
+        self._diagonal = diagonal
 
         self._X = features
         self._X_encoder = InteractionsEncoder(features)
 
-        self._theta = None
-        self._A_inv = None
-        self._pred  = PMFPredictor(self._pmf,seed)
+        self._theta      = None
+        self._A_inv_sqrt = None
+        self._pred       = PMFPredictor(self._pmf,seed,batched=True)
 
     @property
     def params(self) -> Mapping[str, Any]:
-        return {'family': 'LinUCB', 'alpha': self._alpha, 'features': self._X, 'seed': self._pred.seed}
+        params = {'family': 'LinUCB', 'alpha': self._alpha, 'features': self._X, 'seed': self._pred.seed}
+        if self._diagonal: params['diagonal'] = True
+        return params
 
     def _initialize(self,context,action) -> None:
         if isinstance(action, dict) or isinstance(context, dict):
@@ -65,24 +81,32 @@ class LinUCBLearner(Learner):
         d  = len(self._X_encoder.encode(x=context or [],a=action))
         np = __import__('numpy')
 
-        self._theta = np.zeros(d)
-        self._A_inv = np.identity(d)
-        self._np    = np
+        #A_inv == A_inv_sqrt @ A_inv_sqrt.T (or A_inv_sqrt**2 along the diagonal when diagonal)
+        self._theta      = np.zeros(d)
+        self._A_inv_sqrt = np.ones(d) if self._diagonal else np.identity(d)
+        self._np         = np
 
     def _pmf(self,context,actions):
-        if self._A_inv is None: self._initialize(context,actions[0])
+        contexts,actionss = (context,actions) if is_batch(actions) else ([context],[actions])
+
+        if self._A_inv_sqrt is None: self._initialize(contexts[0],actionss[0][0])
         np = self._np
 
-        context = context or []
-        features = np.array([self._X_encoder.encode(x=context,a=action) for action in actions]).T
+        features = np.vstack([self._X_encoder.encodes(x=c or [],a=A) for c,A in zip(contexts,actionss)])
 
-        point_estimate = self._theta @ features
-        point_bounds   = np.einsum('ij,ij->j', self._A_inv @ features, features) #== np.diagonal(features.T @ self._A_inv @ features)
+        point_estimate = features @ self._theta
+        point_bounds   = (features**2) @ (self._A_inv_sqrt**2) if self._diagonal else ((features @ self._A_inv_sqrt)**2).sum(axis=1)
+        action_values  = point_estimate + self._alpha*np.sqrt(point_bounds)
 
-        action_values = point_estimate + self._alpha*np.sqrt(point_bounds)
-        max_indexes   = np.where(action_values == np.amax(action_values))[0]
+        pmfs, start = [], 0
+        for A in actionss:
+            values = action_values[start:start+len(A)]
+            #rounding error in the square-root updates means tied actions may differ slightly
+            is_max = np.isclose(values, values.max(), rtol=1e-9, atol=1e-12)
+            pmfs.append((is_max/is_max.sum()).tolist())
+            start += len(A)
 
-        return [int(ind in max_indexes)/len(max_indexes) for ind in range(len(actions))]
+        return pmfs if is_batch(actions) else pmfs[0]
 
     def score(self, context: 'Context', actions: 'Actions', action: 'Action') -> 'Prob':
         return self._pred.score(context,actions,action)
@@ -91,16 +115,23 @@ class LinUCBLearner(Learner):
         return self._pred.predict(context,actions)
 
     def learn(self, context: 'Context', action: 'Action', reward: float, probability: float) -> None:
-        if self._A_inv is None: self._initialize(context,action)
+        contexts,actions,rewards = (context,action,reward) if is_batch(action) else ([context],[action],[reward])
 
+        if self._A_inv_sqrt is None: self._initialize(contexts[0],actions[0])
         np = self._np
 
-        context = context or []
-        features = np.array(self._X_encoder.encode(x=context,a=action)).T
-
-        r = self._theta @ features
-        w = self._A_inv @ features
-        v = w           @ features
-
-        self._A_inv = self._A_inv - np.outer(w,w)/(1+v)
-        self._theta = self._theta + (reward-r)/(1+v)*w
+        for context,action,reward in zip(contexts,actions,rewards):
+            features = self._X_encoder.encodes(x=context or [],a=[action])[0]
+
+            if self._diagonal:
+                w = (self._A_inv_sqrt**2)*features
+                v = w @ features
+                self._A_inv_sqrt = np.sqrt(self._A_inv_sqrt**2 - w*w/(1+v))
+            else:
+                p = self._A_inv_sqrt.T @ features
+                w = self._A_inv_sqrt   @ p
+                v = p @ p
+                if v: self._A_inv_sqrt -= (1-1/np.sqrt(1+v))/v * np.outer(w,p)
+
+            r = self._theta @ features
+            self._theta = self._theta + (reward-r)/(1+v)*w
@@ -1,27 +1,33 @@
 from typing import Tuple, Callable,Sequence
 
 from coba.random import CobaRandom
-from coba.primitives import Context, Action, Actions, Prob, Kwargs
+from coba.primitives import is_batch, Context, Action, Actions, Prob, Kwargs
 
 class PMFPredictor:
-    def __init__(self, pmf: Callable[['Context','Actions'],Sequence[Prob]], seed:int = 1) -> None:
+    def __init__(self, pmf: Callable[['Context','Actions'],Sequence[Prob]], seed:int = 1, batched: bool = False) -> None:
         """Instantiate a PMFPredictor.
 
         Args:
             pmf: Return the PMF for given context and actions.
             seed: A seed for a random number generation.
+            batched: Indicates that pmf returns a batch of PMFs when given a batch of contexts and actions.
         """
         self._pmfrng  = CobaRandom(seed)
         self._pmfcall = pmf
+        self._batched = batched
 
     @property
     def seed(self) -> int:
         return self._pmfrng.seed
 
     def score(self, context: 'Context', actions: 'Actions', action: 'Action') -> 'Prob':
+        if self._batched and is_batch(actions):
+            return [ pmf[A.index(a)] for pmf,A,a in zip(self._pmfcall(context,actions),actions,action) ]
         return self._pmfcall(context,actions)[actions.index(action)]
 
     def predict(self, context: 'Context', actions: 'Actions') -> Tuple['Action','Prob']:
+        if self._batched and is_batch(actions):
+            return list(map(self._pmfrng.choicew,actions,self._pmfcall(context,actions)))
         return self._pmfrng.choicew(actions,self._pmfcall(context,actions))
 
 class PMFInfoPredictor:
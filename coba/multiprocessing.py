@@ -1,6 +1,6 @@
 import multiprocessing as mp
-from ctypes import c_short
-from typing import Iterable, Any, Dict
+from ctypes import c_longlong
+from typing import Iterable, Any, Dict, Callable, Hashable, Optional
 
 from coba.utilities  import coba_exit, peek_first
 from coba.context    import CobaContext, ConcurrentCacher, Logger, Cacher
@@ -11,13 +11,14 @@ class CobaMultiprocessor(Filter[Iterable[Any], Iterable[Any]]):
 
     class ProcessFilter:
 
-        def __init__(self, filter: Filter, logger: Logger, cacher: Cacher, store: Dict[str,Any], logger_sink: Sink) -> None:
+        def __init__(self, filter: Filter, logger: Logger, cacher: Cacher, store: Dict[str,Any], logger_sink: Sink, cache_memory: Optional[int] = None) -> None:
 
-            self._filter      = filter
-            self._logger      = logger
-            self._cacher      = cacher
-            self._store       = store
-            self._logger_sink = logger_sink
+            self._filter       = filter
+            self._logger       = logger
+            self._cacher       = cacher
+            self._store        = store
+            self._logger_sink  = logger_sink
+            self._cache_memory = cache_memory
 
         def filter(self, item: Any) -> Any:
 
@@ -26,17 +27,21 @@ class CobaMultiprocessor(Filter[Iterable[Any], Iterable[Any]]):
             CobaContext.cacher = self._cacher
             CobaContext.store  = self._store
 
+            if self._cache_memory is not None:
+                CobaContext.cache_memory = self._cache_memory
+
             #at this point logger has been marshalled so we can
             #modify it without affecting the base process logger
             CobaContext.logger.sink = self._logger_sink
 
             yield from self._filter.filter(item)
 
-    def __init__(self, filter: Filter, processes:int=1, maxtasksperchild:int=0, chunked:bool=False) -> None:
+    def __init__(self, filter: Filter, processes:int=1, maxtasksperchild:int=0, chunked:bool=False, affinity: Callable[[Any],Hashable] = None) -> None:
         self._filter           = filter
         self._processes        = processes
         self._maxtasksperchild = maxtasksperchild
         self._chunked          = chunked
+        self._affinity         = affinity
 
     def filter(self, items: Iterable[Any]) -> Iterable[Any]:
 
@@ -54,8 +59,8 @@ class CobaMultiprocessor(Filter[Iterable[Any], Iterable[Any]]):
                 spawn_context = mp.get_context("spawn")
 
                 stdlog        = spawn_context.Queue()
-                array         = spawn_context.RawArray(c_short,[0]*2**16)
-                lock          = spawn_context.Lock()
+                array         = spawn_context.RawArray(c_longlong,[0]*2**15)
+                lock          = spawn_context.Condition()
                 read_stdlog   = QueueSource(stdlog)
                 write_stdlog  = QueueSink(stdlog)
 
@@ -66,10 +71,10 @@ class CobaMultiprocessor(Filter[Iterable[Any], Iterable[Any]]):
                 cacher = ConcurrentCacher(CobaContext.cacher,array,lock)
                 store  = { "openml_semaphore": spawn_context.Semaphore(3), **CobaContext.store }
 
-                filter = CobaMultiprocessor.ProcessFilter(self._filter, logger, cacher, store, write_stdlog)
+                filter = CobaMultiprocessor.ProcessFilter(self._filter, logger, cacher, store, write_stdlog, CobaContext.cache_memory)
 
             try:
-                yield from Multiprocessor(filter, self._processes, self._maxtasksperchild).filter(items)
+                yield from Multiprocessor(filter, self._processes, self._maxtasksperchild, affinity=self._affinity).filter(items)
 
             except Exception as e:
                 # If the error was due to an uncaught exception in the given filter it could be the case that the user
@@ -20,5 +20,7 @@ from coba.pipes.sources import QueueSource, HttpSource, LambdaSource, UrlSource,
 from coba.pipes.sources import SourceFilters, DelimSource
 from coba.pipes.sinks   import NullSink, ConsoleSink, DiskSink, ListSink, QueueSink, LambdaSink, FiltersSink
 from coba.pipes.lines   import SourceSink, ThreadLine, ProcessLine
+from coba.pipes.blocks  import RowBlockSink, RowBlockSource, is_blocks
+from coba.pipes.codecs  import Codec, GzipCodec, Bz2Codec, LzmaCodec, ZstdCodec, Lz4Codec, detect_codec, open_file
 
 from coba.pipes.core import Pipes, Foreach, join
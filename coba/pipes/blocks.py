@@ -0,0 +1,278 @@
+import os
+import sys
+import mmap
+import zlib
+import json
+import struct
+
+from array import array
+from pathlib import Path
+from itertools import count, islice
+from typing import Any, Iterable, Sequence, Tuple, Union
+
+import coba.json
+from coba.exceptions import CobaException
+from coba.primitives import Categorical, Dense, Sparse, Sink, Source
+
+from coba.pipes.rows import LazyDense, LazySparse
+
+# The block format stores parsed rows as a file header followed by a sequence of blocks.
+#   > The file header is MAGIC followed by the byteorder of the machine that created the file.
+#   > Every block is a 16 byte header (payload length, payload crc32, number of rows) followed by its payload.
+#   > A payload is a small JSON header describing the block followed by one array per column.
+#   > Dense blocks store every column of their rows as a separate typed array.
+#   > Sparse blocks store CSR arrays (row pointers and key indexes) and then every key's values as a typed array.
+#   > Categorical values are stored as int32 codes into a dictionary of levels kept in the JSON header.
+# All blocks and arrays are padded to 8 bytes so that numeric arrays can be memory-mapped in place.
+
+MAGIC  = b"COBAROW1"
+HEADER = struct.Struct("<QII")
+LENGTH = struct.Struct("<I")
+
+def _pad(n: int) -> int:
+    return -n % 8
+
+def _byteorder() -> bytes:
+    return b'<' if sys.byteorder == 'little' else b'>'
+
+def _file_header() -> bytes:
+    return MAGIC + _byteorder() + b'\0'*7
+
+def is_blocks(filename: Union[str,Path]) -> bool:
+    """Determine whether a file is in the row block format.
+
+    Args:
+        filename: The file to check.
+
+    Returns:
+        True if the file starts with the row block magic bytes.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+class RowBlockSink(Sink[Iterable[Union[Dense,Sparse]]]):
+    """Write parsed rows to disk in a binary block format."""
+
+    def __init__(self, filename: Union[str,Path], block_size: int = 2**14) -> None:
+        """Instantiate a RowBlockSink.
+
+        Args:
+            filename: The path to the file to write to (any existing file is replaced).
+            block_size: The maximum number of rows to store in a block.
+        """
+        self._filename   = filename
+        self._block_size = block_size
+
+    def write(self, rows: Iterable[Union[Dense,Sparse]]) -> None:
+        rows = iter(rows)
+        temp = Path(f"{self._filename}.tmp")
+
+        #we write to a temporary file first so that a partially written file is never seen
+        try:
+            with open(temp, 'wb') as f:
+                f.write(_file_header())
+                while True:
+                    block = list(islice(rows,self._block_size))
+                    if not block: break
+                    f.write(self._block(block))
+            os.replace(temp, self._filename)
+        except:
+            if temp.exists(): temp.unlink()
+            raise
+
+    def _block(self, rows: Sequence[Union[Dense,Sparse]]) -> bytes:
+        missing = [ getattr(row,'missing',None) for row in rows ]
+        is_miss = any(m is not None for m in missing)
+
+        if isinstance(rows[0],Sparse):
+            header,blobs = self._sparse(rows)
+        else:
+            header,blobs = self._dense(rows)
+
+        if is_miss:
+            header['missing'] = self._column(blobs, [ -1 if m is None else int(m) for m in missing ], 'b')
+
+        header  = json.dumps(header,separators=(',', ':')).encode('utf-8')
+        header += b' '*_pad(LENGTH.size+len(header))
+        payload = b''.join([LENGTH.pack(len(header)), header, *blobs])
+
+        return HEADER.pack(len(payload), zlib.crc32(payload), len(rows)) + payload
+
+    def _dense(self, rows: Sequence[Dense]) -> Tuple[dict,list]:
+        if len(set(map(len,rows))) != 1:
+            raise CobaException("Dense rows with differing lengths can't be written in the block format.")
+
+        headers = getattr(rows[0],'headers',None)
+        columns = list(map(list,zip(*map(list,rows))))
+        blobs   = []
+
+        header = {'dense': True, 'cols': [self._column(blobs, c) for c in columns] }
+        if headers is not None: header['headers'] = sorted(headers, key=headers.__getitem__)
+        return header, blobs
+
+    def _sparse(self, rows: Sequence[Sparse]) -> Tuple[dict,list]:
+        keys, values, indptr, indices = {}, [], [0], []
+
+        for row in rows:
+            for k,v in row.items():
+                if k not in keys:
+                    keys[k] = len(keys)
+                    values.append([])
+                indices.append(keys[k])
+                values[keys[k]].append(v)
+            indptr.append(len(indices))
+
+        blobs  = []
+        header = {
+            'dense'  : False,
+            'keys'   : list(keys),
+            'indptr' : self._column(blobs, indptr, 'q'),
+            'indices': self._column(blobs, indices, 'i'),
+            'cols'   : [self._column(blobs, v) for v in values]
+        }
+
+        return header, blobs
+
+    def _column(self, blobs: list, values: Sequence[Any], code: str = None) -> list:
+        #the returned description is [code, n_bytes] plus the levels for categorical columns
+        extra = []
+
+        if code:
+            blob = array(code,values).tobytes()
+
+        elif all(v.__class__ is float for v in values):
+            code,blob = 'd', array('d',values).tobytes()
+
+        elif all(v.__class__ is int and -2**63 <= v < 2**63 for v in values):
+            code,blob = 'q', array('q',values).tobytes()
+
+        elif self._is_categorical(values):
+            levels = next(v.levels for v in values if v is not None)
+            lookup = dict(zip(levels,count()))
+            code   = 'c'
+            blob   = array('i',[-1 if v is None else lookup[v] for v in values]).tobytes()
+            extra  = [list(map(str,levels))]
+
+        else:
+            code,blob = 'j', coba.json.dumps(list(values),separators=(',', ':')).encode('utf-8')
+
+        blobs.append(blob + b'\0'*_pad(len(blob)))
+        return [code, len(blob), *extra]
+
+    def _is_categorical(self, values: Sequence[Any]) -> bool:
+        levels = None
+        for v in values:
+            if v is None: continue
+            if not isinstance(v,Categorical): return False
+            if levels is None: levels = v.levels
+            if v.levels is not levels and v.levels != levels: return False
+        return levels is not None
+
+class RowBlockSource(Source[Iterable[Union[Dense,Sparse]]]):
+    """Read parsed rows from a file written by RowBlockSink.
+
+    Remarks:
+        The file is memory-mapped and its typed arrays are read in place, so
+        only one block of rows is ever materialized at a time.
+    """
+
+    def __init__(self, filename: Union[str,Path]) -> None:
+        """Instantiate a RowBlockSource.
+
+        Args:
+            filename: The path to a row block file.
+        """
+        self._filename = filename
+
+    def read(self) -> Iterable[Union[Dense,Sparse]]:
+        with open(self._filename, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise CobaException(f"{self._filename} is not a row block file.")
+            swap = f.read(1) != _byteorder()
+            size = f.seek(0,2)
+            mm   = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            offset = len(_file_header())
+            cache  = {}
+            while offset < size:
+                rows,offset = self._block(mm, offset, size, swap, cache)
+                yield from rows
+        finally:
+            try:
+                mm.close()
+            except BufferError: #pragma: no cover
+                pass
+
+    def _block(self, mm: mmap.mmap, offset: int, size: int, swap: bool, cache: dict) -> Tuple[list,int]:
+        if offset + HEADER.size > size:
+            raise CobaException(f"{self._filename} has an incomplete block.")
+
+        length, crc, n = HEADER.unpack_from(mm, offset)
+        start, stop = offset+HEADER.size, offset+HEADER.size+length
+
+        if stop > size or zlib.crc32(memoryview(mm)[start:stop]) != crc:
+            raise CobaException(f"{self._filename} has a corrupted block.")
+
+        header_len = LENGTH.unpack_from(mm, start)[0]
+        header     = json.loads(mm[start+LENGTH.size:start+LENGTH.size+header_len])
+        position   = [start+LENGTH.size+header_len]
+
+        def column(desc):
+            code,nbytes,*extra = desc
+            values = self._values(mm, position[0], nbytes, code, swap, extra)
+            position[0] += nbytes + _pad(nbytes)
+            return values
+
+        if header['dense']:
+            columns = [ column(c) for c in header['cols'] ]
+            values  = list(map(list,zip(*columns))) if columns else [[] for _ in range(n)]
+            names   = header.get('headers')
+            if names is not None:
+                #share one header map across blocks just like the readers do across rows
+                names = cache.setdefault(('headers',tuple(names)), dict(zip(names,count())))
+        else:
+            indptr  = column(header['indptr'])
+            indices = column(header['indices'])
+            keys    = header['keys']
+            columns = [ iter(column(c)) for c in header['cols'] ]
+            values  = []
+            for i in range(n):
+                row = {}
+                for j in indices[indptr[i]:indptr[i+1]]:
+                    row[keys[j]] = next(columns[j])
+                values.append(row)
+
+        missing = column(header['missing']) if 'missing' in header else [-1]*n
+        missing = [ None if m == -1 else bool(m) for m in missing ]
+
+        if header['dense']:
+            rows = [ LazyDense(v, None, names, m) for v,m in zip(values,missing) ]
+        else:
+            rows = [ LazySparse(v, missing=m) for v,m in zip(values,missing) ]
+
+        return rows, stop
+
+    def _values(self, mm: mmap.mmap, start: int, nbytes: int, code: str, swap: bool, extra: list) -> Sequence[Any]:
+        if code == 'j':
+            return coba.json.loads(mm[start:start+nbytes])
+
+        typecode = 'i' if code == 'c' else code
+
+        if swap:
+            values = array(typecode, mm[start:start+nbytes])
+            values.byteswap()
+            values = values.tolist()
+        else:
+            with memoryview(mm) as buffer, buffer[start:start+nbytes] as view, view.cast(typecode) as typed:
+                values = typed.tolist()
+
+        if code == 'c':
+            levels = extra[0]
+            lookup = [ Categorical(level,levels) for level in levels ] + [None]
+            values = [ lookup[v] for v in values ]
+
+        return values
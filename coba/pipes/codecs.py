@@ -0,0 +1,226 @@
+import io
+import os
+import bz2
+import gzip
+import lzma
+
+from abc import ABC, abstractmethod
+from typing import IO, Any, Dict, Optional, Sequence
+
+from coba.utilities import PackageChecker
+
+class Codec(ABC):
+    """The interface for a compression codec.
+
+    Codecs are identified by the magic bytes at the start of the files they
+    write. This means files can be read without knowing how they were written.
+    """
+
+    magic: bytes = b''
+
+    @property
+    @abstractmethod
+    def params(self) -> Dict[str,Any]:
+        """Parameters describing the codec."""
+        ...
+
+    @abstractmethod
+    def _open(self, filename: str, mode: str) -> IO:
+        ...
+
+    def open(self, filename: str, mode: str) -> IO:
+        """Open a compressed file.
+
+        Args:
+            filename: The path of the file to open.
+            mode: The mode to open the file in (e.g., 'rt', 'ab'). Text is always utf-8.
+
+        Returns:
+            A file-like object.
+        """
+        #compressed streams can't be read and written at the same time
+        mode = mode.replace('+','')
+        if 'b' not in mode and 't' not in mode: mode += 't'
+        return self._open(filename, mode)
+
+    @classmethod
+    def matches(cls, start: bytes) -> bool:
+        """Determine whether the first bytes of a file were written by this codec."""
+        return start.startswith(cls.magic)
+
+    def _encoding(self, mode: str) -> Dict[str,str]:
+        return {'encoding':'utf-8'} if 't' in mode else {}
+
+class GzipCodec(Codec):
+    """A codec that compresses with gzip (i.e., zlib's deflate)."""
+
+    magic = b'\x1f\x8b'
+
+    def __init__(self, level: int = 6) -> None:
+        """Instantiate a GzipCodec.
+
+        Args:
+            level: The compression level from 0 (fastest) to 9 (smallest).
+        """
+        self._level = level
+
+    @property
+    def params(self) -> Dict[str,Any]:
+        return {'codec': 'gzip', 'level': self._level}
+
+    def _open(self, filename: str, mode: str) -> IO:
+        return gzip.open(filename, mode, compresslevel=self._level, **self._encoding(mode))
+
+class Bz2Codec(Codec):
+    """A codec that compresses with bz2."""
+
+    magic = b'BZh'
+
+    def __init__(self, level: int = 9) -> None:
+        """Instantiate a Bz2Codec.
+
+        Args:
+            level: The compression level from 1 (fastest) to 9 (smallest).
+        """
+        self._level = level
+
+    @property
+    def params(self) -> Dict[str,Any]:
+        return {'codec': 'bz2', 'level': self._level}
+
+    @classmethod
+    def matches(cls, start: bytes) -> bool:
+        #BZh is plausible text so we also check the block size and the first block (or end of stream) magic
+        return start[:3] == cls.magic and start[3:4].isdigit() and start[4:10] in (b'1AY&SY', b'\x17rE8P\x90')
+
+    def _open(self, filename: str, mode: str) -> IO:
+        return bz2.open(filename, mode, compresslevel=self._level, **self._encoding(mode))
+
+class LzmaCodec(Codec):
+    """A codec that compresses with lzma (i.e., xz)."""
+
+    magic = b'\xfd7zXZ\x00'
+
+    def __init__(self, level: int = 6) -> None:
+        """Instantiate a LzmaCodec.
+
+        Args:
+            level: The compression preset from 0 (fastest) to 9 (smallest).
+        """
+        self._level = level
+
+    @property
+    def params(self) -> Dict[str,Any]:
+        return {'codec': 'lzma', 'level': self._level}
+
+    def _open(self, filename: str, mode: str) -> IO:
+        #lzma only accepts a preset when compressing
+        preset = {} if 'r' in mode else {'preset': self._level}
+        return lzma.open(filename, mode, **preset, **self._encoding(mode))
+
+class ZstdCodec(Codec):
+    """A codec that compresses with zstandard.
+
+    Remarks:
+        This codec requires the zstandard package. Files written with it
+        can't be seeked so they can't be used where random access is needed.
+    """
+
+    magic = b'\x28\xb5\x2f\xfd'
+
+    def __init__(self, level: int = 3) -> None:
+        """Instantiate a ZstdCodec.
+
+        Args:
+            level: The compression level from 1 (fastest) to 22 (smallest).
+        """
+        PackageChecker.zstandard("ZstdCodec")
+        self._level = level
+
+    @property
+    def params(self) -> Dict[str,Any]:
+        return {'codec': 'zstd', 'level': self._level}
+
+    def _open(self, filename: str, mode: str) -> IO:
+        import zstandard
+        if 'r' in mode:
+            #appending to a file adds a frame so we need to read all of them
+            reader = zstandard.ZstdDecompressor().stream_reader(open(filename,'rb'), read_across_frames=True, closefd=True)
+            return io.TextIOWrapper(reader, encoding='utf-8') if 't' in mode else reader
+        return zstandard.open(filename, mode, cctx=zstandard.ZstdCompressor(level=self._level), **self._encoding(mode))
+
+class Lz4Codec(Codec):
+    """A codec that compresses with lz4.
+
+    Remarks:
+        This codec requires the lz4 package.
+    """
+
+    magic = b'\x04\x22\x4d\x18'
+
+    def __init__(self, level: int = 0) -> None:
+        """Instantiate a Lz4Codec.
+
+        Args:
+            level: The compression level from 0 (fastest) to 16 (smallest).
+        """
+        PackageChecker.lz4("Lz4Codec")
+        self._level = level
+
+    @property
+    def params(self) -> Dict[str,Any]:
+        return {'codec': 'lz4', 'level': self._level}
+
+    def _open(self, filename: str, mode: str) -> IO:
+        import lz4.frame
+        level = {} if 'r' in mode else {'compression_level': self._level}
+        return lz4.frame.open(filename, mode, **level, **self._encoding(mode))
+
+CODECS: Sequence[type] = (GzipCodec, Bz2Codec, LzmaCodec, ZstdCodec, Lz4Codec)
+
+def detect_codec(filename: str) -> Optional[Codec]:
+    """Determine the codec of a file from its magic bytes.
+
+    Args:
+        filename: The path of the file to check.
+
+    Returns:
+        A codec that can read the file or None if the file isn't compressed.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            start = f.read(10)
+    except OSError:
+        return None
+
+    for codec in CODECS:
+        if codec.matches(start):
+            return codec()
+
+    return None
+
+def open_file(filename: str, mode: str, codec: Codec = None) -> IO:
+    """Open a file that may be compressed.
+
+    Args:
+        filename: The path of the file to open.
+        mode: The mode to open the file with.
+        codec: The codec to use when writing a new file. When reading (or appending
+            to a non-empty file) the codec is detected from the file itself and the
+            given codec is only used if it is the same kind as the detected codec.
+
+    Returns:
+        A file-like object.
+    """
+    filename = str(filename)
+
+    if 'r' in mode or ('a' in mode and os.path.exists(filename) and os.path.getsize(filename)):
+        #we never want to mix codecs within a single file but when the given
+        #codec matches the file we use it so that its settings (e.g., level) apply
+        detected = detect_codec(filename)
+        codec    = codec if detected is not None and isinstance(codec,type(detected)) else detected
+
+    if codec is None:
+        return open(filename, mode)
+
+    return codec.open(filename, mode)
@@ -1,6 +1,12 @@
+import sys
 import math
+import pickle
+import weakref
+import tempfile
 
-from collections import defaultdict, abc
+from array import array
+
+from collections import defaultdict, abc, OrderedDict
 from itertools import islice, chain
 from typing import Iterable, Any, Sequence, Mapping, Optional, Union, Iterator
 
@@ -47,25 +53,91 @@ class Identity(Filter[Any, Any]):
 class Shuffle(Filter[Iterable[Any], Sequence[Any]]):
     """Shuffle a sequence of items."""
 
-    def __init__(self, seed:Optional[int]) -> None:
+    _n_buckets = 16
+
+    def __init__(self, seed:Optional[int], max_items: Optional[int] = None) -> None:
         """Instantiate a Shuffle filter.
 
         Args:
             seed: A random number seed which determines the new sequence order.
+            max_items: The maximum number of items to hold in memory while shuffling. When
+                more items than this are given they are spilled to temporary files in random
+                buckets. Each bucket is then read back, shuffled and yielded one at a time.
+                If every item fits in memory the order is identical to when max_items is None.
         """
 
         if seed is not None and (not isinstance(seed,int) or seed < 0):
             raise ValueError(f"Invalid parameter for Shuffle: {seed}. An optional integer value >= 0 was expected.")
 
-        self._seed = seed
+        if max_items is not None and (not isinstance(max_items,int) or max_items < 1):
+            raise ValueError(f"Invalid parameter for Shuffle: {max_items}. An optional integer value >= 1 was expected.")
+
+        self._seed      = seed
+        self._max_items = max_items
 
     def filter(self, items: Iterable[Any]) -> Sequence[Any]:
-        items = items.copy() if isinstance(items,list) else list(items)
-        yield from CobaRandom(self._seed).shuffle(items,inplace=True)
+        rng = CobaRandom(self._seed)
+
+        if isinstance(items,abc.Sequence) and (self._max_items is None or len(items) <= self._max_items):
+            #Shuffling indexes rather than items means many shuffles can share
+            #one sequence. The order is the same as if we shuffled the items.
+            yield from map(items.__getitem__, rng.shuffle(array('q',range(len(items))),inplace=True))
+
+        elif self._max_items is None:
+            items = list(items)
+            yield from rng.shuffle(items,inplace=True)
+
+        else:
+            items = iter(items)
+            first = list(islice(items,self._max_items+1))
+
+            if len(first) <= self._max_items:
+                yield from rng.shuffle(first,inplace=True)
+            else:
+                yield from self._spill(chain(first,items), rng)
+
+    def _spill(self, items: Iterable[Any], rng: CobaRandom) -> Iterable[Any]:
+        #Placing every item in a random bucket and then shuffling each bucket gives
+        #a uniformly random order (this is how MapReduce frameworks shuffle data).
+        n_buckets = self._n_buckets
+        max_items = self._max_items
+        counts    = [0]*n_buckets
+        buckets   = [ tempfile.TemporaryFile() for _ in range(n_buckets) ]
+
+        try:
+            items = iter(items)
+            while chunk := list(islice(items,max_items)):
+                spill = [ [] for _ in range(n_buckets) ]
+                for item,bucket in zip(chunk,rng.randints(len(chunk),0,n_buckets-1)):
+                    spill[bucket].append(item)
+                for bucket,(file,spilled) in enumerate(zip(buckets,spill)):
+                    if spilled:
+                        pickle.dump(spilled, file, protocol=pickle.HIGHEST_PROTOCOL)
+                        counts[bucket] += len(spilled)
+                del chunk, spill
+
+            for file,count in zip(buckets,counts):
+                file.seek(0)
+                if count <= max_items:
+                    yield from rng.shuffle(list(self._read(file)),inplace=True)
+                else:
+                    yield from self._spill(self._read(file), rng)
+                file.close()
+        finally:
+            for file in buckets: file.close()
+
+    def _read(self, file) -> Iterable[Any]:
+        while True:
+            try:
+                yield from pickle.load(file)
+            except EOFError:
+                return
 
     @property
     def params(self) -> Mapping[str, Any]:
-        return { "shuffle_seed": self._seed }
+        params = { "shuffle_seed": self._seed }
+        if self._max_items is not None: params["shuffle_max_items"] = self._max_items
+        return params
 
 class Take(Filter[Iterable[Any], Sequence[Any]]):
     """Take a fixed number of items from an iterable."""
@@ -382,11 +454,62 @@ class Default(Filter[Iterable[Union[Sequence,Mapping]], Iterable[Union[Sequence,
 
             yield row
 
+class CacheMemory:
+    """Track the memory used by caches in a process.
+
+    Remarks:
+        Memory is estimated from the size of the first slice a cache stores. When the
+        estimated total is larger than `CobaContext.cache_memory` the least recently
+        used caches are spilled to temporary files until the total is within budget.
+    """
+
+    def __init__(self) -> None:
+        self._sizes = OrderedDict()
+
+    @property
+    def budget(self) -> Optional[int]:
+        #imported here to avoid a circular dependency
+        from coba.context import CobaContext
+        return CobaContext.cache_memory
+
+    @property
+    def total(self) -> int:
+        return sum(size for _,size in self._sizes.values())
+
+    def touch(self, cache: 'Cache') -> None:
+        if id(cache) in self._sizes: self._sizes.move_to_end(id(cache))
+
+    def grow(self, cache: 'Cache', size: int) -> None:
+        key = id(cache)
+
+        if key not in self._sizes:
+            self._sizes[key] = [weakref.ref(cache, lambda _: self._sizes.pop(key,None)), 0]
+
+        self._sizes[key][1] += size
+        self._sizes.move_to_end(key)
+
+        budget = self.budget
+        while budget is not None and self._sizes and self.total > budget:
+            ref,_ = self._sizes.popitem(last=False)[1]
+            if ref() is not None: ref()._spill()
+
+    def drop(self, cache: 'Cache') -> None:
+        self._sizes.pop(id(cache),None)
+
 class Cache(Filter[Iterable[Any], Iterable[Any]]):
+    """Cache items so that they are only read once.
+
+    Remarks:
+        When `CobaContext.cache_memory` is set the least recently used caches in a process
+        are spilled to temporary files once the budget is exceeded. Spilled caches are
+        stored as pickled slices and are streamed back from disk when read.
+    """
 
     def __init__(self,n_slice:int=25,protected:bool=False) -> None:
         self._cache     = None
         self._iter      = None
+        self._file      = None
+        self._size      = None
         self._n_slice   = n_slice
         self._protected = protected
 
@@ -394,24 +517,103 @@ class Cache(Filter[Iterable[Any], Iterable[Any]]):
     def protected(self) -> bool:
         return self._protected
 
+    @property
+    def _empty(self) -> bool:
+        return self._iter is None and self._cache is None and self._file is None
+
     def filter(self, items: Iterable[Any]) -> Iterable[Any]:
         n_slice = self._n_slice
 
-        if self._iter is None and self._cache is None:
+        if self._empty:
             self._iter  = iter(items)
             self._cache = []
 
-        if self._cache is not None and self._iter is None:
-            yield from self._cache
+        _memory.touch(self)
+
+        if self._iter is None:
+            yield from self._cached()
             return
 
-        yield from self._cache
-        items = self._iter
+        budget = _memory.budget
+
+        yield from self._cached()
         while current := list(islice(self._iter,n_slice)):
-            self._cache.extend(current)
+            if self._file is None and budget is None:
+                self._cache.extend(current)
+            else:
+                self._store(current)
             yield from current
         self._iter = None
 
+    def _cached(self) -> Iterable[Any]:
+        if self._file is None:
+            yield from self._cache
+        else:
+            position = 0
+            while True:
+                #other readers may move the file so we always seek
+                self._file.seek(position)
+                try:
+                    items = pickle.load(self._file)
+                except EOFError:
+                    return
+                position = self._file.tell()
+                yield from items
+
+    def _store(self, items: list) -> None:
+        if self._file is not None:
+            self._file.seek(0,2)
+            pickle.dump(items, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            self._cache.extend(items)
+            if self._size is None: self._size = _sizeof(items)/len(items)
+            _memory.grow(self, int(self._size*len(items)))
+
+    def _spill(self) -> None:
+        if self._file is None and self._cache is not None:
+            n_slice    = self._n_slice or max(len(self._cache),1)
+            self._file = tempfile.TemporaryFile()
+            for i in range(0,len(self._cache),n_slice):
+                pickle.dump(self._cache[i:i+n_slice], self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._cache = None
+        _memory.drop(self)
+
+    def __getstate__(self) -> dict:
+        #temporary files can't be pickled so spilled items are read back
+        state = self.__dict__.copy()
+        if self._file is not None:
+            state['_cache'] = list(self._cached())
+            state['_file' ] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        #caches filled in another process count against this process's budget
+        if self._cache and _memory.budget is not None:
+            self._size = self._size or _sizeof(self._cache[:25])/len(self._cache[:25])
+            _memory.grow(self, int(self._size*len(self._cache)))
+
+def _sizeof(item: Any, seen: set = None) -> int:
+    #An estimate of the memory used by an item (and everything it references).
+    seen = set() if seen is None else seen
+
+    if id(item) in seen: return 0
+    seen.add(id(item))
+
+    size = sys.getsizeof(item)
+
+    if isinstance(item, (str,bytes,int,float,bool)) or item is None:
+        return size
+    if isinstance(item, abc.Mapping):
+        return size + sum(_sizeof(k,seen)+_sizeof(v,seen) for k,v in item.items())
+    if isinstance(item, (list,tuple,set,frozenset)):
+        return size + sum(_sizeof(i,seen) for i in item)
+    if hasattr(item, '__dict__'):
+        return size + _sizeof(item.__dict__,seen)
+    return size
+
+_memory = CacheMemory()
+
 class Insert(Filter[Iterable[Any], Iterable[Any]]):
     def __init__(self, insert_items: Sequence[Any]) -> None:
         self._insert_items = insert_items
@@ -4,7 +4,7 @@ import multiprocessing as mp
 
 from collections.abc import Iterator
 from queue import Empty
-from typing import Iterable, Mapping, Callable, Union, Any
+from typing import Iterable, Mapping, Callable, Union, Hashable, Sequence, Any
 
 from coba.primitives import Filter, Line
 from coba.utilities import peek_first, PackageChecker
@@ -154,6 +154,45 @@ class Stopper:
             if self._stop: break
             yield item
 
+class AffinityRouter:
+    """Route items to queues so that items with the same key always go to the same queue."""
+
+    def __init__(self, queues: Sequence[mp.Queue], affinity: Callable[[Any],Hashable]) -> None:
+        self._queues   = queues
+        self._sinks    = [QueueSink(queue,foreach=True) for queue in queues]
+        self._affinity = affinity
+        self._routes   = {}
+        self._loads    = [0]*len(queues)
+        self._closed   = set()
+
+    def close(self, index: int) -> None:
+        """Stop routing to a queue whose process has stopped and empty it so writes can't block on it."""
+        self._closed.add(index)
+        try:
+            while True: self._queues[index].get_nowait()
+        except Empty:
+            pass
+
+    def write(self, items: Iterable[Any]) -> None:
+        pickler = Pickler()
+        for item in items:
+            key   = self._affinity(item)
+            alive = [i for i in range(len(self._queues)) if i not in self._closed]
+
+            if not alive: return
+
+            if key is not None and self._routes.get(key) in alive:
+                index = self._routes[key]
+            else:
+                #new keys go to the least loaded queue with room so that idle processes
+                #are not starved while a busy process works through its own backlog
+                room  = [i for i in alive if not self._queues[i].full()] or alive
+                index = min(room, key=self._loads.__getitem__)
+                if key is not None: self._routes[key] = index
+
+            self._loads[index] += 1
+            self._sinks[index].write(pickler.filter([item]))
+
 class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
     """Create multiple processes to filter given items."""
 
@@ -161,18 +200,22 @@ class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
             filter: Filter[Iterable[Any], Iterable[Any]],
             n_processes: int = 1,
             maxtasksperchild: int = 0,
-            read_wait: bool = False) -> None:
+            read_wait: bool = False,
+            affinity: Callable[[Any],Hashable] = None) -> None:
         """Instantiate a Multiprocessor.
 
         Args:
             filter: The inner pipe that will be executed on multiple processes.
             n_processes: The number of processes that should be created to filter items.
             maxtasksperchild: The number of items/chunks a process should filter before restarting.
+            affinity: A function returning a key for each item. Items with the same key are always
+                filtered by the same process. Items whose key is None can go to any process.
         """
         self._filter           = filter
         self._max_processes    = n_processes
         self._maxtasksperchild = maxtasksperchild or None
         self._read_wait        = read_wait
+        self._affinity         = affinity
 
     @property
     def params(self) -> Mapping[str,Any]:
@@ -190,12 +233,18 @@ class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
         else:
             event = spawn_context.Event()
 
-            #for some reason if this mp queue get too big we can't keyboradinterrupt
-            #therefore, we slightly limit its size and then empty it before closing.
-            in_queue  = spawn_context.Queue(maxsize=self._max_processes*2)
+            if self._affinity is None:
+                #for some reason if this mp queue get too big we can't keyboradinterrupt
+                #therefore, we slightly limit its size and then empty it before closing.
+                in_queues = [spawn_context.Queue(maxsize=self._max_processes*2)]
+            else:
+                #With affinity every process has its own queue. These are limited in size
+                #too so that keys are only assigned to a process once it has room for them.
+                in_queues = [spawn_context.Queue(maxsize=2) for _ in range(self._max_processes)]
+
             out_queue = spawn_context.Queue()
-            in_put    = QueueSink(in_queue,foreach=True)
-            in_get    = QueueSource(in_queue) #make one of these for each process??
+            in_puts   = [QueueSink(in_queue,foreach=True) for in_queue in in_queues]
+            in_gets   = [QueueSource(in_queue) for in_queue in in_queues]
             out_put   = QueueSink(out_queue,foreach=True)
             out_get   = QueueSource(out_queue)
             pickler   = Pickler()
@@ -209,12 +258,23 @@ class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
             self._main_err     = False
             self._load_stopper = Stopper() #this works because the loader is a thread which means we have shared memory
 
-            load_line   = SourceSink(IterableSource(items), self._load_stopper, pickler, in_put)
-            filter_line = SourceSink(in_get, setter, unpickler, get_max, Safe(Foreach(self._filter)), out_put)
+            safe_filter = Safe(Foreach(self._filter))
+
+            if self._affinity is None:
+                router    = None
+                load_line = SourceSink(IterableSource(items), self._load_stopper, pickler, in_puts[0])
+            else:
+                router    = AffinityRouter(in_queues, self._affinity)
+                load_line = SourceSink(IterableSource(items), self._load_stopper, router)
+
+            filter_lines = [SourceSink(in_gets[i%len(in_gets)], setter, unpickler, get_max, safe_filter, out_put) for i in range(self._n_procs)]
 
             def loader_finished_or_failed(worker: Union[ThreadLine,ProcessLine]):
                 if worker.exception: self._exceptions.append(worker.exception)
-                in_put.write(self._load_stopper.filter([self._poison]*self._n_procs))
+                if len(in_puts) == 1:
+                    in_puts[0].write(self._load_stopper.filter([self._poison]*self._n_procs))
+                else:
+                    for in_put in in_puts: in_put.write(self._load_stopper.filter([self._poison]))
 
             def filter_finished_or_failed(worker: Union[ThreadLine,ProcessLine]):
                 if worker.exception: self._exceptions.append(worker.exception)
@@ -235,6 +295,8 @@ class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
                 if not worker.poisoned and not self._exceptions and worker.exitcode == 0:
                     MyProcessLine(worker.pipeline,filter_finished_or_failed,read_waiters).start()
                 else:
+                    #a stopped process no longer empties its own queue
+                    if router: router.close(in_gets.index(worker.pipeline[0]))
                     self._n_procs -= 1
                     if self._n_procs == 0:
                         try:
@@ -243,7 +305,7 @@ class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
                             pass
 
             load_thread = ThreadLine(load_line,loader_finished_or_failed)
-            filt_procs  = [MyProcessLine(filter_line,filter_finished_or_failed,read_waiters) for _ in range(self._n_procs)]
+            filt_procs  = [MyProcessLine(filter_line,filter_finished_or_failed,read_waiters) for filter_line in reversed(filter_lines)]
 
             try:
                 load_thread.start()
@@ -268,13 +330,14 @@ class Multiprocessor(Filter[Iterable[Any], Iterable[Any]]):
                 #empty the input queue and then close it
                 #if we don't empty first then we can easily
                 #lock during a keyboard interrupt
-                try:
-                    while True: in_queue.get_nowait()
-                except Empty:
-                    pass
-                    #closing can cause exceptions
-                    #and doesn't seem to help anything
-                    #in_queue.close()
+                for in_queue in in_queues:
+                    try:
+                        while True: in_queue.get_nowait()
+                    except Empty:
+                        pass
+                        #closing can cause exceptions
+                        #and doesn't seem to help anything
+                        #in_queue.close()
 
                 #empty the input queue and then close it
                 #if we don't empty first then we can easily
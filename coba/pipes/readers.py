@@ -273,7 +273,8 @@ class ArffLineReader(Filter[str, Sequence[str]]):
 
 class ArffReader(Filter[Iterable[str], Iterable[Union[Dense,Sparse]]]):
 
-    _strip = methodcaller("strip")
+    _strip      = methodcaller("strip")
+    _block_size = 2**10
 
     def __init__(self):
         """Instantiate an ArffReader."""
@@ -298,7 +299,13 @@ class ArffReader(Filter[Iterable[str], Iterable[Union[Dense,Sparse]]]):
 
         headers,encoders = zip(*attr_reader.filter(attrs))
 
-        if is_dense:
+        if is_dense and all(e is float for e in encoders):
+            hdr_map = dict(zip(headers, count()))
+            delim   = ',' if ',' in first_data or len(attrs) == 1 else '\t'
+            for block in self._blocks(data):
+                yield from self._dense_numeric(block, delim, encoders, hdr_map, data_reader, line_reader)
+
+        elif is_dense:
             hdr_map = dict(zip(headers, count()))
             for line,missing in data_reader.filter(data):
                 yield LazyDense(lambda line=line:line_reader.filter(line),encoders,hdr_map,missing)
@@ -316,6 +323,46 @@ class ArffReader(Filter[Iterable[str], Iterable[Union[Dense,Sparse]]]):
             for line,missing in data_reader.filter(data):
                 yield LazySparse(lambda line=line:line_reader.filter(line), encs, nsp, fwd, inv, missing)
 
+    def _blocks(self, lines: Iterable[str]) -> Iterable[Sequence[str]]:
+        lines = iter(lines)
+        while block := list(islice(lines,self._block_size)):
+            block = [ l for l in block if l[0] != "%" ]
+            if block: yield block
+
+    def _dense_numeric(self,
+        block: Sequence[str],
+        delim: str,
+        encoders: Sequence[Callable],
+        hdr_map: Mapping[str,int],
+        data_reader: ArffDataReader,
+        line_reader: ArffLineReader) -> Iterable[Dense]:
+        #When every column is numeric most blocks can be converted to floats in a single
+        #pass. Blocks with missing values, quotes or malformed lines fall back line by line.
+        n = len(encoders)
+
+        if set(map(methodcaller('count',delim),block)) == {n-1}:
+            try:
+                values = list(map(float,delim.join(block).split(delim)))
+            except ValueError:
+                pass
+            else:
+                for i in range(0,len(values),n):
+                    yield LazyDense(values[i:i+n], None, hdr_map, False)
+                return
+
+        for line in block:
+            try:
+                values = line.split(delim)
+                values = list(map(float,values)) if len(values) == n else None
+            except ValueError:
+                values = None
+
+            if values is not None:
+                yield LazyDense(values, None, hdr_map, False)
+            else:
+                for line,missing in data_reader.filter([line]):
+                    yield LazyDense(lambda line=line:line_reader.filter(line),encoders,hdr_map,missing)
+
 class LibsvmReader(Filter[Iterable[str], Iterable[Tuple[MutableMapping,Any]]]):
     """A filter capable of parsing Libsvm formatted data.
 
@@ -1,5 +1,3 @@
-import gzip
-
 from queue import Queue
 from itertools import islice
 from collections import abc
@@ -8,6 +6,7 @@ from typing import Callable, Any, List, Union, Sequence, Iterable, Mapping, Iter
 from coba.primitives import Sink, Filter
 from coba.utilities import try_else
 from coba.pipes.utilities import resolve_params
+from coba.pipes.codecs import Codec, GzipCodec, open_file
 
 class FiltersSink(Sink):
     def __init__(self, *pipes: Union[Filter,Sink]) -> None:
@@ -48,17 +47,19 @@ class ConsoleSink(Sink[Any]):
 class DiskSink(Sink[Union[str,Sequence[str]]]):
     """A sink which writes to a file on disk.
 
-    This sink supports writing in either plain text or as a gz compressed file.
-    In order to make this distinction gzip files must end with a gz extension.
+    This sink supports writing in either plain text or with a compression codec.
+    When appending to an existing file the codec that file was written with is used.
+    Otherwise new files are gzip compressed if they have a gz extension by default.
     """
 
-    def __init__(self, filename:str, mode:str='a+', batch:int=None) -> None:
+    def __init__(self, filename:str, mode:str='a+', batch:int=None, codec: Codec = None) -> None:
         """Instantiate a DiskSink.
 
         Args:
             filename: The path to the file to write.
             mode: The mode with which the file should be written.
             batch: The number of lines to write before closing and reopening the file.
+            codec: The codec to compress new files with.
         """
 
         #Gzip compression performance is relative to batch size
@@ -69,15 +70,14 @@ class DiskSink(Sink[Union[str,Sequence[str]]]):
         self._file     = None
         self._mode     = mode
         self._batch    = batch
+        self._codec    = codec
 
     def __enter__(self) -> 'DiskSink':
         self._count += 1
 
         if self._file is None:
-            if ".gz" in self._filename:
-                self._file = gzip.open(self._filename, f"{self._mode}b", compresslevel=6)
-            else:
-                self._file = open(self._filename, f"{self._mode}b")
+            codec = self._codec or (GzipCodec() if ".gz" in self._filename else None)
+            self._file = open_file(self._filename, f"{self._mode}b", codec)
 
         return self
 
@@ -10,6 +10,7 @@ from coba.exceptions import CobaException
 from coba.primitives import Source, Filter
 from coba.utilities  import try_else
 from coba.pipes.utilities import resolve_params
+from coba.pipes.codecs import open_file
 
 class SourceFilters(Source):
     def __init__(self, *pipes: Union[Source,Filter]) -> None:
@@ -79,8 +80,8 @@ class NextSource(Source[Any]):
 class DiskSource(Source[Iterable[str]]):
     """A source that reads a file from disk.
 
-    This source supports reading both plain text files as well gz compressed file.
-    In order to make this distinction gzip files must end with a gz extension.
+    This source supports reading both plain text files and compressed files.
+    The compression codec of a file is detected from its first few bytes.
     """
 
     def __init__(self, path:str, mode:str='rt+', start_loc:int = 0, include_loc: bool = False):
@@ -103,8 +104,7 @@ class DiskSource(Source[Iterable[str]]):
         #and this stackoverflow question points out a shortcoming
         #with this implementation #https://stackoverflow.com/a/59168992/1066291
 
-        opener = gzip.open if ".gz" in self._path else open
-        with opener(self._path, self._mode) as f:
+        with open_file(self._path, self._mode) as f:
             f.seek(self._start_loc)
             loc,line = f.tell(), f.readline()
             while line != '':
@@ -11,9 +11,23 @@ from itertools import compress, accumulate, islice
 from operator import mul,add
 from typing import Optional, Iterable, Sequence, Union, Tuple, Any
 
+from coba.utilities import PackageChecker
+
 class CobaRandom:
     """A random number generator."""
 
+    #The LCG parameters (see __init__ for where they come from).
+    _a, _c, _m = 116646453, 9, 2**30
+
+    #The jump-ahead coefficients used to generate blocks of the LCG sequence with numpy.
+    #The k-th state after s is (_jump_a[k-1]*s + _jump_c[k-1]) % _m for k in [1,_jump_n].
+    _jump_n = 2**14
+    _jump_a = None
+    _jump_c = None
+
+    #The fewest numbers that are worth generating with numpy.
+    _bulk_n = 64
+
     def __init__(self, seed: Optional[float] = None) -> None:
         """Instantiate a CobaRandom generator.
 
@@ -37,7 +51,9 @@ class CobaRandom:
             seed = int.from_bytes(str(seed or time.time()).encode('utf-8'),"big") % 2**20
 
         self._seed  = seed
-        self._randu = self._next_uniform(116646453,seed,9,2**30)
+        self._state = seed & (self._m-1)
+        self._block = iter(())
+        self._randu = self._next_uniform()
         self._randg = self._next_gaussian()
 
     @property
@@ -73,14 +89,22 @@ class CobaRandom:
 
         min  = float(min)
         diff = max-min
-        out  = self._randu
+
+        if n is not None and n >= self._bulk_n and PackageChecker.numpy(strict=False):
+            #the same float operations as below applied to every value at once
+            out = self._uniforms(n, as_array=True)
+            if diff != 1: out = diff*out
+            if min != 0: out = min+out
+            return out.tolist()
+
+        out = self._take(n) if n is not None else self._randu
 
         if diff != 1:
             out = map(diff.__mul__,out)
         if min != 0:
             out = map(min.__add__,out)
 
-        return list(islice(out,n)) if n is not None else out
+        return list(out) if n is not None else out
 
     def shuffle(self, items: Iterable[Any], inplace: bool = False) -> Sequence[Any]:
         """Shuffle the order of items in a sequence.
@@ -106,7 +130,13 @@ class CobaRandom:
 
         #i goes from 0 to n-2
         #j is always i <= j < n
-        for i,j in enumerate(map(add,range(n),map(floor,map(mul,range(n,1,-1),self._randu)))):
+        if n > self._bulk_n and PackageChecker.numpy(strict=False):
+            import numpy as np
+            J = (np.arange(n-1) + np.floor(np.arange(n,1,-1)*self._uniforms(n-1,as_array=True))).astype(int).tolist()
+        else:
+            J = map(add,range(n),map(floor,map(mul,range(n,1,-1),self._take(n-1))))
+
+        for i,j in enumerate(J):
             l[i], l[j] = l[j], l[i]
 
         return l
@@ -137,10 +167,10 @@ class CobaRandom:
         """
         b=b+1
         if a == 0:
-            return [floor(b*r) for r in islice(self._randu,n)]
+            return [floor(b*r) for r in self._take(n)]
         else:
             r_range = b-a
-            return [floor(r_range*r) + a for r in islice(self._randu,n)]
+            return [floor(r_range*r) + a for r in self._take(n)]
 
     def choice(self, seq: Sequence[Any], weights:Sequence[float] = None) -> Any:
         """Choose a random item from the given sequence.
@@ -179,6 +209,46 @@ class CobaRandom:
             i = self.choice(range(len(seq)),weights)
             return seq[i], weights[i]
 
+    def choicews(self, seqs: Sequence[Sequence[Any]], weights: Sequence[Sequence[float]]) -> Tuple[Sequence[Any],Sequence[float]]:
+        """Choose a random item from each of the given sequences.
+
+        Args:
+            seqs: The sequences to pick randomly from.
+            weights: The frequency which each sequence's items are selected.
+
+        Remarks:
+            This gives the same choices as calling `choicew` for each sequence in order.
+
+        Returns:
+            The random item chosen from each sequence along with its weight.
+        """
+        if len(seqs) != len(weights):
+            raise ValueError("The number of sequences and weights must be equal.")
+
+        if not seqs: return [], []
+
+        if len(seqs) < self._bulk_n or not PackageChecker.numpy(strict=False):
+            return tuple(map(list,zip(*map(self.choicew,seqs,weights))))
+
+        import numpy as np
+
+        lens = list(map(len,weights))
+        if any(w is None for w in weights) or list(map(len,seqs)) != lens:
+            return tuple(map(list,zip(*map(self.choicew,seqs,weights))))
+
+        #rows are padded with zeros which can never be chosen because u*tot < tot
+        padded = np.zeros((len(weights),max(lens)))
+        padded[np.arange(max(lens)) < np.array(lens)[:,None]] = [w for W in weights for w in W]
+
+        cumsums = np.cumsum(padded,axis=1) #cumsum adds in order just like accumulate
+        totals  = cumsums[np.arange(len(lens)),np.array(lens)-1]
+
+        if (totals == 0).any(): raise ValueError("The sum of weights cannot be zero.")
+
+        choices = ((self._uniforms(len(seqs),as_array=True)*totals)[:,None] <= cumsums).argmax(axis=1).tolist()
+
+        return [ seq[i] for seq,i in zip(seqs,choices) ], [ W[i] for W,i in zip(weights,choices) ]
+
     def gauss(self, mu:float=0, sigma:float=1) -> float:
         """Generate a random number from N(mu,sigma).
 
@@ -204,17 +274,69 @@ class CobaRandom:
         """
         return [mu+sigma*g for g in islice(self._randg,n) ]
 
-    def _next_uniform(self, a, s, c, m) -> Iterable[float]:
+    def _next_uniform(self) -> Iterable[float]:
         """Generate uniform random numbers in [0,1).
 
         Random numbers are generated using a linear congruential generator.
         """
-        m_1 = m-1
+        #Blocks start small because many generators are only used for a few numbers.
+        #The current block is kept on self so that _take can draw from it directly.
+        n = 1
         while True:
-            #when m is a power of 2
-            #this is equal to modulo m
-            s = (a * s + c) & (m_1)
-            yield s/m
+            self._block = iter(self._uniforms(n))
+            yield from self._block
+            n = min(2*n, self._jump_n)
+
+    def _take(self, n: int) -> Sequence[float]:
+        """Take the next `n` uniform random numbers in [0,1)."""
+        out = list(islice(self._block,n))
+        if len(out) < n: out.extend(self._uniforms(n-len(out)))
+        return out
+
+    def _uniforms(self, n: int, as_array: bool = False) -> Sequence[float]:
+        """Generate the `n` numbers after the current block of uniform random numbers."""
+
+        if as_array:
+            #the remainder of the current block always comes first
+            import numpy as np
+            head = np.array(list(islice(self._block,n)),dtype=float)
+            n   -= len(head)
+        elif n < self._bulk_n or not PackageChecker.numpy(strict=False):
+            a,s,c,m = self._a, self._state, self._c, self._m
+            m_1 = m-1
+            out = []
+            for _ in range(n):
+                #when m is a power of 2
+                #this is equal to modulo m
+                s = (a * s + c) & (m_1)
+                out.append(s/m)
+            self._state = s
+            return out
+        else:
+            import numpy as np
+            head = np.empty(0)
+
+        if CobaRandom._jump_a is None:
+            jump_a, jump_c, a, c = [], [], 1, 0
+            for _ in range(self._jump_n):
+                a, c = (a*self._a) % self._m, (c*self._a+self._c) % self._m
+                jump_a.append(a)
+                jump_c.append(c)
+            CobaRandom._jump_a = np.array(jump_a,dtype=np.uint64)
+            CobaRandom._jump_c = np.array(jump_c,dtype=np.uint64)
+
+        #states are below 2**30 so every product is below 2**60 and fits in 64 bits
+        states = np.empty(n,dtype=np.uint64)
+        state  = np.uint64(self._state)
+        mask   = np.uint64(self._m-1)
+        for i in range(0,n,self._jump_n):
+            k = min(self._jump_n,n-i)
+            np.bitwise_and(self._jump_a[:k]*state+self._jump_c[:k], mask, out=states[i:i+k])
+            state = states[i+k-1]
+        self._state = int(state)
+
+        out = np.concatenate([head, states/self._m])
+        return out if as_array else out.tolist()
 
     def _next_gaussian(self) -> Iterable[float]:
         """Generate `n` gaussian random numbers in N(0,1).
@@ -342,6 +464,18 @@ def choicew(seq: Sequence[Any], weights:Sequence[float]=None) -> Tuple[Any,float
     """
     return _random.choicew(seq, weights)
 
+def choicews(seqs: Sequence[Sequence[Any]], weights: Sequence[Sequence[float]]) -> Tuple[Sequence[Any],Sequence[float]]:
+    """Choose a random item from each of the given sequences.
+
+    Args:
+        seqs: The sequences to pick randomly from.
+        weights: The frequency which each sequence's items are selected.
+
+    Returns:
+        The random item chosen from each sequence along with its weight.
+    """
+    return _random.choicews(seqs, weights)
+
 def gauss(mu:float=0, sigma:float=1) -> float:
     """Generate a random number from N(mu,sigma).
 
@@ -1,5 +1,6 @@
 from coba.registry     import CobaRegistry
 from coba.pipes        import NullSink, ConsoleSink, DiskSink, HttpSource
+from coba.pipes        import GzipCodec, Bz2Codec, LzmaCodec, ZstdCodec, Lz4Codec
 from coba.environments import OpenmlSimulation, SupervisedSimulation
 from coba.environments import Sort, Scale, Cycle, Shuffle, Take, Identity, Where, Repr, Reservoir
 from coba.context      import DiskCacher, NullCacher, IndentLogger, NullLogger, BasicLogger
@@ -20,6 +21,12 @@ CobaRegistry.register("NullLogger"  , NullLogger  )
 CobaRegistry.register("DiskCacher", DiskCacher)
 CobaRegistry.register("NullCacher", NullCacher)
 
+CobaRegistry.register("GzipCodec", GzipCodec)
+CobaRegistry.register("Bz2Codec" , Bz2Codec )
+CobaRegistry.register("LzmaCodec", LzmaCodec)
+CobaRegistry.register("ZstdCodec", ZstdCodec)
+CobaRegistry.register("Lz4Codec" , Lz4Codec )
+
 CobaRegistry.register("OpenmlSimulation"    , OpenmlSimulation    )
 CobaRegistry.register("SupervisedSimulation", SupervisedSimulation)
 
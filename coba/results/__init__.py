@@ -1,4 +1,5 @@
 """Efficient Result loading, slicing, and analyzing """
 
-from coba.results.core import Table, Result, TransactionDecode, TransactionEncode, TransactionResult, moving_average, Missing
+from coba.results.core import Table, Result, LazyResult, TransactionDecode, TransactionEncode, TransactionResult, moving_average, Missing
+from coba.results.columnar import ColumnarEncode, ColumnarSink, ColumnarSource
 from coba.results.errors import PointAndInterval, StdDevCI, StdErrCI, BootstrapCI, BinomialCI
@@ -0,0 +1,404 @@
+import os
+import sys
+import mmap
+import zlib
+import json
+import struct
+import collections.abc
+
+from array import array
+from bisect import bisect_right
+from itertools import chain, repeat
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping, Sequence, Tuple, Union
+
+import coba.json
+from coba.exceptions import CobaException
+from coba.primitives import Filter, Sink, Source
+from coba.utilities import minimize
+
+from coba.results.core import Table, Result, Missing
+
+# The columnar format is an append-only sequence of records following a file header.
+#   > The file header is MAGIC followed by the byteorder of the machine that created the file.
+#   > Every record is a 16 byte header (payload length, payload crc32, kind) followed by its payload.
+#   > Records with kind J hold a JSON transaction (i.e., experiment, E, L, or V).
+#   > Records with kind I hold the interactions for one (environment_id, learner_id, evaluator_id).
+#     Their payload is a small JSON header describing the columns followed by one array per column.
+# All records and arrays are padded to 8 bytes so that numeric arrays can be memory-mapped in place.
+# Because records are only ever appended, a crash can at worst leave a partial record at the end of
+# the file. Such a record fails its length or crc32 check and is dropped when the file is read.
+
+MAGIC  = b"COBACOL1"
+HEADER = struct.Struct("<QIcxxx")
+LENGTH = struct.Struct("<I")
+
+def _pad(n: int) -> int:
+    return -n % 8
+
+def is_columnar(filename: Union[str,Path]) -> bool:
+    """Determine whether a file is in the columnar result format.
+
+    Args:
+        filename: The file to check.
+
+    Returns:
+        True if the file starts with the columnar magic bytes.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+class SegmentedColumn(collections.abc.Sequence):
+    """A column made by lazily concatenating segments.
+
+    Remarks:
+        The segments are copied into a single list the first time the column
+        is modified (e.g., when a Table is re-indexed or has rows inserted).
+    """
+
+    __slots__ = ('_segments','_starts','_len','_list')
+
+    def __init__(self, segments: Sequence[Sequence[Any]]) -> None:
+        self._list     = None
+        self._segments = list(segments)
+        self._starts   = [0]
+        for segment in self._segments: self._starts.append(self._starts[-1]+len(segment))
+        self._len      = self._starts.pop()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key: Union[int,slice]) -> Any:
+        if isinstance(key,slice):
+            start,stop,step = key.indices(self._len)
+            if step != 1: return self[start:stop][::step]
+            if start >= stop: return []
+
+            values = []
+            index  = bisect_right(self._starts,start)-1
+            while start < stop:
+                segment_start = self._starts[index]
+                segment       = self._segments[index]
+                segment_stop  = min(stop-segment_start,len(segment))
+                values.extend(segment[start-segment_start:segment_stop])
+                start  = segment_start+segment_stop
+                index += 1
+            return values
+
+        if key < 0: key += self._len
+        if not 0 <= key < self._len: raise IndexError("SegmentedColumn index out of range")
+        index = bisect_right(self._starts,key)-1
+        return self._segments[index][key-self._starts[index]]
+
+    def __setitem__(self, key: Union[int,slice], value: Any) -> None:
+        if isinstance(key,slice): value = list(value)
+        self._materialize()[key] = value
+        self._len = len(self._list)
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._segments)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self._materialize().extend(values)
+        self._len = len(self._list)
+
+    def _materialize(self) -> list:
+        if self._list is None:
+            self._list     = list(self)
+            self._segments = [self._list]
+            self._starts   = [0]
+        return self._list
+
+    def __eq__(self, o: object) -> bool:
+        return isinstance(o,collections.abc.Sequence) and len(self) == len(o) and all(a == b for a,b in zip(self,o))
+
+class RepeatSegment(collections.abc.Sequence):
+    """A segment with a single repeated value."""
+
+    __slots__ = ('_value','_len')
+
+    def __init__(self, value: Any, n: int) -> None:
+        self._value = value
+        self._len   = n
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key: Union[int,slice]) -> Any:
+        if isinstance(key,slice): return [self._value]*len(range(*key.indices(self._len)))
+        if not -self._len <= key < self._len: raise IndexError("RepeatSegment index out of range")
+        return self._value
+
+    def __iter__(self) -> Iterator[Any]:
+        return repeat(self._value,self._len)
+
+class ArraySegment(collections.abc.Sequence):
+    """A segment of typed values backed by a memory-mapped buffer."""
+
+    __slots__ = ('_view',)
+
+    def __init__(self, view: memoryview) -> None:
+        self._view = view
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def __getitem__(self, key: Union[int,slice]) -> Any:
+        return self._view[key].tolist() if isinstance(key,slice) else self._view[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._view.tolist())
+
+class JsonSegment(collections.abc.Sequence):
+    """A segment of JSON encoded values that is only decoded when first accessed."""
+
+    __slots__ = ('_view','_values','_len','_tuples')
+
+    def __init__(self, view: memoryview, n: int, tuples: bool) -> None:
+        self._view   = view
+        self._values = None
+        self._len    = n
+        self._tuples = tuples
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key: Union[int,slice]) -> Any:
+        return self._decoded()[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._decoded())
+
+    def _decoded(self) -> Sequence[Any]:
+        if self._values is None:
+            values = coba.json.loads(bytes(self._view))
+            #this matches how TransactionResult restores packed values
+            if self._tuples: values = [ tuple(v) if isinstance(v,list) else v for v in values ]
+            self._values = values
+        return self._values
+
+class ColumnarEncode(Filter[Iterable[Any], Iterable[bytes]]):
+    """Encode experiment transactions as columnar records."""
+
+    def filter(self, transactions: Iterable[Any]) -> Iterable[bytes]:
+        for item in transactions:
+            if item[0] == "T0":
+                yield self._json_record(['experiment', item[1]])
+
+            elif item[0] == "T1":
+                yield self._json_record(["E", item[1], item[2]])
+
+            elif item[0] == "T2":
+                yield self._json_record(["L", item[1], item[2]])
+
+            elif item[0] == "T3":
+                yield self._json_record(["V", item[1], item[2]])
+
+            elif item[0] == "T4":
+                if isinstance(item[2],collections.abc.Mapping):
+                    cols = {str(key): list(item[2][key]) for key in item[2].keys()}
+                else:
+                    keys = set().union(*[r.keys() for r in item[2]])
+                    cols = {str(key): [row.get(key,None) for row in item[2]] for key in keys}
+                yield self._int_record(item[1], cols)
+
+    def _json_record(self, transaction: Any) -> bytes:
+        payload = coba.json.dumps(minimize(transaction),separators=(',', ':')).encode('utf-8')
+        return self._record(b'J', payload + b' '*_pad(len(payload)))
+
+    def _int_record(self, key: Sequence[int], cols: Mapping[str,Sequence[Any]]) -> bytes:
+        n     = len(next(iter(cols.values()))) if cols else 0
+        metas = []
+        blobs = []
+
+        for name in sorted(cols):
+            code,blob = self._encode_column(cols[name])
+            metas.append([name, code, len(blob)])
+            blobs.append(blob + b'\0'*_pad(len(blob)))
+
+        header  = json.dumps({"key": list(key), "n": n, "cols": metas},separators=(',', ':')).encode('utf-8')
+        header += b' '*_pad(LENGTH.size+len(header))
+        return self._record(b'I', b''.join([LENGTH.pack(len(header)), header, *blobs]))
+
+    def _encode_column(self, values: Sequence[Any]) -> Tuple[str,bytes]:
+        values = values.tolist() if hasattr(values,'ndim') else values
+
+        if values and all(isinstance(v,bool) for v in values):
+            return '?', array('b',values).tobytes()
+
+        if values and all(isinstance(v,int) and not isinstance(v,bool) and -2**63 <= v < 2**63 for v in values):
+            return 'q', array('q',values).tobytes()
+
+        if values and all(isinstance(v,(int,float)) and not isinstance(v,bool) for v in values):
+            return 'd', array('d',values).tobytes()
+
+        return 'j', coba.json.dumps(minimize(list(values)),separators=(',', ':')).encode('utf-8')
+
+    def _record(self, kind: bytes, payload: bytes) -> bytes:
+        return HEADER.pack(len(payload), zlib.crc32(payload), kind) + payload
+
+class ColumnarSink(Sink[Iterable[bytes]]):
+    """Append columnar records to a file on disk."""
+
+    def __init__(self, filename: Union[str,Path]) -> None:
+        """Instantiate a ColumnarSink.
+
+        Args:
+            filename: The path to the file to append to.
+        """
+        self._filename = filename
+
+    def write(self, records: Iterable[bytes]) -> None:
+        with open(self._filename, 'a+b') as f:
+            f.seek(0)
+            size  = os.fstat(f.fileno()).st_size
+            start = f.read(len(_file_header()))
+
+            if size >= len(start) == len(_file_header()) and start.startswith(MAGIC):
+                #a previous run may have crashed in the middle of a record
+                end = _last_valid_offset(f)
+                if end != size: f.truncate(end)
+            elif _file_header().startswith(start):
+                #the file is empty or a previous run crashed while writing the header
+                f.truncate(0)
+                f.write(_file_header())
+            else:
+                raise CobaException(f"{self._filename} is not a columnar result file.")
+
+            for record in records:
+                f.write(record)
+                f.flush()
+
+class ColumnarSource(Source[Result]):
+    """Load a Result from a columnar result file.
+
+    Remarks:
+        Interaction columns are memory-mapped rather than read into memory.
+        Values are only materialized when they are accessed.
+    """
+
+    def __init__(self, filename: Union[str,Path]) -> None:
+        """Instantiate a ColumnarSource.
+
+        Args:
+            filename: The path to a columnar result file.
+        """
+        self._filename = filename
+
+    def read(self) -> Result:
+        env_rows = collections.defaultdict(dict)
+        lrn_rows = collections.defaultdict(dict)
+        val_rows = collections.defaultdict(dict)
+        int_segs = {}
+        exp_dict = {}
+
+        def list2tuple(item:dict):
+            return {k: tuple(v) if isinstance(v,list) else v for k,v in item.items()}
+
+        with open(self._filename, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise CobaException(f"{self._filename} is not a columnar result file.")
+            end    = _last_valid_offset(f)
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+        swap = buffer[len(MAGIC):len(MAGIC)+1].tobytes() != _byteorder()
+        offset = len(_file_header())
+
+        while offset < end:
+            length, _, kind = HEADER.unpack_from(buffer, offset)
+            payload = buffer[offset+HEADER.size:offset+HEADER.size+length]
+            offset += HEADER.size+length
+
+            if kind == b'J':
+                trx = coba.json.loads(bytes(payload))
+                if trx[0] == "experiment": exp_dict = trx[1]
+                if trx[0] == "E": env_rows[trx[1]].update(list2tuple(trx[2]))
+                if trx[0] == "L": lrn_rows[trx[1]].update(list2tuple(trx[2]))
+                if trx[0] == "V": val_rows[trx[1]].update(list2tuple(trx[2]))
+
+            if kind == b'I':
+                header_len = LENGTH.unpack_from(payload)[0]
+                header     = json.loads(bytes(payload[LENGTH.size:LENGTH.size+header_len]))
+                key,n      = tuple(header['key'] + [0]*(3-len(header['key']))), header['n']
+                position   = LENGTH.size+header_len
+                columns    = {}
+
+                for name,code,nbytes in header['cols']:
+                    view = payload[position:position+nbytes]
+                    position += nbytes + _pad(nbytes)
+                    columns[name] = self._segment(view, code, n, name != 'rewards', swap)
+
+                if n: int_segs[key] = (n, columns)
+                else: int_segs.pop(key,None)
+
+        env_table = Table(columns=['environment_id']).index('environment_id')
+        lrn_table = Table(columns=['learner_id'    ]).index('learner_id'    )
+        val_table = Table(columns=['evaluator_id'  ]).index('evaluator_id'  )
+
+        env_table.insert([{"environment_id":e, **r} for e,r in sorted(env_rows.items())])
+        lrn_table.insert([{"learner_id"    :l, **r} for l,r in sorted(lrn_rows.items())])
+        val_table.insert([{"evaluator_id"  :v, **r} for v,r in sorted(val_rows.items())])
+
+        return Result(env_table, lrn_table, val_table, self._int_table(int_segs), exp_dict)
+
+    def _segment(self, view: memoryview, code: str, n: int, tuples: bool, swap: bool) -> Sequence[Any]:
+        if code == 'j':
+            return JsonSegment(view, n, tuples)
+
+        if code == '?':
+            return ArraySegment(view.cast('?'))
+
+        if swap:
+            values = array(code, view.tobytes())
+            values.byteswap()
+            return ArraySegment(memoryview(values))
+
+        return ArraySegment(view.cast(code))
+
+    def _int_table(self, int_segs: Mapping[Tuple[int,int,int],Tuple[int,Mapping[str,Sequence]]]) -> Table:
+        keys     = sorted(int_segs.keys())
+        ids      = ['environment_id','learner_id','evaluator_id','index']
+        names    = set().union(*[cols.keys() for _,cols in int_segs.values()]) - set(ids)
+        columns  = ids + sorted(names)
+        segments = {c:[] for c in columns}
+
+        for key in keys:
+            n,cols = int_segs[key]
+            segments['environment_id'].append(RepeatSegment(key[0],n))
+            segments['learner_id'    ].append(RepeatSegment(key[1],n))
+            segments['evaluator_id'  ].append(RepeatSegment(key[2],n))
+            segments['index'         ].append(range(1,n+1))
+            for name in columns[4:]:
+                segments[name].append(cols[name] if name in cols else RepeatSegment(Missing,n))
+
+        data = {c:SegmentedColumn(segments[c]) for c in columns}
+        return Table(data, columns, ids)
+
+def _byteorder() -> bytes:
+    return b'<' if sys.byteorder == 'little' else b'>'
+
+def _file_header() -> bytes:
+    return MAGIC + _byteorder() + b'\0'*7
+
+def _last_valid_offset(f) -> int:
+    """Find where the last complete record in a columnar file ends."""
+    size   = os.fstat(f.fileno()).st_size
+    offset = len(_file_header())
+    last   = None
+
+    while offset + HEADER.size <= size:
+        f.seek(offset)
+        length,crc,_ = HEADER.unpack(f.read(HEADER.size))
+        if offset + HEADER.size + length > size: break
+        last,offset = (offset,crc),offset+HEADER.size+length
+
+    #Only the final record can have been torn by a crash so it is the only one we check.
+    if last:
+        f.seek(last[0]+HEADER.size)
+        length = offset-last[0]-HEADER.size
+        if zlib.crc32(f.read(length)) != last[1]: offset = last[0]
+
+    return offset
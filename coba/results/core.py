@@ -1,3 +1,4 @@
+import os
 import re
 import json
 import collections
@@ -19,7 +20,7 @@ from coba.statistics import mean
 from coba.context import CobaContext, NullLogger
 from coba.exceptions import CobaException
 from coba.utilities import PackageChecker, peek_first, KeyDefaultDict, minimize, try_else, grouper
-from coba.pipes import Pipes, DiskSource
+from coba.pipes import Pipes, DiskSource, Multiprocessor, detect_codec, open_file
 
 from coba.results.errors import StdDevCI, StdErrCI, BootstrapCI, BinomialCI, PointAndInterval
 
@@ -182,14 +183,18 @@ class View:
 class Table:
     """Tabular data with an index."""
 
-    __slots__ = ('_data', '_columns', '_indexes', '_lohis')
+    __slots__ = ('_data', '_columns', '_indexes', '_lohis', '_arrays')
     #Potentially overkill, however, by having our own "simple" table implementation we can provide
     #several useful pieces of functionality out of the box. Additionally, when working with
     #very large experiments pandas can become quite slow while Table works acceptably.
+    #When numpy is installed, `where` and the group bounds are computed from numpy arrays that
+    #are built from a column on first use and cached until the next insert. The columns
+    #themselves stay python lists so that Views, inserts and pandas exports are unchanged.
 
     def __init__(self, data:Union[Mapping, Sequence[Mapping], Sequence[Sequence]] = (), columns: Sequence[str] = (), indexes: Sequence[str]= ()):
         self._columns = tuple(columns) or tuple(data)
         self._lohis   = None
+        self._arrays  = {}
 
         data_is_view            = isinstance(data,View)
         data_is_mapping_of_cols = isinstance(data,collections.abc.Mapping)
@@ -258,6 +263,7 @@ class Table:
                 self._data[hdr].extend(col)
 
         if self._lohis: self._lohis = {}
+        self._arrays = {}
 
         return self
 
@@ -279,6 +285,7 @@ class Table:
         for col in self._data.keys()-set(indx):
             self._data[col][:] = map(self._data[col].__getitem__,indexes)
 
+        self._arrays  = {}
         self._indexes = tuple(indx)
         self._lohis = self._calc_lohis()
 
@@ -315,7 +322,9 @@ class Table:
                         for l,h in self._compare(lo,hi,self._data[kw],arg,comparison,"bisect"):
                             selection.extend(range(l,h))
                 else:
-                    selection.extend(self._compare(0,len(self),self._data[kw],arg,comparison,"foreach"))
+                    selected = self._numpy_compare(kw,arg,comparison)
+                    if selected is None: selected = self._compare(0,len(self),self._data[kw],arg,comparison,"foreach")
+                    selection.extend(selected)
 
             if len(kwargs) > 1: selection=sorted(set(selection))
 
@@ -404,9 +413,44 @@ class Table:
         #pretty print in jupyter notebook (https://ipython.readthedocs.io/en/stable/config/integrating.html)
         print(str(self))
 
+    def _array(self, col: str, strings: bool = False):
+        #Returns col as a numpy array when numpy is installed and every value in col is a
+        #number (or every value is a string if strings is True). Otherwise returns None so
+        #that callers can fall back to pure python. Arrays are cached until the table changes.
+        key = (col,strings)
+
+        if key not in self._arrays:
+            self._arrays[key] = None
+            column = self._data[col]
+            first  = column[0] if len(column) else None
+            kinds  = 'biuf' if isinstance(first,Number) else 'U' if isinstance(first,str) and strings else ''
+
+            if kinds and PackageChecker.numpy(strict=False):
+                import numpy as np
+                try:
+                    array = np.asarray(column if isinstance(column,list) else list(column))
+                except (ValueError,TypeError):
+                    array = None
+                if array is not None and array.ndim == 1 and array.dtype.kind in kinds:
+                    self._arrays[key] = array
+
+        return self._arrays[key]
+
     def _calc_lohis(self):
         if not self._indexes: return {}
 
+        keys = [self._array(col,strings=True) for col in self._indexes[:-1]]
+
+        if keys and len(self) and all(key is not None for key in keys) and PackageChecker.numpy(strict=False):
+            import numpy as np
+            #a group ends wherever any of its index columns (or a parent's) changes value
+            lohis,changes = [[(0,len(self))]], np.zeros(len(self)-1,dtype=bool)
+            for key in keys:
+                changes |= key[1:] != key[:-1]
+                bounds = [0,*(np.flatnonzero(changes)+1).tolist(),len(self)]
+                lohis.append(list(zip(bounds[:-1],bounds[1:])))
+            return dict(zip(self._indexes,lohis))
+
         lohis = [[(0,len(self))]]
 
         for k in self._indexes[:-1]:
@@ -495,6 +539,52 @@ class Table:
                 _re = re.compile(str(arg))
                 return [ i for i,c in enumerate(col,lo) if c is not None and _re.search(str(c)) ]
 
+    def _numpy_compare(self,kw,arg,comparison):
+        #A vectorized version of the foreach comparisons. This only handles numeric
+        #columns compared against numbers and returns None for everything else.
+        if isinstance(arg,dict) and len(arg) == 1:
+            key,value = list(arg.items())[0]
+            if key in ['=','!=','<=','<','>','>=','match','in']:
+                comparison,arg = key,value
+
+        if callable(arg) or comparison == "match": return None
+
+        array = self._array(kw)
+        if array is None: return None
+
+        is_number = lambda a: isinstance(a,Number)
+        is_iter   = isinstance(arg,collections.abc.Iterable) and not isinstance(arg,str)
+
+        import numpy as np
+
+        if comparison == "in" or (comparison is None and is_iter):
+            if not is_iter or not all(map(is_number,arg)): return None
+            mask = np.isin(array,list(arg))
+        elif comparison == "!in":
+            if not is_iter or not all(map(is_number,arg)): return None
+            mask = ~np.isin(array,list(arg))
+        elif not is_number(arg):
+            return None
+        elif comparison == "=" or comparison is None:
+            mask = array == arg
+        elif comparison == "!=":
+            mask = array != arg
+        elif comparison == "<":
+            mask = array < arg
+        elif comparison == "<=":
+            mask = array <= arg
+        elif comparison == ">":
+            mask = array > arg
+        elif comparison == ">=":
+            mask = array >= arg
+        else:
+            return None
+
+        return np.flatnonzero(mask).tolist()
+
+def packed_list2tuple(item:dict):
+    return {k: list(map(tuple,v)) if k != 'rewards' and isinstance(v[0],list) else v for k,v in item.items()}
+
 class TransactionDecode:
     def filter(self, transactions:Iterable[str]) -> Iterable[Any]:
         transactions = iter(filter(None,map(methodcaller('strip'),transactions)))
@@ -503,6 +593,62 @@ class TransactionDecode:
             yield ver_row
             yield from map(json.loads,transactions)
 
+class TransactionRangeDecode:
+    """Decode the transactions in a byte range of a transaction file.
+
+    This is used to decode a transaction file on multiple processes. Each range
+    must begin at the start of a line and end at the end of a line.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self._filename = filename
+
+    def filter(self, byte_range: Tuple[int,int,int]) -> Tuple[int,List[Any]]:
+        index, start, stop = byte_range
+
+        transactions = []
+
+        with open(self._filename,'rb') as f:
+            f.seek(start)
+            for line in f:
+                if start >= stop: break
+                start += len(line)
+                line   = line.strip()
+                if line: transactions.append(json.loads(line))
+
+        #packing is independent per transaction so we do it here rather than on the main process
+        for trx in transactions:
+            if trx[0] == "I" and trx[2].get('_packed'):
+                trx[2]['_packed'] = packed_list2tuple(trx[2]['_packed'])
+
+        return index, transactions
+
+    @staticmethod
+    def ranges(filename: str, n: int) -> Sequence[Tuple[int,int,int]]:
+        """Split a transaction file into at most n line-aligned byte ranges."""
+        size   = os.path.getsize(filename)
+        bounds = [0]
+
+        with open(filename,'rb') as f:
+            for i in range(1,n):
+                f.seek(size*i//n)
+                f.readline()
+                if bounds[-1] < f.tell() < size: bounds.append(f.tell())
+
+        bounds.append(size)
+        return [ (i,start,stop) for i,(start,stop) in enumerate(zip(bounds,bounds[1:])) ]
+
+    @staticmethod
+    def ordered(blocks: Iterable[Tuple[int,List[Any]]]) -> Iterable[List[Any]]:
+        """Yield decoded blocks in range order as soon as every earlier block has arrived."""
+        pending, next_index = {}, 0
+
+        for index, block in blocks:
+            pending[index] = block
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+
 class TransactionEncode:
     def __init__(self,restored):
         self._restored = restored
@@ -527,6 +673,11 @@ class TransactionEncode:
             elif item[0] == "T3":
                 yield encoder(["V", item[1], item[2]])
 
+            elif item[0] == "T4" and isinstance(item[2],collections.abc.Mapping):
+                #the evaluator already gave us columns so we can skip transposing rows
+                cols = {str(key): list(item[2][key]) for key in sorted(item[2].keys(),key=str)}
+                yield encoder(["I", item[1], { "_packed": cols }])
+
             elif item[0] == "T4":
                 rows_T = collections.defaultdict(list)
 
@@ -552,9 +703,6 @@ class TransactionResult:
         def list2tuple(item:dict):
             return {k: tuple(v) if isinstance(v,list) else v for k,v in item.items()}
 
-        def packed_list2tuple(item:dict):
-            return {k: list(map(tuple,v)) if k != 'rewards' and isinstance(v[0],list) else v for k,v in item.items()}
-
         if version == 3:
             raise CobaException("Deprecated transaction format. Please revert to an older version of Coba to read it.")
 
@@ -822,23 +970,62 @@ class Result:
         return Pipes.join(source,TransactionDecode(),TransactionResult()).read()
 
     @staticmethod
-    def from_save(filename: Union[str,Source[str]]) -> 'Result':
+    def from_save(filename: Union[str,Source[str]], lazy: bool = False, processes: int = 1) -> 'Result':
         """Load Result from an Experiment log.
 
         Args:
-            filename: The path to an experiment log.
+            filename: The path to an experiment log. If this is a directory then the logs of every
+                shard in the directory are merged into a single Result (see Experiment.run).
+            lazy: Indicates if interactions should only be decoded once they are needed. Lazy
+                results apply filter_env, filter_lrn, and filter_val before decoding interactions
+                which makes loading a small part of a large log considerably faster.
+            processes: The number of processes to use when decoding the log. This has no effect
+                on lazy results or compressed logs.
 
         Returns:
             A Result object.
         """
         if not Path(filename).exists():
             raise CobaException("We were unable to find the given Result file.")
+
+        if Path(filename).is_dir():
+            return Result.from_shards(filename)
+
+        from coba.results.columnar import is_columnar, ColumnarSource
+        if is_columnar(filename):
+            return ColumnarSource(filename).read()
+
+        if lazy:
+            return LazyResult.from_save(filename)
+
+        if processes > 1 and detect_codec(filename) is None:
+            #several small ranges per process means only a few decoded blocks wait on earlier ones
+            ranges = TransactionRangeDecode.ranges(filename, processes*4)
+            blocks = Multiprocessor(TransactionRangeDecode(filename), processes).filter(ranges)
+            return TransactionResult().filter(chain.from_iterable(TransactionRangeDecode.ordered(blocks)))
+
         return Result.from_source(DiskSource(filename))
 
     @staticmethod
-    def from_file(filename: str) -> 'Result':
+    def from_file(filename: str, lazy: bool = False, processes: int = 1) -> 'Result':
         """Create a Result from a transaction file."""
-        return Result.from_save(filename)
+        return Result.from_save(filename, lazy, processes)
+
+    @staticmethod
+    def from_shards(directory: str) -> 'Result':
+        """Merge the shard logs written by a sharded Experiment into a single Result.
+
+        Args:
+            directory: The directory shared by every shard of the Experiment.
+
+        Returns:
+            A Result object.
+        """
+        logs = [log for log in sorted(Path(directory).glob('*.log')) if log.stat().st_size > 0]
+
+        #every shard begins with a version row so we keep the first and drop the rest
+        shards = [ islice(TransactionDecode().filter(DiskSource(str(log)).read()),1,None) for log in logs ]
+        return TransactionResult().filter(chain([["version",4]],*shards))
 
     @staticmethod
     def from_logged_envs(environments: Iterable[Environment], include_prob:bool=False):
@@ -2016,3 +2203,136 @@ class Result:
 
         select.extend(range(loc,n_interactions))
         return select
+
+class LazyResult(Result):
+    """A Result whose interactions are only decoded when they are first needed.
+
+    Loading a LazyResult reads environment, learner, and evaluator transactions while
+    only recording the byte offset of every interaction transaction. Filtering on
+    environments, learners, or evaluators then happens against these offsets so that
+    only interactions which survive the filters are ever decoded.
+    """
+
+    @staticmethod
+    def from_save(filename: str) -> 'LazyResult':
+        """Load a LazyResult from an Experiment log.
+
+        Args:
+            filename: The path to an experiment log.
+
+        Returns:
+            A LazyResult object.
+        """
+        if not Path(filename).exists():
+            raise CobaException("We were unable to find the given Result file.")
+
+        locs = {}
+
+        def metadata(lines: Iterable[Tuple[int,str]]) -> Iterable[Any]:
+            for loc,line in lines:
+                line = line.strip()
+                if not line: continue
+                if line.startswith('["I",'):
+                    #we only decode the ids so that we don't pay to decode every interaction
+                    key = tuple(json.loads(line[5:line.index(']',5)+1]))
+                    key = (key+(0,))[:3]
+                    if line.endswith('{"_packed":{}}]'):
+                        locs.pop(key,None)
+                    else:
+                        locs[key] = loc
+                else:
+                    yield json.loads(line)
+
+        meta = TransactionResult().filter(metadata(DiskSource(filename,include_loc=True).read()))
+        return LazyResult(filename, locs, meta.environments, meta.learners, meta.evaluators, meta.experiment)
+
+    def __init__(self,
+        filename: str,
+        locs: Mapping[Tuple[int,int,int],int],
+        env_rows: Table,
+        lrn_rows: Table,
+        val_rows: Table,
+        exp_dict: Mapping = {}) -> None:
+        """Instantiate a LazyResult.
+
+        This constructor should never be called directly. Instead use Result.from_file(filename, lazy=True).
+        """
+        super().__init__(env_rows, lrn_rows, val_rows, None, exp_dict)
+        self._filename = filename
+        self._locs     = locs
+
+    @property
+    def interactions(self) -> Table:
+        """The evaluated interactions in the Experiment.
+
+        The primary key of this Table is (environment_id, learner_id, evaluator_id, index).
+        """
+        if self._locs is not None:
+            self._interactions = TransactionResult().filter(self._decode()).interactions
+            self._locs = None
+        return self._interactions
+
+    def filter_env(self, pred:Callable[[Mapping[str,Any]],bool] = None, **kwargs: Any) -> 'Result':
+        if self._locs is None: return super().filter_env(pred, **kwargs)
+        if len(self.environments) == 0: return self
+
+        environments = self.environments.where(pred, **kwargs)
+
+        if len(environments) == len(self.environments):
+            return self
+
+        if len(environments) == 0:
+            CobaContext.logger.log(f"No environments matched the given filter.")
+
+        keep = set(environments['environment_id'])
+        return self._subset({k:v for k,v in self._locs.items() if k[0] in keep}, environments=environments)
+
+    def filter_lrn(self, pred:Callable[[Mapping[str,Any]],bool] = None, **kwargs: Any) -> 'Result':
+        if self._locs is None: return super().filter_lrn(pred, **kwargs)
+        if len(self.learners) == 0: return self
+
+        learners = self.learners.where(pred, **kwargs)
+
+        if len(learners) == len(self.learners):
+            return self
+
+        if len(learners) == 0:
+            CobaContext.logger.log(f"No learners matched the given filter.")
+
+        keep = set(learners['learner_id'])
+        return self._subset({k:v for k,v in self._locs.items() if k[1] in keep}, learners=learners)
+
+    def filter_val(self, pred:Callable[[Mapping[str,Any]],bool] = None, **kwargs: Any) -> 'Result':
+        if self._locs is None: return super().filter_val(pred, **kwargs)
+        if len(self.evaluators) == 0: return self
+
+        evaluators = self.evaluators.where(pred, **kwargs)
+
+        if len(evaluators) == len(self.evaluators):
+            return self
+
+        if len(evaluators) == 0:
+            CobaContext.logger.log(f"No evaluators matched the given filter.")
+
+        keep = set(evaluators['evaluator_id'])
+        return self._subset({k:v for k,v in self._locs.items() if k[2] in keep}, evaluators=evaluators)
+
+    def __str__(self) -> str:
+        return str({"Learners": len(self._learners), "Environments": len(self._environments), "Interactions": len(self.interactions) })
+
+    def _subset(self, locs: Mapping[Tuple[int,int,int],int], environments:Table=None, learners:Table=None, evaluators:Table=None) -> 'LazyResult':
+        env_ids,lrn_ids,val_ids = (set(ids) for ids in zip(*locs)) if locs else (set(),set(),set())
+
+        environments = (self.environments if environments is None else environments).where(environment_id=env_ids)
+        learners     = (self.learners     if learners     is None else learners    ).where(learner_id    =lrn_ids)
+        evaluators   = (self.evaluators   if evaluators   is None else evaluators  ).where(evaluator_id  =val_ids)
+
+        return LazyResult(self._filename, locs, environments, learners, evaluators, self.experiment)
+
+    def _decode(self) -> Iterable[Any]:
+        yield ["version",4]
+        with open_file(self._filename, 'rt') as f:
+            #visiting offsets in file order means we only ever seek forward
+            for loc in sorted(self._locs.values()):
+                f.seek(loc)
+                yield json.loads(f.readline())
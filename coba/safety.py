@@ -342,7 +342,7 @@ class SafeLearner(Learner):
 
             A,P = [],[]
             if self._pred_format[:2] == 'PM':
-                A, P = list(map(list, zip(*map(self._rng.choicew,actions, pred))))
+                A, P = self._rng.choicews(actions, pred)
 
             if self._pred_format[:2] == 'AX':
                 A = pred
@@ -361,7 +361,7 @@ class SafeLearner(Learner):
                 pred = list(pred.values())[0]
 
             if self._pred_format[:2] == 'PM':
-                A, P = list(map(list, zip(*map(self._rng.choicew,actions, pred))))
+                A, P = self._rng.choicews(actions, pred)
 
             if self._pred_format[:2] == 'AX':
                 A = pred
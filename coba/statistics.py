@@ -2,7 +2,7 @@ from math import hypot, erf, sqrt
 from statistics import fmean
 from sys import version_info
 from operator import mul, sub
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right
 from itertools import repeat, accumulate, compress, chain
 from typing import Sequence, Tuple, Union, Optional
 
@@ -121,6 +121,11 @@ class OnlineVariance:
         """The variance of all given updates."""
         return self._variance
 
+    @property
+    def mean(self) -> float:
+        """The mean of all given updates."""
+        return self._mean if self._count else float("nan")
+
     def update(self, value: float) -> None:
         """Update the current variance with the given value."""
         (count,mean,M2) = (self._count, self._mean, self._M2)
@@ -153,3 +158,74 @@ class OnlineMean:
         self._n += 1
         alpha = 1/self._n
         self._mean = value if alpha == 1 else (1 - alpha) * self._mean + alpha * value
+
+class OnlineQuantile:
+    """Estimate a quantile in an online fashion with constant memory.
+
+    Remarks:
+        This algorithm is known as the P-Square algorithm. It tracks five markers
+        whose heights are adjusted with a piecewise-parabolic formula as values arrive.
+        Until five values have been seen the exact quantile is returned.
+
+    References:
+        Jain, Raj, and Imrich Chlamtac. "The P2 algorithm for dynamic calculation of quantiles
+        and histograms without storing observations." Communications of the ACM 28, no. 10 (1985).
+    """
+
+    def __init__(self, quantile: float) -> None:
+        """Instantiate an OnlineQuantile calculator.
+
+        Args:
+            quantile: The quantile to estimate (e.g., .5 for the median).
+        """
+        assert 0 <= quantile <= 1, "Quantile must be between 0 and 1 inclusive."
+
+        p = quantile
+
+        self._p       = p
+        self._heights = []
+        self._actual  = [0,1,2,3,4]
+        self._desired = [0,2*p,4*p,2+2*p,4]
+        self._deltas  = [0,p/2,p,(1+p)/2,1]
+
+    @property
+    def quantile(self) -> float:
+        """The estimated quantile of all given updates."""
+        if not self._heights: return float('nan')
+        if len(self._heights) < 5: return percentile(self._heights, self._p)
+        return self._heights[2]
+
+    def update(self, value: float) -> None:
+        """Update the current quantile estimate with the given value."""
+        q = self._heights
+
+        if len(q) < 5:
+            q.append(value)
+            q.sort()
+            return
+
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = bisect_right(q,value,1,4)-1
+
+        n,desired,deltas = self._actual,self._desired,self._deltas
+
+        for i in range(k+1,5): n[i] += 1
+        for i in range(5): desired[i] += deltas[i]
+
+        for i in (1,2,3):
+            d = desired[i]-n[i]
+            if (d >= 1 and n[i+1]-n[i] > 1) or (d <= -1 and n[i-1]-n[i] < -1):
+                d = 1 if d > 0 else -1
+                h = self._parabolic(i,d)
+                q[i] = h if q[i-1] < h < q[i+1] else q[i] + d*(q[i+d]-q[i])/(n[i+d]-n[i])
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q,n = self._heights,self._actual
+        return q[i] + d/(n[i+1]-n[i-1]) * ((n[i]-n[i-1]+d)*(q[i+1]-q[i])/(n[i+1]-n[i]) + (n[i+1]-n[i]-d)*(q[i]-q[i-1])/(n[i]-n[i-1]))
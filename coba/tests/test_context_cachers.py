@@ -241,6 +241,40 @@ class DiskCacher_Tests(unittest.TestCase):
             self.assertEqual(list(out), ["test\n", "test2\n"])
             self.assertTrue("test.csv" in cache)
 
+    def test_write_rows_to_cache(self):
+        cache = DiskCacher(self.Cache_Test_Dir)
+        self.assertFalse("test.arff" in cache)
+
+        with cache.get_set("test.arff", lambda: [[1.,'a'],[2.,'b']]) as out:
+            self.assertEqual(list(map(list,out)), [[1.,'a'],[2.,'b']])
+            self.assertTrue("test.arff" in cache)
+
+        with cache.get_set("test.arff", None) as out:
+            self.assertEqual(list(map(list,out)), [[1.,'a'],[2.,'b']])
+
+        self.assertTrue((self.Cache_Test_Dir / "test.arff.rows").exists())
+        self.assertFalse((self.Cache_Test_Dir / "test.arff.gz").exists())
+
+    def test_rmv_rows_from_cache(self):
+        cache = DiskCacher(self.Cache_Test_Dir)
+        cache.get_set("test.arff", lambda: [{'a':1.}])
+        self.assertTrue("test.arff" in cache)
+        cache.rmv("test.arff")
+        self.assertFalse("test.arff" in cache)
+        self.assertFalse((self.Cache_Test_Dir / "test.arff.rows").exists())
+
+    def test_put_corrupted_rows(self):
+
+        def bad_data():
+            yield [1.]
+            raise Exception()
+
+        with self.assertRaises(Exception) as e:
+            DiskCacher(self.Cache_Test_Dir).get_set("test.arff", bad_data())
+
+        self.assertNotIn("test.arff", DiskCacher(self.Cache_Test_Dir))
+        self.assertFalse((self.Cache_Test_Dir / "test.arff.rows").exists())
+
 class ConcurrentCacher_Test(unittest.TestCase):
 
     def test_rmv_works_correctly_single_thread(self):
@@ -657,6 +691,67 @@ class ConcurrentCacher_Test(unittest.TestCase):
 
         self.assertFalse(curr_cacher._has_write_lock(1))
 
+    def test_distinct_keys_do_not_share_locks(self):
+        curr_cacher = ConcurrentCacher(MemoryCacher(),[0]*4)
+
+        curr_cacher._acquire_write_lock(1)
+        curr_cacher._acquire_write_lock(2)
+
+        self.assertNotEqual(curr_cacher._index(1), curr_cacher._index(2))
+
+        curr_cacher._release_write_lock(1)
+        curr_cacher._release_write_lock(2)
+
+        self.assertEqual([0,0], curr_cacher._array[1::2])
+
+    def test_released_slots_are_reused(self):
+        curr_cacher = ConcurrentCacher(MemoryCacher(),[0]*2)
+
+        curr_cacher._acquire_write_lock(1)
+        curr_cacher._release_write_lock(1)
+        curr_cacher._acquire_write_lock(2)
+        self.assertEqual(-1, curr_cacher._array[curr_cacher._index(2)])
+        curr_cacher._release_write_lock(2)
+
+    def test_full_table_waits_for_release(self):
+        curr_cacher = ConcurrentCacher(MemoryCacher(),[0]*2)
+        curr_cacher._acquire_write_lock(1)
+
+        def thread_1():
+            curr_cacher._acquire_write_lock(2)
+            curr_cacher._release_write_lock(2)
+
+        t1 = mt.Thread(None, thread_1, daemon=True)
+        t1.start()
+
+        while curr_cacher._write_waits == 0: time.sleep(0.01)
+        curr_cacher._release_write_lock(1)
+        t1.join(2)
+
+        self.assertFalse(t1.is_alive())
+        self.assertEqual(0, curr_cacher._write_waits)
+
+    def test_waiter_wakes_on_release(self):
+        curr_cacher = ConcurrentCacher(MemoryCacher(),lock=mt.Lock())
+        curr_cacher._acquire_write_lock(1)
+        released = []
+
+        def thread_1():
+            curr_cacher._acquire_read_lock(1)
+            released.append(time.time())
+            curr_cacher._release_read_lock(1)
+
+        t1 = mt.Thread(None, thread_1, daemon=True)
+        t1.start()
+
+        while curr_cacher._read_waits == 0: time.sleep(0.01)
+        start = time.time()
+        curr_cacher._release_write_lock(1)
+        t1.join(2)
+
+        self.assertEqual(1, len(released))
+        self.assertLess(released[0]-start, .5)
+
     def test_many_get_at_same_time(self):
 
         #In order to 'get' at the same time we have to use
@@ -668,8 +763,8 @@ class ConcurrentCacher_Test(unittest.TestCase):
         #no bug this test will never fail.
 
         spawn_context = mp.get_context("spawn")
-        array         = spawn_context.RawArray(ct.c_short,[0]*2**16)
-        lock          = spawn_context.Lock()
+        array         = spawn_context.RawArray(ct.c_longlong,[0]*2**15)
+        lock          = spawn_context.Condition()
 
         curr_cacher = ConcurrentCacher(MemoryCacher(),array,lock)
         curr_cacher.get_set(1,1)
@@ -4,7 +4,7 @@ import os
 
 from pathlib import Path
 
-from coba.exceptions import CobaExit
+from coba.exceptions import CobaExit, CobaException
 from coba.pipes import ConsoleSink, DiskSink, NullSink
 from coba.context import CobaContext, DiskCacher, IndentLogger, NullLogger
 
@@ -18,6 +18,7 @@ class CobaContext_Tests(unittest.TestCase):
         CobaContext._cacher = None
         CobaContext._logger = None
         CobaContext._experiment = None
+        CobaContext._cache_memory = None
         CobaContext._store = {}
         CobaContext._config_backing = None
         CobaContext._learning_info = None
@@ -36,9 +37,29 @@ class CobaContext_Tests(unittest.TestCase):
         self.assertEqual(CobaContext.experiment.maxchunksperchild, 0)
         self.assertEqual(CobaContext.experiment.maxtasksperchunk, 0)
         self.assertEqual(CobaContext.experiment.chunk_by, 'source')
+        self.assertEqual(CobaContext.experiment.affinity, False)
         self.assertEqual(CobaContext.api_keys, {})
         self.assertEqual(CobaContext.store, {})
         self.assertEqual(CobaContext.learning_info, {})
+        self.assertIsNone(CobaContext.cache_memory)
+
+    def test_config_file_cache_memory(self):
+        DiskSink("coba/tests/.temp/.coba").write(json.dumps({"cache_memory": "8GB"}))
+        self.assertEqual(8*2**30, CobaContext.cache_memory)
+
+    def test_config_directly_set_cache_memory(self):
+        CobaContext.cache_memory = "1.5 MB"
+        self.assertEqual(int(1.5*2**20), CobaContext.cache_memory)
+        CobaContext.cache_memory = 100
+        self.assertEqual(100, CobaContext.cache_memory)
+        CobaContext.cache_memory = None
+        self.assertIsNone(CobaContext.cache_memory)
+
+    def test_bad_cache_memory(self):
+        with self.assertRaises(CobaException):
+            CobaContext.cache_memory = "8XB"
+        with self.assertRaises(CobaException):
+            CobaContext.cache_memory = -1
 
     def test_config_file_disk_cacher_home1(self):
         CobaContext.search_paths = ["coba/tests/.temp/"]
@@ -11,6 +11,7 @@ from coba.encodings import(
 )
 
 from coba.exceptions import CobaException
+from coba.utilities import PackageChecker
 
 class IdentityEncoder_Tests(unittest.TestCase):
 
@@ -396,5 +397,45 @@ class InteractionsEncoder_Tests(unittest.TestCase):
         interactions = encoder.encode(a=2, b=None, c=None)
         self.assertEqual([], interactions)
 
+@unittest.skipUnless(PackageChecker.numpy(strict=False), "numpy is not installed.")
+class InteractionsEncoder_Encodes_Tests(unittest.TestCase):
+
+    def test_x_a_xa_xxa(self):
+        encoder = InteractionsEncoder(["x","a","xa","xxa"])
+        actions = [[1,2],[3,4],[5,6]]
+        encoded = encoder.encodes(x=[1,2,3], a=actions)
+        self.assertEqual([encoder.encode(x=[1,2,3],a=a) for a in actions], encoded.tolist())
+
+    def test_identical_floats(self):
+        encoder = InteractionsEncoder([1,"x","a","ax","xxa","aaa"])
+        context = [.1,.2,.3,.7]
+        actions = [[.3,.9,.11],[.5,.13,.17]]
+        encoded = encoder.encodes(x=context, a=actions)
+        self.assertEqual([encoder.encode(x=context,a=a) for a in actions], encoded.tolist())
+
+    def test_with_const(self):
+        encoder = InteractionsEncoder(["x", "a", 1, 2])
+        self.assertEqual([[3,1,2,3,1,2],[3,1,2,3,3,4]], encoder.encodes(x=[1,2,3], a=[[1,2],[3,4]]).tolist())
+
+    def test_numeric_actions(self):
+        encoder = InteractionsEncoder(["xa"])
+        self.assertEqual([[2,4,6],[3,6,9]], encoder.encodes(x=(1,2,3), a=[2,3]).tolist())
+
+    def test_context_only(self):
+        encoder = InteractionsEncoder(["xx"])
+        self.assertEqual([[1,2,4],[1,2,4]], encoder.encodes(x=[1,2], a=[[1],[2]]).tolist())
+
+    def test_empty_context(self):
+        encoder = InteractionsEncoder(["x","a","xa"])
+        self.assertEqual([[1,2],[3,4]], encoder.encodes(x=None, a=[[1,2],[3,4]]).tolist())
+
+    def test_other_batch(self):
+        encoder = InteractionsEncoder(["abc"])
+        self.assertEqual([[24],[30]], encoder.encodes('c', a=2, b=3, c=[4,5]).tolist())
+
+    def test_no_interactions(self):
+        encoder = InteractionsEncoder([])
+        self.assertEqual((2,0), encoder.encodes(x=[1], a=[1,2]).shape)
+
 if __name__ == '__main__':
     unittest.main()
@@ -662,6 +662,33 @@ class Environments_Tests(unittest.TestCase):
         self.assertEqual('B' , envs[3].params['id'])
         self.assertEqual(1   , envs[3].params['shuffle_seed'])
 
+    def test_shuffle_n_shares_cache(self):
+        class CountReadEnvironment(TestEnvironment2):
+            n_reads = 0
+            def read(self):
+                yield from super().read()
+                self.n_reads += 1
+
+        env  = CountReadEnvironment(50)
+        envs = Environments(env).shuffle(n=3)
+
+        self.assertIsInstance(envs[0][1], Cache)
+        self.assertIs(envs[0][1], envs[1][1])
+        self.assertIs(envs[0][1], envs[2][1])
+
+        for seed,shuffled in enumerate(envs):
+            expected = list(Environments(TestEnvironment2(50)).shuffle(seed)[0].read())
+            self.assertEqual(expected, list(shuffled.read()))
+
+        self.assertEqual(1, env.n_reads)
+
+    def test_shuffle_max_items(self):
+        envs = Environments(TestEnvironment1('A')).shuffle(1,max_items=5)
+
+        self.assertEqual(1   , len(envs))
+        self.assertEqual(1   , envs[0].params['shuffle_seed'])
+        self.assertEqual(5   , envs[0].params['shuffle_max_items'])
+
     def test_shuffle_args(self):
         envs = Environments(TestEnvironment1('A'),TestEnvironment1('B')).shuffle(0,1)
 
@@ -775,6 +802,10 @@ class Environments_Tests(unittest.TestCase):
         self.assertEqual('std', envs[0].params['scale'])
         self.assertEqual(2    , envs[0].params['scale_using'])
 
+    def test_scale_stream(self):
+        envs = Environments(TestEnvironment1('A')).scale("med", "std", "features", 2, stream=True)
+        self.assertEqual(True, envs[0].params['scale_stream'])
+
     def test_impute(self):
         envs = Environments(TestEnvironment1('A')).impute('median', False, 2)
 
@@ -784,6 +815,10 @@ class Environments_Tests(unittest.TestCase):
         self.assertEqual(2       , envs[0].params['impute_using'])
         self.assertEqual(False   , envs[0].params['impute_indicator'])
 
+    def test_impute_stream(self):
+        envs = Environments(TestEnvironment1('A')).impute('mean', False, 2, stream=True)
+        self.assertEqual(True, envs[0].params['impute_stream'])
+
     def test_where(self):
         envs = Environments(TestEnvironment1('A'),TestEnvironment1('B')).where(n_interactions = (1,2))
 
@@ -1,8 +1,10 @@
 import pickle
 import unittest
+import unittest.mock
 
 from collections import Counter
 from math import isnan
+from statistics import stdev
 
 from coba.pipes      import LazyDense, LazySparse, HeadDense, ListSink
 from coba.context    import CobaContext, NullLogger, BasicLogger
@@ -16,6 +18,7 @@ from coba.utilities  import peek_first, PackageChecker
 from coba.environments.filters import Sparsify, Sort, Scale, Cycle, Impute, Binary, Flatten, Params, Batch
 from coba.environments.filters import Densify, Shuffle, Take, Reservoir, Where, Noise, Riffle, Grounded, Slice
 from coba.environments.filters import Finalize, Repr, BatchSafe, Cache, Logged, Unbatch, Mutable, OpeRewards
+from coba.environments.filters import Finalized
 
 class TestEnvironment:
     def __init__(self, id) -> None:
@@ -65,6 +68,22 @@ class Shuffle_Tests(unittest.TestCase):
         self.assertNotEqual(logged_order,logged_interactions)
         self.assertNotEqual(logged_order,normal_order)
 
+    def test_cached_records(self):
+        logged_interactions = [{'context':i,'action':1,'reward':2} for i in range(10)]
+        normal_interactions = [{'context':i} for i in range(10)]
+
+        for interactions in [logged_interactions, normal_interactions]:
+            cache = Cache()
+            list(cache.filter(interactions))
+            records = cache.filter(None)
+            self.assertIsInstance(records, Cache.Records)
+            self.assertEqual(list(Shuffle(1).filter(interactions)), list(Shuffle(1).filter(records)))
+
+    def test_empty_cached_records(self):
+        cache = Cache()
+        list(cache.filter([]))
+        self.assertEqual([], list(Shuffle(1).filter(cache.filter(None))))
+
 class Sort_Tests(unittest.TestCase):
 
     def test_sort_missing(self):
@@ -329,6 +348,131 @@ class Where_Tests(unittest.TestCase):
 
 class Scale_Tests(unittest.TestCase):
 
+    def test_scale_dense_without_numpy_matches_numpy(self):
+        contexts = [[1,2.,None,4],[5,7.,3,'a'],[0,-1.,9,2],[3,3.,4,1]]
+
+        for shift,scale in [("min","minmax"),("mean","std"),("med","iqr"),(2,"maxabs"),(1,2)]:
+            interactions = [ SimulatedInteraction(c if c[3]!='a' else c[:3]+[0], [1,2], [0,1]) for c in contexts ]
+            with unittest.mock.patch.object(PackageChecker,'numpy',return_value=False):
+                expected = [ i['context'] for i in Scale(shift,scale).filter(interactions) ]
+            actual = [ i['context'] for i in Scale(shift,scale).filter(interactions) ]
+            for e,a in zip(expected,actual):
+                self.assertEqual(len(e),len(a))
+                for ee,aa in zip(e,a):
+                    if ee is None: self.assertIsNone(aa)
+                    else: self.assertAlmostEqual(ee,aa)
+
+    def test_scale_dense_numpy_mixed_types(self):
+        interactions = [
+            SimulatedInteraction([1,'a'], [1,2], [0,1]),
+            SimulatedInteraction([3,2  ], [1,2], [0,1]),
+        ]
+
+        scl_interactions = list(Scale("min","minmax").filter(interactions))
+
+        self.assertEqual([0,'a'], scl_interactions[0]['context'])
+        self.assertEqual([1,2  ], scl_interactions[1]['context'])
+
+    def test_scale_dense_std_one_value(self):
+        interactions = [ SimulatedInteraction([1,2], [1,2], [0,1]) ]
+        self.assertEqual([1,2], list(Scale(0,"std").filter(interactions))[0]['context'])
+
+    def test_scale_stream_dense_minmax(self):
+        interactions = [
+            SimulatedInteraction([2,'a'], [1,2], [0,1]),
+            SimulatedInteraction([4,'b'], [1,2], [0,1]),
+            SimulatedInteraction([0,'c'], [1,2], [0,1]),
+            SimulatedInteraction([1,'d'], [1,2], [0,1]),
+        ]
+
+        scl_interactions = list(Scale("min","minmax",stream=True).filter(interactions))
+
+        self.assertEqual([0  ,'a'], scl_interactions[0]['context'])
+        self.assertEqual([1  ,'b'], scl_interactions[1]['context'])
+        self.assertEqual([0  ,'c'], scl_interactions[2]['context'])
+        self.assertEqual([1/4,'d'], scl_interactions[3]['context'])
+        self.assertEqual([2,'a'], interactions[0]['context'])
+
+    def test_scale_stream_dense_using(self):
+        interactions = [
+            SimulatedInteraction([2], [1,2], [0,1]),
+            SimulatedInteraction([4], [1,2], [0,1]),
+            SimulatedInteraction([0], [1,2], [0,1]),
+        ]
+
+        scl_interactions = list(Scale("min","minmax",using=2,stream=True).filter(interactions))
+        self.assertEqual([[0],[1],[-1]], [i['context'] for i in scl_interactions])
+
+    def test_scale_stream_dense_mean_std(self):
+        values = [1.,4.,2.,8.,5.]
+        interactions = [ SimulatedInteraction([v,None], [1,2], [0,1]) for v in values ]
+
+        scl_interactions = list(Scale("mean","std",stream=True).filter(interactions))
+
+        self.assertEqual([0,None], scl_interactions[0]['context'])
+        self.assertAlmostEqual((5-4)/stdev(values), scl_interactions[-1]['context'][0])
+
+    def test_scale_stream_dense_med_iqr(self):
+        values = [1.,4.,2.,8.]
+        interactions = [ SimulatedInteraction([v], [1,2], [0,1]) for v in values ]
+
+        scl_interactions = list(Scale("med","iqr",stream=True).filter(interactions))
+
+        self.assertEqual([0], scl_interactions[0]['context'])
+        self.assertAlmostEqual((8-3)/3.25, scl_interactions[-1]['context'][0])
+
+    def test_scale_stream_dense_maxabs(self):
+        interactions = [
+            SimulatedInteraction([-2], [1,2], [0,1]),
+            SimulatedInteraction([ 1], [1,2], [0,1]),
+            SimulatedInteraction([ 4], [1,2], [0,1]),
+        ]
+
+        scl_interactions = list(Scale(0,"maxabs",stream=True).filter(interactions))
+        self.assertEqual([[-1],[1/2],[1]], [i['context'] for i in scl_interactions])
+
+    def test_scale_stream_sparse(self):
+        interactions = [
+            SimulatedInteraction({'a':2,'c':'x'}, [1,2], [0,1]),
+            SimulatedInteraction({'b':4        }, [1,2], [0,1]),
+            SimulatedInteraction({'a':4,'b':2  }, [1,2], [0,1]),
+        ]
+
+        scl_interactions = list(Scale(0,"minmax",stream=True).filter(interactions))
+
+        self.assertEqual({'a':2,'c':'x'}, scl_interactions[0]['context'])
+        self.assertEqual({'b':1        }, scl_interactions[1]['context'])
+        self.assertEqual({'a':1,'b':1/2}, scl_interactions[2]['context'])
+
+    def test_scale_stream_sparse_std(self):
+        interactions = [
+            SimulatedInteraction({'a':2}, [1,2], [0,1]),
+            SimulatedInteraction({     }, [1,2], [0,1]),
+            SimulatedInteraction({'a':4}, [1,2], [0,1]),
+        ]
+
+        scl_interactions = list(Scale(0,"std",stream=True).filter(interactions))
+        self.assertAlmostEqual(4/stdev([2,0,4]), scl_interactions[2]['context']['a'])
+
+    def test_scale_stream_sparse_iqr(self):
+        interactions = [ SimulatedInteraction({'a':2}, [1,2], [0,1]) ]
+        with self.assertRaises(CobaException):
+            list(Scale(0,"iqr",stream=True).filter(interactions))
+
+    def test_scale_stream_value(self):
+        interactions = [
+            LoggedInteraction(None, 1, 1),
+            LoggedInteraction(2   , 1, 1),
+            LoggedInteraction(4   , 1, 1),
+        ]
+
+        scl_interactions = list(Scale("min","minmax",stream=True).filter(interactions))
+        self.assertEqual([None,0,1], [i['context'] for i in scl_interactions])
+
+    def test_scale_stream_params(self):
+        self.assertEqual(True, Scale(stream=True).params['scale_stream'])
+        self.assertNotIn('scale_stream', Scale().params)
+
     def test_scale_empty(self):
         self.assertEqual(list(Scale("min","minmax").filter([])),[])
 
@@ -968,6 +1112,117 @@ class Cycle_Tests(unittest.TestCase):
 
 class Impute_Tests(unittest.TestCase):
 
+    def test_impute_dense_without_numpy_matches_numpy(self):
+        contexts = [[1,2.,None],[None,7.,3],[0,None,9],[3,3.,4]]
+
+        for stat in ["mean","median"]:
+            interactions = [ SimulatedInteraction(c, [1,2], [0,1]) for c in contexts ]
+            with unittest.mock.patch.object(PackageChecker,'numpy',return_value=False):
+                expected = [ i['context'] for i in Impute(stat).filter(interactions) ]
+            actual = [ i['context'] for i in Impute(stat).filter(interactions) ]
+            self.assertEqual(expected, actual)
+
+    def test_impute_stream_dense_mean(self):
+        interactions = [
+            SimulatedInteraction([None,'a'], [1,2], [0,1]),
+            SimulatedInteraction([2   ,'b'], [1,2], [0,1]),
+            SimulatedInteraction([None,'c'], [1,2], [0,1]),
+            SimulatedInteraction([4   ,'d'], [1,2], [0,1]),
+            SimulatedInteraction([None,'e'], [1,2], [0,1]),
+        ]
+
+        imp_interactions = list(Impute("mean",stream=True).filter(interactions))
+
+        self.assertEqual([None,'a',1], imp_interactions[0]['context'])
+        self.assertEqual([2   ,'b',0], imp_interactions[1]['context'])
+        self.assertEqual([2   ,'c',1], imp_interactions[2]['context'])
+        self.assertEqual([4   ,'d',0], imp_interactions[3]['context'])
+        self.assertEqual([3   ,'e',1], imp_interactions[4]['context'])
+        self.assertEqual([None,'a'], interactions[0]['context'])
+
+    def test_impute_stream_dense_using(self):
+        interactions = [
+            SimulatedInteraction([2   ], [1,2], [0,1]),
+            SimulatedInteraction([6   ], [1,2], [0,1]),
+            SimulatedInteraction([None], [1,2], [0,1]),
+        ]
+
+        imp_interactions = list(Impute("mean",False,using=1,stream=True).filter(interactions))
+        self.assertEqual([[2],[6],[2]], [i['context'] for i in imp_interactions])
+
+    def test_impute_stream_dense_median(self):
+        values = [1,4,2,8,5,3,7,None]
+        interactions = [ SimulatedInteraction([v], [1,2], [0,1]) for v in values ]
+
+        imp_interactions = list(Impute("median",False,stream=True).filter(interactions))
+        self.assertAlmostEqual(4, imp_interactions[-1]['context'][0], places=1)
+
+    def test_impute_stream_dense_mode(self):
+        interactions = [
+            SimulatedInteraction(['a'], [1,2], [0,1]),
+            SimulatedInteraction(['b'], [1,2], [0,1]),
+            SimulatedInteraction(['b'], [1,2], [0,1]),
+            SimulatedInteraction([None], [1,2], [0,1]),
+        ]
+
+        imp_interactions = list(Impute("mode",False,stream=True).filter(interactions))
+        self.assertEqual(['b'], imp_interactions[-1]['context'])
+
+    def test_impute_stream_sparse(self):
+        interactions = [
+            SimulatedInteraction({'a':4   }, [1,2], [0,1]),
+            SimulatedInteraction({        }, [1,2], [0,1]),
+            SimulatedInteraction({'a':None}, [1,2], [0,1]),
+        ]
+
+        imp_interactions = list(Impute("mean",stream=True).filter(interactions))
+
+        self.assertEqual({'a':4}, imp_interactions[0]['context'])
+        self.assertEqual({}, imp_interactions[1]['context'])
+        self.assertEqual({'a':2,'a_is_missing':1}, imp_interactions[2]['context'])
+
+    def test_impute_stream_sparse_first_none(self):
+        interactions = [
+            SimulatedInteraction({'a':None,'b':1}, [1,2], [0,1]),
+            SimulatedInteraction({'a':3         }, [1,2], [0,1]),
+            SimulatedInteraction({'a':None      }, [1,2], [0,1]),
+        ]
+
+        imp_interactions = list(Impute("mean",stream=True).filter(interactions))
+
+        self.assertEqual({'a':3}, imp_interactions[1]['context'])
+        self.assertEqual({'a':3,'a_is_missing':1}, imp_interactions[2]['context'])
+
+    def test_impute_stream_sparse_mode(self):
+        interactions = [
+            SimulatedInteraction({'a':4   }, [1,2], [0,1]),
+            SimulatedInteraction({        }, [1,2], [0,1]),
+            SimulatedInteraction({        }, [1,2], [0,1]),
+            SimulatedInteraction({'a':None}, [1,2], [0,1]),
+        ]
+
+        imp_interactions = list(Impute("mode",False,stream=True).filter(interactions))
+        self.assertEqual({'a':0}, imp_interactions[3]['context'])
+
+    def test_impute_stream_sparse_median(self):
+        interactions = [ SimulatedInteraction({'a':4}, [1,2], [0,1]) ]
+        with self.assertRaises(CobaException):
+            list(Impute("median",stream=True).filter(interactions))
+
+    def test_impute_stream_value(self):
+        interactions = [
+            LoggedInteraction(None, 1, 1),
+            LoggedInteraction(2   , 1, 1),
+            LoggedInteraction(None, 1, 1),
+        ]
+
+        imp_interactions = list(Impute("mean",stream=True).filter(interactions))
+        self.assertEqual([[None,1],[2,0],[2,1]], [i['context'] for i in imp_interactions])
+
+    def test_impute_stream_params(self):
+        self.assertEqual(True, Impute(stream=True).params['impute_stream'])
+        self.assertNotIn('impute_stream', Impute().params)
+
     def test_impute_empty(self):
         self.assertEqual(list(Impute("mean",False).filter([])),[])
 
@@ -1751,6 +2006,11 @@ class Riffle_Tests(unittest.TestCase):
         self.assertEqual((1,9), cov_interactions[1]['context'])
         self.assertEqual((8,3), cov_interactions[2]['context'])
 
+    def test_riffle3_many(self):
+        interactions = [ SimulatedInteraction(c, [1], [1]) for c in range(20) ]
+        riffled = [ i['context'] for i in Riffle(3,seed=2).filter(interactions) ]
+        self.assertEqual([19,0,1,2,3,18,4,5,17,6,16,7,8,9,10,15,11,12,13,14], riffled)
+
     def test_params(self):
         self.assertEqual({'riffle_spacing':2, 'riffle_seed':3}, Riffle(2,3).params)
 
@@ -2343,6 +2603,42 @@ class Finalize_Tests(unittest.TestCase):
         self.assertEqual(loggersink.items, ["An environment had nothing to evaluate (this is often due to having too few interactions)."] )
         self.assertFalse(list(finalizer.filter([1,2,3])))
 
+class Finalized_Tests(unittest.TestCase):
+
+    class CountReadEnvironment:
+        def __init__(self, interactions):
+            self.interactions = interactions
+            self.params = {'a':1}
+            self.n_reads = 0
+        def read(self):
+            self.n_reads += 1
+            yield from self.interactions
+        def __str__(self):
+            return "CountRead"
+
+    def test_read_equals_finalize(self):
+        interactions = [SimulatedInteraction([Categorical('a',['a','b']),5], [3,4], [1,2])]*3
+        env = Finalized_Tests.CountReadEnvironment(interactions)
+        self.assertEqual(list(Finalize().filter(interactions)), list(Finalized(env).read()))
+
+    def test_read_finalizes_once(self):
+        interactions = [SimulatedInteraction(LazyDense([1]), [3,4], [1,2])]*3
+        env = Finalized_Tests.CountReadEnvironment(interactions)
+        finalized = Finalized(env)
+
+        first  = list(finalized.read())
+        second = list(finalized.read())
+
+        self.assertEqual(first, second)
+        self.assertIsNot(first[0], second[0])
+        self.assertIsInstance(first[0]['context'], list)
+        self.assertEqual(1, env.n_reads)
+
+    def test_params_and_str(self):
+        env = Finalized_Tests.CountReadEnvironment([])
+        self.assertEqual({'a':1}, Finalized(env).params)
+        self.assertEqual("CountRead", str(Finalized(env)))
+
 class Batch_Tests(unittest.TestCase):
     def test_simple(self):
         batch = Batch(3)
@@ -2503,6 +2799,72 @@ class Cache_Tests(unittest.TestCase):
     def test_empty(self):
         self.assertEqual(list(Cache(3).filter([])), [])
 
+    def test_compact_records(self):
+        initial_rows = [{'a':1,'b':2},{'a':3,'b':4},{'c':5}]
+        cacher       = Cache(3)
+        list(cacher.filter(initial_rows))
+        self.assertEqual([(('a','b'),1,2),(('a','b'),3,4),(('c',),5)], cacher._cache)
+        self.assertIs(cacher._cache[0][0],cacher._cache[1][0])
+
+    def test_modified_output_not_cached(self):
+        cacher = Cache(3)
+        for row in cacher.filter([{'a':1,'b':2}]): row['a'] = 3
+        self.assertEqual([{'a':1,'b':2}], list(cacher.filter(None)))
+
+    def test_records(self):
+        cacher = Cache(3)
+        rows   = [{'a':1,'b':2},{'a':3,'b':4},{'c':5}]
+        list(cacher.filter(rows))
+
+        records = cacher.filter(None)
+        self.assertEqual(3, len(records))
+        self.assertEqual(rows, list(records))
+        self.assertEqual({'c':5}, records[2])
+        self.assertEqual({'c':5}, records[-1])
+        self.assertEqual(rows[1:], records[1:])
+        self.assertIsNot(records[0], records[0])
+
+    def test_spilled_not_records(self):
+        rows = [{'a':i,'b':[i]} for i in range(100)]
+
+        try:
+            CobaContext.cache_memory = 1_000
+            cacher = Cache(10)
+            list(cacher.filter(rows))
+        finally:
+            CobaContext.cache_memory = None
+
+        self.assertIsNotNone(cacher._file)
+        self.assertNotIsInstance(cacher.filter(None), Cache.Records)
+        self.assertEqual(rows, list(cacher.filter(None)))
+        self.assertEqual(list(Shuffle(1).filter(rows)), list(Shuffle(1).filter(cacher.filter(None))))
+
+    def test_records_touch_changes_spill_order(self):
+        try:
+            CobaContext.cache_memory = 12_000
+            cacher1 = Cache(10)
+            cacher2 = Cache(10)
+            cacher3 = Cache(10)
+
+            list(cacher1.filter([{'a':i} for i in range(50)]))
+            list(cacher2.filter([{'a':i} for i in range(50)]))
+            self.assertIsInstance(cacher1.filter(None), Cache.Records)
+            list(cacher3.filter([{'a':i} for i in range(50)]))
+        finally:
+            CobaContext.cache_memory = None
+
+        self.assertIsNone(cacher1._file)
+        self.assertIsNotNone(cacher2._file)
+        self.assertIsNone(cacher3._file)
+
+    def test_partial_read_not_records(self):
+        cacher = Cache(1)
+        rows   = [{'a':1},{'a':2}]
+        next(iter(cacher.filter(rows)))
+        self.assertNotIsInstance(cacher.filter(None), Cache.Records)
+        self.assertEqual(rows, list(cacher.filter(None)))
+        self.assertIsInstance(cacher.filter(None), Cache.Records)
+
 class Logged_Tests(unittest.TestCase):
 
     def test_empty(self):
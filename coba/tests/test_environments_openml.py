@@ -1,18 +1,24 @@
 import unittest.mock
 import unittest
+import shutil
 import json
+import hashlib
+import gzip
 
 from io import StringIO
+from pathlib import Path
 from urllib import request
 from threading import Semaphore, Event, Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import cast, Tuple
 
 from coba.primitives   import Categorical
 from coba.exceptions   import CobaException
-from coba.context      import CobaContext, CobaContext, NullLogger, MemoryCacher, NullCacher
-from coba.environments import OpenmlSimulation
+from coba.context      import CobaContext, CobaContext, NullLogger, BasicLogger, MemoryCacher, NullCacher, DiskCacher
+from coba.environments import Environments, OpenmlSimulation
+from coba.pipes        import ListSink, ListSource
 
-from coba.environments.openml import OpenmlSource
+from coba.environments.openml import OpenmlSource, OpenmlPrefetcher
 
 CobaContext.logger = NullLogger()
 
@@ -749,7 +755,7 @@ class OpenmlSource_Tests(unittest.TestCase):
         self.assertIn('openml_042693_feat', CobaContext.cacher)
         self.assertIn('openml_042693_arff', CobaContext.cacher)
 
-    def test_cache_cleared_on_cache_coba_exception(self):
+    def test_cache_not_cleared_on_arff_coba_exception(self):
 
         data = {
             "data_set_description":{
@@ -799,12 +805,12 @@ class OpenmlSource_Tests(unittest.TestCase):
         CobaContext.cacher.get_set('openml_042693_data', json.dumps(data).splitlines())
         CobaContext.cacher.get_set('openml_042693_feat', json.dumps(feat).splitlines())
 
-        with self.assertRaises(Exception) as e:
+        with self.assertRaises(CobaException) as e:
             feature_rows, label_col = list(zip(*OpenmlSource(data_id=42693).read()))
 
-        self.assertNotIn('openml_042693_data', CobaContext.cacher)
-        self.assertNotIn('openml_042693_feat', CobaContext.cacher)
-        self.assertNotIn('openml_042693_arff', CobaContext.cacher)
+        #whatever raised the CobaException is responsible for clearing its own key
+        self.assertIn('openml_042693_data', CobaContext.cacher)
+        self.assertIn('openml_042693_feat', CobaContext.cacher)
 
     @unittest.mock.patch('coba.environments.openml.HttpSource')
     def test_semaphore_locked_and_released(self,mock):
@@ -1107,6 +1113,211 @@ class OpenmlSource_Tests(unittest.TestCase):
         with self.assertRaises(CobaException) as e:
             feature_rows, label_col = list(zip(*OpenmlSource(data_id=42693).read()))
 
+    @unittest.mock.patch('coba.environments.openml.HttpSource')
+    def test_disk_cached_rows_not_parsed(self,mock):
+
+        data = {
+            "data_set_description":{
+                "id":"42693",
+                "name":"testdata",
+                "version":"2",
+                "format":"ARFF",
+                "licence":"CC0",
+                "file_id":"22044555",
+                "visibility":"public",
+                "status":"active",
+                "default_target_attribute":"play"
+            }
+        }
+
+        feat = {
+            "data_features":{
+                "feature":[
+                    {"index":"0","name":"pH"          ,"data_type":"numeric","is_ignore":"false","is_row_identifier":"false"},
+                    {"index":"1","name":"coli"        ,"data_type":"nominal","is_ignore":"false","is_row_identifier":"false"},
+                    {"index":"2","name":"play"        ,"data_type":"nominal","is_ignore":"false","is_row_identifier":"false"}
+                ]
+            }
+        }
+
+        arff = """
+            @relation weather
+
+            @attribute pH real
+            @attribute coli {2, 1}
+            @attribute play {n, y}
+
+            @data
+            8.1,2,n
+            ?,2,n
+            8.3,1,y
+        """
+
+        cache_dir = Path("coba/tests/.temp/openml_cache")
+        if cache_dir.exists(): shutil.rmtree(cache_dir)
+
+        try:
+            CobaContext.cacher = DiskCacher(cache_dir)
+            mock.return_value.read.side_effect = [json.dumps(data).splitlines(), json.dumps(feat).splitlines(), arff.splitlines()]
+
+            cold = [r.labeled for r in OpenmlSource(data_id=42693).read()]
+
+            self.assertTrue((cache_dir / "openml_042693_arff.rows").exists())
+
+            with unittest.mock.patch('coba.environments.openml.ArffReader') as reader:
+                warm = [r.labeled for r in OpenmlSource(data_id=42693).read()]
+                self.assertEqual(0, reader.call_count)
+
+            self.assertEqual(cold, warm)
+            self.assertEqual([([8.1, Categorical('2',["2","1"])], Categorical('n',["n","y"])), ([8.3, Categorical('1',["2","1"])], Categorical('y',["n","y"]))], [r[:2] for r in warm])
+        finally:
+            if cache_dir.exists(): shutil.rmtree(cache_dir)
+
+class OpenmlHandler(BaseHTTPRequestHandler):
+    #a stand-in for openml that serves fixed responses and understands range requests
+
+    def do_GET(self):
+        server  = self.server
+        path    = self.path.split('?')[0]
+        content = server.responses.get(path)
+
+        server.requests.append((path,self.headers.get('Range')))
+
+        if content is None:
+            self.send_error(404)
+            return
+
+        if path in server.gzipped: content = gzip.compress(content)
+
+        start = int(self.headers['Range'][6:-1]) if self.headers.get('Range') else 0
+
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(content)-start))
+        if path in server.gzipped: self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+
+        if path in server.drop_once:
+            #close the connection half way through to interrupt the download
+            server.drop_once.remove(path)
+            self.wfile.write(content[start:len(content)//2])
+            self.close_connection = True
+        else:
+            self.wfile.write(content[start:])
+
+    def log_message(self, *args):
+        pass
+
+class OpenmlPrefetcher_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        CobaContext.api_keys = {'openml': None}
+        CobaContext.cacher   = MemoryCacher()
+        CobaContext.logger   = NullLogger()
+        CobaContext.store    = {}
+
+        self.arff = "\n".join([
+            "@relation weather",
+            "@attribute pH real",
+            "@attribute coli {2, 1}",
+            "@attribute play {n, y}",
+            "@data",
+            "8.1,2,n",
+            "8.2,1,y",
+        ]).encode('utf-8')
+
+        data = {"data_set_description":{"id":"42693","file_id":"22044555","status":"active","default_target_attribute":"play","md5_checksum":hashlib.md5(self.arff).hexdigest()}}
+        task = {"task":{"task_type_id":"1","input":[{"name":"source_data","data_set":{"data_set_id":"42693","target_feature":"play"}}]}}
+        feat = {"data_features":{"feature":[
+            {"index":"0","name":"pH"  ,"data_type":"numeric","is_ignore":"false","is_row_identifier":"false"},
+            {"index":"1","name":"coli","data_type":"nominal","is_ignore":"false","is_row_identifier":"false"},
+            {"index":"2","name":"play","data_type":"nominal","is_ignore":"false","is_row_identifier":"false"}
+        ]}}
+
+        self.server = ThreadingHTTPServer(('127.0.0.1',0), OpenmlHandler)
+        self.server.requests  = []
+        self.server.drop_once = set()
+        self.server.gzipped   = set()
+        self.server.responses = {
+            '/api/v1/json/task/123'           : json.dumps(task).encode('utf-8'),
+            '/api/v1/json/data/42693'         : json.dumps(data).encode('utf-8'),
+            '/api/v1/json/data/features/42693': json.dumps(feat).encode('utf-8'),
+            '/data/v1/download/22044555'      : self.arff,
+        }
+
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = unittest.mock.patch.object(OpenmlSource, '_url', f"http://127.0.0.1:{self.server.server_port}")
+        self.url.start()
+
+    def tearDown(self) -> None:
+        self.url.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_prefetch_caches_sources(self):
+        envs = [OpenmlSimulation(42693), OpenmlSimulation(task_id=123), OpenmlSimulation(42693), ListSource([1,2])]
+
+        self.assertEqual(2, OpenmlPrefetcher().prefetch(envs))
+
+        for key in ['openml_000123_task','openml_042693_data','openml_042693_feat','openml_042693_arff']:
+            self.assertIn(key, CobaContext.cacher)
+
+        #every request should have been made exactly once
+        self.assertEqual(4, len(self.server.requests))
+
+        with unittest.mock.patch('coba.environments.openml.HttpSource') as mock:
+            mock.return_value.read.side_effect = Exception("We shouldn't have to download anything.")
+            interactions = list(OpenmlSimulation(task_id=123).read())
+
+        self.assertEqual(2, len(interactions))
+        self.assertEqual([8.1, Categorical('2',['2','1'])], interactions[0]['context'])
+
+    def test_prefetch_already_cached(self):
+        OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)])
+        OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)])
+        self.assertEqual(3, len(self.server.requests))
+
+    def test_prefetch_resumes_interrupted_download(self):
+        self.server.drop_once.add('/data/v1/download/22044555')
+
+        self.assertEqual(1, OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)]))
+
+        arff_requests = [ r for p,r in self.server.requests if p == '/data/v1/download/22044555' ]
+        self.assertEqual([None, f"bytes={len(self.arff)//2}-"], arff_requests)
+        self.assertEqual(2, len(list(OpenmlSimulation(42693).read())))
+
+    def test_prefetch_gzipped_download(self):
+        self.server.gzipped.add('/data/v1/download/22044555')
+        self.server.drop_once.add('/data/v1/download/22044555')
+
+        self.assertEqual(1, OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)]))
+        self.assertEqual(2, len(list(OpenmlSimulation(42693).read())))
+
+    def test_prefetch_checksum_mismatch(self):
+        data = json.loads(self.server.responses['/api/v1/json/data/42693'])
+        data['data_set_description']['md5_checksum'] = 'abc'
+        self.server.responses['/api/v1/json/data/42693'] = json.dumps(data).encode('utf-8')
+
+        CobaContext.logger = BasicLogger(ListSink())
+
+        self.assertEqual(0, OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)]))
+        self.assertNotIn('openml_042693_arff', CobaContext.cacher)
+        self.assertIn('checksum', str(CobaContext.logger.sink.items[0]))
+
+    def test_prefetch_not_found(self):
+        del self.server.responses['/data/v1/download/22044555']
+        self.assertEqual(0, OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)]))
+        self.assertNotIn('openml_042693_arff', CobaContext.cacher)
+
+    def test_prefetch_null_cacher(self):
+        CobaContext.cacher = NullCacher()
+        self.assertEqual(0, OpenmlPrefetcher().prefetch([OpenmlSimulation(42693)]))
+        self.assertEqual([], self.server.requests)
+
+    def test_environments_prefetch(self):
+        envs = Environments.from_openml(42693).shuffle(1)
+        self.assertIs(envs, envs.prefetch())
+        self.assertIn('openml_042693_arff', CobaContext.cacher)
+
 class OpenmlSimulation_Tests(unittest.TestCase):
 
     @unittest.skip("While it is nice to test this functionality, in practice it is fairly slow.")
@@ -1,9 +1,11 @@
 import unittest
+import unittest.mock
 import pickle
 
 from coba.random import CobaRandom
 from coba.exceptions import CobaException
 from coba.context import CobaContext, NullLogger
+from coba.utilities import PackageChecker
 
 from coba.environments import LambdaSimulation, LinearSyntheticSimulation, NeighborsSyntheticSimulation
 from coba.environments import MLPSyntheticSimulation, KernelSyntheticSimulation, BanditSyntheticSimulation
@@ -556,5 +558,40 @@ class MLPSyntheticSimulation_Tests(unittest.TestCase):
         self.assertEqual((1,0), interactions[0]['actions'][0])
         self.assertEqual((0,1), interactions[0]['actions'][1])
 
+@unittest.skipUnless(PackageChecker.numpy(strict=False), "numpy is not installed.")
+class SyntheticBlocks_Tests(unittest.TestCase):
+
+    def assertSameInteractions(self, env):
+        block_interactions = list(env.read())
+        with unittest.mock.patch.object(PackageChecker,'numpy',return_value=False):
+            loop_interactions = list(env.read())
+
+        self.assertEqual(len(loop_interactions), len(block_interactions))
+
+        for block,loop in zip(block_interactions,loop_interactions):
+            self.assertEqual(loop['context'], block['context'])
+            self.assertEqual(loop['actions'], block['actions'])
+            self.assertEqual(len(loop['rewards']), len(block['rewards']))
+            for block_reward,loop_reward in zip(block['rewards'],loop['rewards']):
+                self.assertAlmostEqual(loop_reward, block_reward, places=10)
+
+    def test_linear(self):
+        for n_context_features, n_action_features in [(3,2),(0,2),(3,0)]:
+            for reward_features in [["a","xa"],["xxa"]]:
+                self.assertSameInteractions(LinearSyntheticSimulation(1100,3,n_context_features,n_action_features,reward_features=reward_features))
+
+    def test_neighbors(self):
+        for n_context_features, n_action_features in [(3,2),(0,2),(3,0)]:
+            self.assertSameInteractions(NeighborsSyntheticSimulation(50,3,n_context_features,n_action_features))
+
+    def test_kernel(self):
+        for n_context_features, n_action_features in [(3,2),(0,2),(3,0)]:
+            for kernel in ['linear','polynomial','exponential','gaussian']:
+                self.assertSameInteractions(KernelSyntheticSimulation(50,3,n_context_features,n_action_features,kernel=kernel,degree=3))
+
+    def test_mlp(self):
+        for n_context_features, n_action_features in [(3,2),(0,2),(3,0)]:
+            self.assertSameInteractions(MLPSyntheticSimulation(50,3,n_context_features,n_action_features))
+
 if __name__ == '__main__':
     unittest.main()
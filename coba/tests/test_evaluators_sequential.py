@@ -6,7 +6,7 @@ import warnings
 from coba.utilities    import PackageChecker
 from coba.exceptions   import CobaException
 from coba.context      import CobaContext, BasicLogger
-from coba.environments import Batch, OpeRewards
+from coba.environments import Batch, OpeRewards, Finalize, Finalized
 from coba.learners     import VowpalSoftmaxLearner, BanditEpsilonLearner
 from coba.primitives   import is_batch, Learner
 from coba.primitives   import LoggedInteraction, SimulatedInteraction, GroundedInteraction
@@ -752,6 +752,122 @@ class SequentialCB_Tests(unittest.TestCase):
         self.assertEqual(expected_learn_call, learner.learn_call)
         self.assertEqual(expected_task_results, task_results)
 
+    def test_params_block(self):
+        self.assertEqual(SequentialCB(block=2).params,{'learn':'on','eval':'on','seed':None,'block':2})
+
+    def test_bad_block(self):
+        with self.assertRaises(CobaException):
+            SequentialCB(block=0)
+
+    def test_on_block(self):
+        class SimpleLearner:
+            def __init__(self) -> None:
+                self.predict_call = []
+            def predict(self,*args):
+                self.predict_call.append(args)
+                return [[1,0,0],[0,1,0],[0,0,1]][:len(args[0])]
+            def learn(self,*args):
+                self.learn_call = args
+
+        task         = SequentialCB(record='reward',block=3)
+        learner      = SimpleLearner()
+        interactions = [
+            SimulatedInteraction(1,[1,2,3],[7,8,9]),
+            SimulatedInteraction(2,[4,5,6],[4,5,6]),
+            SimulatedInteraction(3,[7,8,9],[1,2,3]),
+        ]
+
+        task_results = task.evaluate(SimpleEnvironment(interactions), learner)
+
+        expected_predict_call = ([1,2,3],[[1,2,3],[4,5,6],[7,8,9]])
+        expected_learn_call   = ([1,2,3],[1,5,9],[7,5,3],[1,1,1])
+
+        self.assertEqual(expected_predict_call, learner.predict_call[0])
+        self.assertEqual(expected_learn_call, learner.learn_call)
+        self.assertEqual({"reward":[7,5,3]}, task_results)
+
+    def test_on_block_partial_last_block_info(self):
+        task         = SequentialCB(record=['reward','time'],block=2)
+        learner      = RecordingLearner(with_kwargs=False)
+        interactions = [
+            SimulatedInteraction(1,[1,2,3],[7,8,9],extra=1),
+            SimulatedInteraction(2,[4,5,6],[4,5,6],extra=2),
+            SimulatedInteraction(3,[7,8,9],[1,2,3],extra=3),
+        ]
+
+        task_results = task.evaluate(SimpleEnvironment(interactions), learner)
+
+        self.assertEqual(3, len(task_results['reward']))
+        self.assertEqual([1,2,3], task_results['extra'])
+        self.assertEqual(3, len(task_results['predict_time']))
+        self.assertEqual(3, len(task_results['learn_time']))
+        self.assertEqual(3, len(task_results['predict']))
+
+    def test_on_block_equals_batched(self):
+        interactions = [
+            SimulatedInteraction(1,[1,2,3],[7,8,9]),
+            SimulatedInteraction(2,[4,5,6],[4,5,6]),
+            SimulatedInteraction(3,[7,8,9],[1,2,3]),
+            SimulatedInteraction(4,[1,2,3],[1,2,3]),
+        ]
+
+        task          = SequentialCB(record=['reward','action','rewards'],block=2)
+        block_results = task.evaluate(SimpleEnvironment(interactions), RecordingLearner(with_info=False))
+        batch_results = list(SequentialCB(record=['reward','action','rewards']).evaluate(SimpleEnvironment(Batch(2).filter(interactions)), RecordingLearner(with_info=False)))
+
+        self.assertEqual([r['reward'] for r in batch_results], block_results['reward'])
+        self.assertEqual([r['action'] for r in batch_results], block_results['action'])
+        self.assertEqual([r['rewards'] for r in batch_results], block_results['rewards'])
+
+    def test_on_block_empty(self):
+        self.assertEqual({}, SequentialCB(block=2).evaluate(SimpleEnvironment([]), RecordingLearner()))
+
+    def test_evaluates_equals_evaluate(self):
+        interactions = [ SimulatedInteraction(i,[1,2,3],[i%3,(i+1)%3,(i+2)%3]) for i in range(50) ]
+
+        for block in [None,4]:
+            task     = SequentialCB(record=['reward','action','probability'],seed=3,block=block)
+            learners = lambda: [BanditEpsilonLearner(.1),BanditEpsilonLearner(.5),RecordingLearner(with_info=False)]
+
+            separate = [ task.evaluate(SimpleEnvironment(interactions),learner) for learner in learners() ]
+            separate = [ results if block else list(results) for results in separate ]
+
+            self.assertEqual(separate, task.evaluates(SimpleEnvironment(interactions),learners()))
+
+    def test_evaluates_reads_once(self):
+        class CountingEnvironment:
+            n_reads = 0
+            def read(self):
+                CountingEnvironment.n_reads += 1
+                return [SimulatedInteraction(1,[1,2],[3,4]), SimulatedInteraction(2,[1,2],[5,6])]
+
+        results = SequentialCB().evaluates(CountingEnvironment(),[RecordingLearner(),RecordingLearner(),RecordingLearner()])
+
+        self.assertEqual(1, CountingEnvironment.n_reads)
+        self.assertEqual(3, len(results))
+
+    def test_evaluates_learner_exception(self):
+        class ExceptionLearner(Learner):
+            def predict(self, context, actions):
+                if context == 2: raise Exception("ExceptionLearner")
+                return [1,0]
+            def learn(self, *args, **kwargs):
+                pass
+
+        interactions = [SimulatedInteraction(1,[1,2],[3,4]), SimulatedInteraction(2,[1,2],[5,6])]
+        results = SequentialCB(record='reward').evaluates(SimpleEnvironment(interactions),[ExceptionLearner(),FixedPredLearner([[0,1],[1,0]])])
+
+        self.assertIsInstance(results[0], Exception)
+        self.assertEqual([{'reward':4},{'reward':5}], results[1])
+
+    def test_evaluates_empty(self):
+        self.assertEqual([[],[]], SequentialCB().evaluates(SimpleEnvironment([]),[RecordingLearner(),RecordingLearner()]))
+        self.assertEqual([{}], SequentialCB(block=2).evaluates(SimpleEnvironment([]),[RecordingLearner()]))
+
+    def test_evaluates_invalid(self):
+        results = SequentialCB(learn='off').evaluates(SimpleEnvironment([SimulatedInteraction(1,[1,2],[3,4])]),[RecordingLearner()])
+        self.assertIsInstance(results[0], CobaException)
+
     def test_on_batched_record_discrete_rewards(self):
         task         = SequentialCB(['reward','rewards'])
         learner      = BatchFixedLearner()
@@ -897,6 +1013,21 @@ class SequentialCB_Tests(unittest.TestCase):
         list(task.evaluate(SimpleEnvironment(interactions),learner))
         self.assertEqual(0, len(CobaContext.logger.sink.items))
 
+    def test_finalized_not_finalized_again(self):
+        task         = SequentialCB(record=['reward'])
+        learner      = RecordingLearner(with_kwargs=False, with_info=False)
+        interactions = [SimulatedInteraction(1,[1,2,3],[7,8,9])]*2
+        environment  = Finalized(SimpleEnvironment(interactions))
+
+        expected = list(task.evaluate(SimpleEnvironment(interactions),RecordingLearner(with_kwargs=False, with_info=False)))
+        list(environment.read())
+
+        with unittest.mock.patch.object(Finalize,'filter',autospec=True,side_effect=Finalize.filter) as filter:
+            actual = list(task.evaluate(environment,learner))
+
+        self.assertEqual(expected, actual)
+        self.assertEqual(0, filter.call_count)
+
 class SequentialIGL_Tests(unittest.TestCase):
     def test_params(self):
         self.assertEqual(SequentialIGL().params,{'seed':None})
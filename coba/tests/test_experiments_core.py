@@ -14,6 +14,7 @@ from coba.exceptions import CobaException, CobaExit
 from coba.primitives import Categorical, Source, Learner, Environment
 from coba.primitives import SimulatedInteraction
 from coba.primitives import BinaryReward
+from coba.results import Result
 
 class NoParamsLearner:
     def predict(self, context, actions):
@@ -140,6 +141,14 @@ class CategoricalActionEnv(Environment):
 def test_eval(environment, learner):
     yield { "learner_type": str(type(learner)), "n_interactions": len(list(environment.read()))}
 
+def shard_experiment() -> Experiment:
+    envs = [LambdaSimulation(n, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: cast(float,a)) for n in range(2,8)]
+    return Experiment(envs,[ModuloLearner("0"),ModuloLearner("1")],SequentialCB(['reward']))
+
+def run_shard(directory: str, shard: str) -> None:
+    CobaContext.logger = NullLogger()
+    shard_experiment().run(directory, processes=1, shard=shard)
+
 class Experiment_Single_Tests(unittest.TestCase):
 
     @classmethod
@@ -311,6 +320,30 @@ class Experiment_Single_Tests(unittest.TestCase):
         else:
             self.assertEqual(0, learner._learn_calls)
 
+    def test_prefetch(self):
+        env1       = LambdaSimulation(2, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: float(a))
+        experiment = Experiment(env1, [ModuloLearner(),ModuloLearner()], SequentialCB(['reward']))
+
+        with unittest.mock.patch('coba.environments.OpenmlPrefetcher.prefetch') as mock:
+            experiment.run()
+            self.assertEqual(0, mock.call_count)
+            result = experiment.run(prefetch=True)
+            mock.assert_called_once_with([env1])
+
+        self.assertEqual(4, len(result.interactions))
+
+    def test_lockstep(self):
+        env1 = LambdaSimulation(5, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: float(a))
+        env2 = LambdaSimulation(3, lambda i: i, lambda i,c: [3,4,5], lambda i,c,a: float(a))
+
+        experiment = Experiment([env1,env2], [ModuloLearner("1"),ModuloLearner("2")], SequentialCB(['reward']))
+
+        separate = experiment.run().interactions
+        lockstep = experiment.run(lockstep=True).interactions
+
+        self.assertEqual(16, len(lockstep))
+        self.assertEqual(list(separate), list(lockstep))
+
     def test_sims(self):
         env1       = LambdaSimulation(2, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: cast(float,a))
         env2       = LambdaSimulation(3, lambda i: i, lambda i,c: [3,4,5], lambda i,c,a: cast(float,a))
@@ -483,6 +516,83 @@ class Experiment_Single_Tests(unittest.TestCase):
         self.assertCountEqual(second_result.learners.to_dicts()    , expected_learners)
         self.assertCountEqual(second_result.interactions.to_dicts(), expected_interactions)
 
+    def test_restore_columnar(self):
+
+        class MyBrokenLearner:
+            @property
+            def params(self):
+                return {"family":"Modulo", "p":'0'}
+
+        env             = LambdaSimulation(2, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: cast(float,a))
+        working_learner = ModuloLearner()
+        broken_learner  = MyBrokenLearner()
+
+        CobaContext.logger = IndentLogger(ListSink())
+
+        try:
+            first_result  = Experiment([env],[working_learner],SequentialCB(['reward'])).run("coba/tests/.temp/transactions.cbr")
+            second_result = Experiment([env],[broken_learner ],SequentialCB(['reward'])).run("coba/tests/.temp/transactions.cbr")
+        finally:
+            if Path('coba/tests/.temp/transactions.cbr').exists(): Path('coba/tests/.temp/transactions.cbr').unlink()
+
+        expected_interactions = [
+            {"environment_id":0, "learner_id":0, "evaluator_id":0, "index":1, "reward":0},
+            {"environment_id":0, "learner_id":0, "evaluator_id":0, "index":2, "reward":1},
+        ]
+
+        self.assertTrue(not any('exception' in i for i in CobaContext.logger.sink.items))
+        self.assertDictEqual({"description":None, "n_learners":1, "n_environments":1, "seed":1}, second_result.experiment)
+        self.assertCountEqual(first_result.interactions.to_dicts(), expected_interactions)
+        self.assertCountEqual(second_result.interactions.to_dicts(), expected_interactions)
+
+    def test_sharded(self):
+        import shutil
+        import multiprocessing as mp
+
+        directory = "coba/tests/.temp/shards"
+        if Path(directory).exists(): shutil.rmtree(directory)
+
+        try:
+            procs = [mp.get_context("spawn").Process(target=run_shard, args=(directory,f"shard{i}")) for i in range(3)]
+            for p in procs: p.start()
+            for p in procs: p.join()
+
+            leases = [lease.read_text() for lease in Path(directory,"leases").iterdir()]
+            merged = Result.from_file(directory)
+        finally:
+            if Path(directory).exists(): shutil.rmtree(directory)
+
+        expected = shard_experiment().run()
+
+        self.assertEqual(18, len(leases))
+        self.assertEqual(expected.experiment, merged.experiment)
+        self.assertEqual(list(expected.environments), list(merged.environments))
+        self.assertEqual(list(expected.learners), list(merged.learners))
+        self.assertEqual(list(expected.evaluators), list(merged.evaluators))
+        self.assertEqual(list(expected.interactions), list(merged.interactions))
+
+    def test_sharded_restore(self):
+        import shutil
+
+        directory = "coba/tests/.temp/shards"
+        if Path(directory).exists(): shutil.rmtree(directory)
+
+        try:
+            first  = shard_experiment().run(directory, shard="a")
+            second = shard_experiment().run(directory, shard="b")
+            third  = shard_experiment().run(directory, shard="a")
+            logs   = sorted(log.name for log in Path(directory).glob('*.log'))
+        finally:
+            if Path(directory).exists(): shutil.rmtree(directory)
+
+        self.assertEqual(['a.log','b.log'], logs)
+        self.assertEqual(list(first.interactions), list(second.interactions))
+        self.assertEqual(list(first.interactions), list(third.interactions))
+
+    def test_shard_without_directory(self):
+        with self.assertRaises(CobaException):
+            shard_experiment().run(shard="a")
+
     def test_no_params(self):
         env1       = NoParamsEnvironment()
         learner    = NoParamsLearner()
@@ -551,18 +661,23 @@ class Experiment_Single_Tests(unittest.TestCase):
         CobaContext.experiment.maxtasksperchunk = 2
         self.assertEqual(2,exp.maxtasksperchunk)
 
-        exp.config(processes=2, maxchunksperchild=5, maxtasksperchunk=3)
+        CobaContext.experiment.affinity = True
+        self.assertEqual(True,exp.affinity)
+
+        exp.config(processes=2, maxchunksperchild=5, maxtasksperchunk=3, affinity=False)
         self.assertEqual(2,exp.processes)
         self.assertEqual(5,exp.maxchunksperchild)
         self.assertEqual(3,exp.maxtasksperchunk)
+        self.assertEqual(False,exp.affinity)
 
     def test_run_config(self):
         exp = Experiment([], [])
-        exp.run(processes=2, maxchunksperchild=5, maxtasksperchunk=3)
+        exp.run(processes=2, maxchunksperchild=5, maxtasksperchunk=3, affinity=True)
 
         self.assertEqual(2,exp.processes)
         self.assertEqual(5,exp.maxchunksperchild)
         self.assertEqual(3,exp.maxtasksperchunk)
+        self.assertEqual(True,exp.affinity)
 
     def test_restore_not_matched_environments(self):
         path = Path("coba/tests/.temp/experiment.log")
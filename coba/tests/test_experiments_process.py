@@ -1,17 +1,24 @@
+import pickle
+import shutil
 import unittest
+import unittest.mock
+
+from pathlib import Path
 
 from itertools import product
 from typing import cast, Iterable
 
 from coba.context      import CobaContext, BasicLogger
-from coba.environments import LambdaSimulation, Environments, LinearSyntheticSimulation, SupervisedSimulation
+from coba.environments import LambdaSimulation, Environments, LinearSyntheticSimulation, SupervisedSimulation, Chunk, Finalized
+from coba.environments import Shuffle, Take
 from coba.pipes        import Pipes, ListSink, Cache
 from coba.evaluators   import SequentialCB
 from coba.results      import Result
 from coba.primitives   import Learner
+from coba.learners     import RandomLearner, BanditEpsilonLearner, FixedLearner
 from coba.primitives   import SimulatedInteraction
 
-from coba.experiments.process import Task, MakeTasks, ChunkTasks, ProcessTasks
+from coba.experiments.process import Task, TaskChunk, MakeTasks, ChunkTasks, ClaimChunks, ProcessTasks, share_prefixes
 
 #for testing purposes
 class ModuloLearner(Learner):
@@ -81,6 +88,75 @@ class ParamObj:
         self.params = params
 #for testing purposes
 
+class share_prefixes_Tests(unittest.TestCase):
+    def test_shared_source(self):
+        src  = CountReadSimulation()
+        env1 = Pipes.join(src, Shuffle(1))
+        env2 = Pipes.join(src, Shuffle(2))
+        env3 = Pipes.join(CountReadSimulation(), Shuffle(1))
+
+        shared = share_prefixes([env1,env2,env3])
+
+        self.assertIs(shared[env3], env3)
+        self.assertIs(shared[env1][0], src)
+        self.assertIsInstance(shared[env1][1], Chunk)
+        self.assertIsInstance(shared[env1][2], Cache)
+        self.assertIsInstance(shared[env1][3], Shuffle)
+        self.assertEqual(list(shared[env1])[:3], list(shared[env2])[:3])
+        self.assertEqual(shared[env1][3].params, {'shuffle_seed':1})
+        self.assertEqual(shared[env2][3].params, {'shuffle_seed':2})
+        self.assertEqual(env1.params, shared[env1].params)
+
+    def test_longest_shared_prefix(self):
+        src  = CountReadSimulation()
+        env1 = Pipes.join(src, Take(5), Shuffle(1))
+        env2 = Pipes.join(src, Take(5), Shuffle(2))
+
+        shared = share_prefixes([env1,env2])
+
+        self.assertIsInstance(shared[env1][1], Take)
+        self.assertIsInstance(shared[env1][2], Chunk)
+        self.assertIs(shared[env1][2], shared[env2][2])
+
+    def test_equal_pipes_shared(self):
+        env1 = Environments.from_linear_synthetic(10,seed=1).shuffle(1)[0]
+        env2 = Environments.from_linear_synthetic(10,seed=1).shuffle(2)[0]
+        env3 = Environments.from_linear_synthetic(10,seed=2).shuffle(3)[0]
+
+        shared = share_prefixes([env1,env2,env3])
+
+        self.assertIs(shared[env1][0], env1[0])
+        self.assertIs(shared[env2][0], env1[0])
+        self.assertIs(shared[env3], env3)
+
+    def test_same_params_different_state_not_shared(self):
+        env1 = Pipes.join(LambdaSimulation(5, lambda i: i, lambda i,c: [0,1], lambda i,c,a: a), Shuffle(1))
+        env2 = Pipes.join(LambdaSimulation(5, lambda i: 1, lambda i,c: [0,1], lambda i,c,a: a), Shuffle(2))
+
+        self.assertEqual(env1[0].params, env2[0].params)
+        self.assertEqual({env1:env1,env2:env2}, share_prefixes([env1,env2]))
+
+    def test_chunked_not_shared(self):
+        src  = CountReadSimulation()
+        env1 = Pipes.join(src, Chunk(), Shuffle(1))
+        env2 = Pipes.join(src, Chunk(), Shuffle(2))
+
+        self.assertEqual({env1:env1,env2:env2}, share_prefixes([env1,env2]))
+
+    def test_cached_prefix_chunked_before_cache(self):
+        src   = CountReadSimulation()
+        cache = Cache()
+        env1  = Pipes.join(src, cache, Shuffle(1))
+        env2  = Pipes.join(src, cache, Shuffle(2))
+
+        shared = share_prefixes([env1,env2])
+
+        self.assertIsInstance(shared[env1][1], Chunk)
+        self.assertIs(shared[env1][1], shared[env2][1])
+        self.assertIs(shared[env1][2], cache)
+        self.assertIs(shared[env2][2], cache)
+        self.assertEqual(4, len(shared[env1]))
+
 class MakeTasks_Tests(unittest.TestCase):
     def test_eq(self):
         env1 = ParamObj(a=1)
@@ -337,6 +413,184 @@ class ChunkTasks_Tests(unittest.TestCase):
         self.assertCountEqual(groups[3], [tasks[7],tasks[6]])
         self.assertCountEqual(groups[4], [tasks[2],tasks[4]])
 
+    def test_chunk_keys(self):
+        src1 = Environments.from_linear_synthetic(10)
+        src2 = Environments.from_linear_synthetic(10)
+        envs = (src1+src2).chunk().shuffle(n=2)
+
+        tasks = [
+            Task(None, (0,None), None),
+            Task((1,envs[0]), None, None),
+            Task((0,envs[1]), None, None),
+            Task((1,envs[2]), (1,None), None),
+            Task((0,envs[1]), (0,None), None),
+            Task((2,envs[3]), (0,None), None),
+            Task((0,envs[3]), (1,None), None),
+        ]
+
+        groups = list(ChunkTasks(2).filter(tasks))
+
+        self.assertEqual([None,0,0,1], [g.key for g in groups])
+
+    def test_longest_first_cost_hint(self):
+        envs = Environments.from_linear_synthetic(10).params({'cost':1}) + Environments.from_linear_synthetic(10).params({'cost':100})
+
+        tasks = [
+            Task(None, (0,None), None),
+            Task((0,envs[0]), (0,None), None),
+            Task((1,envs[1]), (0,None), None),
+        ]
+
+        groups = list(ChunkTasks().filter(tasks))
+
+        self.assertEqual(groups, [[tasks[0]],[tasks[2]],[tasks[1]]])
+
+    def test_longest_first_take(self):
+        envs = Environments.from_linear_synthetic(100).take(10) + Environments.from_linear_synthetic(100).take(50)
+
+        tasks = [
+            Task((0,envs[0]), (0,None), None),
+            Task((1,envs[1]), (0,None), None),
+        ]
+
+        groups = list(ChunkTasks().filter(tasks))
+
+        self.assertEqual(groups, [[tasks[1]],[tasks[0]]])
+
+    def test_longest_first_restored_sizes(self):
+        restored = Result(None, None, None,
+            [['environment_id','learner_id','evaluator_id','index'],[0,0,0,1],[1,0,0,1],[1,0,0,2],[1,0,0,3]])
+
+        envs = (Environments.from_linear_synthetic(10) + Environments.from_linear_synthetic(10)).chunk()
+
+        tasks = [
+            Task((0,envs[0]), (1,None), None),
+            Task((1,envs[1]), (1,None), None),
+        ]
+
+        groups = list(ChunkTasks(restored=restored).filter(tasks))
+
+        self.assertEqual(groups, [[tasks[1]],[tasks[0]]])
+        self.assertEqual([1,0], [g.key for g in groups])
+
+    def test_longest_first_restored_times(self):
+        restored = Result(None, None, None,
+            [['environment_id','learner_id','evaluator_id','index','predict_time','learn_time'],
+             [0,0,0,1,1,1],[0,1,0,1,10,10]])
+
+        envs = Environments.from_linear_synthetic(10)
+
+        tasks = [
+            Task((0,envs[0]), (0,None), None),
+            Task((0,envs[0]), (1,None), None),
+            Task((0,envs[0]), (2,None), None),
+        ]
+
+        groups = list(ChunkTasks(restored=restored).filter(tasks))
+
+        self.assertEqual(groups, [[tasks[1]],[tasks[2]],[tasks[0]]])
+
+    def test_shared_prefix_fan_out_not_one_chunk(self):
+        for envs in [Environments.from_linear_synthetic(100).shuffle(n=8), Environments.from_linear_synthetic(100).cache().shuffle(n=8)]:
+            triples = list(product(envs,[RandomLearner(),BanditEpsilonLearner()],[SequentialCB()]))
+            chunks  = list(ChunkTasks().filter(MakeTasks(triples).read()))
+            keyed   = [ chunk for chunk in chunks if chunk.key is not None ]
+
+            self.assertEqual(27, len(chunks))
+            self.assertTrue(all(len(chunk)==1 for chunk in chunks))
+            self.assertEqual(24, len(keyed))
+            self.assertEqual(16, len([c for c in keyed if c[0].lrn is not None]))
+            self.assertEqual(1, len({chunk.key for chunk in keyed}))
+
+            #the parts of a shared prefix are dispatched in a row
+            indexes = [ i for i,chunk in enumerate(chunks) if chunk.key is not None ]
+            self.assertEqual(list(range(indexes[0],indexes[-1]+1)), indexes)
+
+    def test_shared_prefix_fan_out_lockstep(self):
+        envs    = Environments.from_linear_synthetic(100).shuffle(n=2)
+        triples = list(product(envs,[RandomLearner(),BanditEpsilonLearner()],[SequentialCB()]))
+        chunks  = list(ChunkTasks(lockstep=True).filter(MakeTasks(triples).read()))
+
+        self.assertEqual([[0,0,0],[1,1,1]], sorted([t.env_id for t in c] for c in chunks if c.key is not None))
+
+    def test_lockstep_groups_environments(self):
+        envs = Environments.from_linear_synthetic(10) + Environments.from_linear_synthetic(10)
+
+        tasks = [
+            Task((0,envs[0]), (0,None), (0,None)),
+            Task((1,envs[1]), (0,None), (0,None)),
+            Task((0,envs[0]), (1,None), (0,None)),
+            Task((1,envs[1]), (1,None), (0,None)),
+        ]
+
+        groups = list(ChunkTasks(1,lockstep=True).filter(tasks))
+
+        self.assertEqual(2, len(groups))
+        self.assertCountEqual([[tasks[0],tasks[2]],[tasks[1],tasks[3]]], groups)
+
+class ClaimChunks_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.dir = Path("coba/tests/.temp/shards")
+        if self.dir.exists(): shutil.rmtree(self.dir)
+
+    def tearDown(self) -> None:
+        if self.dir.exists(): shutil.rmtree(self.dir)
+
+    def _chunks(self, triples):
+        return list(ChunkTasks().filter(MakeTasks(triples).read()))
+
+    def test_claimed_once(self):
+        envs    = Environments.from_linear_synthetic(10) + Environments.from_linear_synthetic(10)
+        triples = list(product(envs,[RandomLearner()],[SequentialCB()]))
+        chunks  = self._chunks(triples)
+
+        first  = list(ClaimChunks(self.dir,'a',triples).filter(chunks))
+        second = list(ClaimChunks(self.dir,'b',triples).filter(chunks))
+
+        #learner and evaluator parameters are recorded by every shard
+        self.assertEqual(chunks, first)
+        self.assertEqual(2, len(second))
+        self.assertTrue(all(task.env_id is None for chunk in second for task in chunk))
+
+    def test_reclaimed_by_owner(self):
+        envs    = Environments.from_linear_synthetic(10) + Environments.from_linear_synthetic(10)
+        triples = list(product(envs,[RandomLearner()],[SequentialCB()]))
+        chunks  = self._chunks(triples)
+
+        list(ClaimChunks(self.dir,'a',triples).filter(chunks))
+        self.assertEqual(chunks, list(ClaimChunks(self.dir,'a',triples).filter(chunks)))
+        self.assertEqual({'a'}, {lease.read_text() for lease in (self.dir/'leases').iterdir()})
+
+    def test_chunked_envs_share_lease(self):
+        envs    = (Environments.from_linear_synthetic(10) + Environments.from_linear_synthetic(10)).chunk().shuffle(n=2)
+        triples = list(product(envs,[RandomLearner()],[SequentialCB()]))
+        chunks  = self._chunks(triples)
+
+        list(ClaimChunks(self.dir,'a',triples).filter(chunks))
+        self.assertEqual(['env-0.lease','env-1.lease'], sorted(lease.name for lease in (self.dir/'leases').iterdir()))
+
+    def test_shared_prefix_claimed_by_task(self):
+        envs    = Environments.from_linear_synthetic(10).shuffle(n=2)
+        triples = list(product(envs,[RandomLearner()],[SequentialCB()]))
+        chunks  = self._chunks(triples)
+
+        first  = list(ClaimChunks(self.dir,'a',triples).filter(chunks[:3]))
+        second = list(ClaimChunks(self.dir,'b',triples).filter(chunks))
+
+        #a shard is able to claim work downstream of an automatically shared prefix
+        self.assertEqual(chunks[:3], first)
+        self.assertEqual(chunks[3:], [c for c in second if c[0].env_id is not None])
+
+    def test_lease_names_ignore_restored(self):
+        envs     = Environments.from_linear_synthetic(10).chunk().shuffle(n=2)
+        triples  = list(product(envs,[RandomLearner()],[SequentialCB()]))
+        restored = Result([['environment_id'],[0]],None,None,[['environment_id','learner_id','evaluator_id','index'],[0,0,0,1]])
+
+        #env 0 was restored so the remaining chunk only contains env 1 but it still shares env 0's lease
+        list(ClaimChunks(self.dir,'a',triples).filter(ChunkTasks().filter(MakeTasks(triples,restored).read())))
+        self.assertEqual(['env-0.lease'], [lease.name for lease in (self.dir/'leases').iterdir()])
+
 class ProcessTasks_Tests(unittest.TestCase):
     def setUp(self) -> None:
         CobaContext.logger = BasicLogger(ListSink())
@@ -352,6 +606,17 @@ class ProcessTasks_Tests(unittest.TestCase):
         self.assertIs(evl1.observed[1], lrn1)
         self.assertEqual(['T4', (1,1,1), []], transactions[0])
 
+    def test_columnar_results(self):
+        env1 = LambdaSimulation(3, lambda i: i, lambda i,c: [0,1], lambda i,c,a: cast(float,a))
+        lrn1 = RandomLearner()
+        evl1 = SequentialCB(record='reward',block=3)
+        tasks = [Task((1,env1), (1,lrn1), (1,evl1))]
+        transactions = list(ProcessTasks().filter(tasks))
+        self.assertEqual('T4', transactions[0][0])
+        self.assertEqual((1,1,1), transactions[0][1])
+        self.assertEqual(['reward'], list(transactions[0][2].keys()))
+        self.assertEqual(3, len(transactions[0][2]['reward']))
+
     def test_env_task(self):
         env1 = SupervisedSimulation([1,2],[1,2],label_type='c')
         env2 = SupervisedSimulation([1,2],[1,2],label_type='c')
@@ -378,6 +643,36 @@ class ProcessTasks_Tests(unittest.TestCase):
         self.assertEqual(['T4', (0,1,1), []                                 ], transactions[2])
         self.assertEqual(sim1[0].n_reads, 1)
 
+    def test_resident_chunk_reused(self):
+        env = Pipes.join(CountReadSimulation(), Chunk(), Cache())
+        val1 = ObserveEvaluator()
+        val2 = ObserveEvaluator()
+
+        #pickling simulates each chunk being sent to a process separately
+        chunk1 = pickle.loads(pickle.dumps(TaskChunk([Task((0,env),(0,ModuloLearner()),(0,val1))],0)))
+        chunk2 = pickle.loads(pickle.dumps(TaskChunk([Task((0,env),(1,ModuloLearner()),(1,val2))],0)))
+
+        process = ProcessTasks()
+        list(process.filter(chunk1))
+        list(process.filter(chunk2))
+
+        self.assertEqual(chunk1[0].env[0].n_reads, 1)
+        self.assertEqual(chunk2[0].env[0].n_reads, 0)
+        self.assertIs(chunk2[0].val.observed[0][0], chunk1[0].env[0])
+
+    def test_resident_chunk_replaced(self):
+        env = Pipes.join(CountReadSimulation(), Chunk(), Cache())
+
+        chunk1 = pickle.loads(pickle.dumps(TaskChunk([Task((0,env),(0,ModuloLearner()),(0,ObserveEvaluator()))],0)))
+        chunk2 = pickle.loads(pickle.dumps(TaskChunk([Task((0,env),(1,ModuloLearner()),(1,ObserveEvaluator()))],1)))
+
+        process = ProcessTasks()
+        list(process.filter(chunk1))
+        list(process.filter(chunk2))
+
+        self.assertEqual(chunk1[0].env[0].n_reads, 1)
+        self.assertEqual(chunk2[0].env[0].n_reads, 1)
+
     def test_task_copy_true(self):
         lrn1 = ModuloLearner("1")
         sim1 = CountReadSimulation()
@@ -419,5 +714,99 @@ class ProcessTasks_Tests(unittest.TestCase):
         self.assertEqual('ExceptionSimulation.params', str(CobaContext.logger.sink.items[4]))
         self.assertEqual('ExceptionEvaluator', str(CobaContext.logger.sink.items[7]))
 
+    def test_shared_prefix_read_once(self):
+        src  = CountReadSimulation()
+        envs = [ Pipes.join(src, Shuffle(1)), Pipes.join(src, Shuffle(2)) ]
+        val1 = ObserveEvaluator()
+
+        triples = list(product(envs,[ModuloLearner()],[val1]))
+        chunks  = list(ChunkTasks().filter(MakeTasks(triples).read()))
+        chunks  = [ pickle.loads(pickle.dumps(chunk)) for chunk in chunks ]
+        process = ProcessTasks()
+
+        keyed = [ chunk for chunk in chunks if chunk.key is not None ]
+        for chunk in chunks: list(process.filter(chunk))
+
+        #each task is its own chunk but they share a key so the prefix is only read once
+        self.assertEqual(4, len(keyed))
+        self.assertEqual(1, len({chunk.key for chunk in keyed}))
+        self.assertEqual(1, keyed[0][0].env[0].n_reads)
+        self.assertEqual(0, sum(chunk[0].env[0].n_reads for chunk in keyed[1:]))
+
+    def test_finalized_memoized(self):
+        sim1 = LambdaSimulation(5, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: cast(float,a))
+        env1 = Pipes.join(sim1, Chunk(), Cache())
+        val1 = SequentialCB(record=['reward'],seed=2)
+        tasks = [ Task((0,env1),(0,FixedLearner([1,0,0])),(0,val1)), Task((0,env1),(1,FixedLearner([0,1,0])),(0,val1)) ]
+
+        expected = list(ProcessTasks().filter([ Task((0,sim1),(t.lrn_id,t.lrn),(t.val_id,t.val)) for t in tasks ]))
+
+        with unittest.mock.patch.object(SequentialCB,'evaluate',autospec=True,side_effect=SequentialCB.evaluate) as evaluate:
+            actual = list(ProcessTasks().filter(tasks))
+
+        self.assertEqual(expected, actual)
+        self.assertIsInstance(evaluate.call_args_list[0][0][1], Finalized)
+        self.assertIs(evaluate.call_args_list[0][0][1], evaluate.call_args_list[1][0][1])
+
+    def test_finalized_not_memoized(self):
+        sim1 = LambdaSimulation(5, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: cast(float,a))
+        env1 = Pipes.join(sim1, Chunk(), Cache())
+        val1 = SequentialCB(record=['reward'],seed=2)
+
+        #without a cache or with only one evaluation there is nothing to gain from memoizing
+        tasks1 = [ Task((0,sim1),(0,FixedLearner([1,0,0])),(0,val1)), Task((0,sim1),(1,FixedLearner([0,1,0])),(0,val1)) ]
+        tasks2 = [ Task((0,env1),(0,FixedLearner([1,0,0])),(0,val1)) ]
+
+        with unittest.mock.patch.object(SequentialCB,'evaluate',autospec=True,side_effect=SequentialCB.evaluate) as evaluate:
+            list(ProcessTasks().filter(tasks1))
+            list(ProcessTasks().filter(tasks2))
+
+        self.assertEqual(3, evaluate.call_count)
+        self.assertNotIsInstance(evaluate.call_args_list[0][0][1], Finalized)
+        self.assertNotIsInstance(evaluate.call_args_list[1][0][1], Finalized)
+        self.assertNotIsInstance(evaluate.call_args_list[2][0][1], Finalized)
+
+    def test_lockstep(self):
+        sim1 = LambdaSimulation(20, lambda i: i, lambda i,c: [0,1,2], lambda i,c,a: cast(float,a))
+        val1 = SequentialCB(record=['reward','action','probability'],seed=2)
+
+        def tasks():
+            lrn1 = RandomLearner()
+            lrn2 = BanditEpsilonLearner(.2)
+            return [ Task((0,sim1),(0,lrn1),(0,val1)), Task((0,sim1),(1,lrn2),(0,val1),True), Task((0,sim1),(1,lrn2),(1,val1),True) ]
+
+        separate = list(ProcessTasks().filter(tasks()))
+
+        with unittest.mock.patch.object(LambdaSimulation,'read',autospec=True,side_effect=LambdaSimulation.read) as read:
+            lockstep = list(ProcessTasks(lockstep=True).filter(tasks()))
+
+        self.assertEqual(3, len(separate))
+        self.assertCountEqual(separate, lockstep)
+        self.assertEqual(2, read.call_count)
+
+    def test_lockstep_without_evaluates(self):
+        sim1 = CountReadSimulation()
+        val1 = ObserveEvaluator()
+        tasks = [ Task((0,sim1),(0,ModuloLearner()),(0,val1)), Task((0,sim1),(1,ModuloLearner()),(0,val1)) ]
+
+        self.assertEqual([['T4',(0,0,0),[]],['T4',(0,1,0),[]]], list(ProcessTasks(lockstep=True).filter(tasks)))
+        self.assertEqual(2, sim1.n_reads)
+
+    def test_lockstep_learner_exception(self):
+        class ExceptionLearner(Learner):
+            def predict(self, context, actions):
+                raise Exception("ExceptionLearner")
+            def learn(self, *args, **kwargs):
+                pass
+
+        sim1  = LambdaSimulation(2, lambda i: i, lambda i,c: [0,1], lambda i,c,a: cast(float,a))
+        val1  = SequentialCB(record='reward')
+        tasks = [ Task((0,sim1),(0,ExceptionLearner()),(0,val1)), Task((0,sim1),(1,FixedLearner([0,1])),(0,val1)) ]
+
+        transactions = list(ProcessTasks(lockstep=True).filter(tasks))
+
+        self.assertEqual([['T4',(0,1,0),[{'reward':1},{'reward':1}]]], transactions)
+        self.assertIn('ExceptionLearner', [str(i) for i in CobaContext.logger.sink.items])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
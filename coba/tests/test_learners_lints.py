@@ -19,7 +19,7 @@ class LinTSLearner_Tests(unittest.TestCase):
         self.assertAlmostEqual(counts[(id(actions[1]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertAlmostEqual(counts[(id(actions[2]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertEqual(learner._mu_hat.shape, (2,))
-        self.assertEqual(learner._B_inv.shape, (2,2))
+        self.assertEqual(learner._B_inv_sqrt.shape, (2,2))
 
     def test_value_context_value_actions(self):
         learner = LinTSLearner()
@@ -31,14 +31,14 @@ class LinTSLearner_Tests(unittest.TestCase):
         self.assertAlmostEqual(counts[(id(actions[1]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertAlmostEqual(counts[(id(actions[2]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertEqual(learner._mu_hat.shape, (3,))
-        self.assertEqual(learner._B_inv.shape, (3,3))
+        self.assertEqual(learner._B_inv_sqrt.shape, (3,3))
 
     def test_dense_context_dense_actions(self):
         learner = LinTSLearner()
         learner.predict([1,2,3], [[1,2,3,4],[5,6,7,8]])
         learner.learn([1,2,3], [5,6,7,8], 1, 1)
         self.assertEqual(learner._mu_hat.shape, (17,))
-        self.assertEqual(learner._B_inv.shape, (17,17))
+        self.assertEqual(learner._B_inv_sqrt.shape, (17,17))
 
     def test_dense_context_value_actions(self):
         learner = LinTSLearner()
@@ -55,7 +55,7 @@ class LinTSLearner_Tests(unittest.TestCase):
         learner.learn(None, 1, 1, .5)
         self.assertEqual(1/3,learner.score(None, [1,1,1],1))
         self.assertEqual(learner._mu_hat.shape, (2,))
-        self.assertEqual(learner._B_inv.shape, (2,2))
+        self.assertEqual(learner._B_inv_sqrt.shape, (2,2))
 
     def test_exploration_bound_greed(self):
         learner = LinTSLearner(v=0.2)
@@ -100,5 +100,80 @@ class LinTSLearner_Tests(unittest.TestCase):
         expected = {'family':'LinTS', 'v':0.2, 'features':['a','xa'], 'seed':1}
         self.assertEqual(actual,expected)
 
+    def test_params_diagonal(self):
+        actual = LinTSLearner(v=0.2,features=['a','xa'],diagonal=True).params
+        expected = {'family':'LinTS', 'v':0.2, 'features':['a','xa'], 'seed':1, 'diagonal':True}
+        self.assertEqual(actual,expected)
+
+    def test_square_root_matches_inverse(self):
+        import numpy as np
+        learner = LinTSLearner(features=['a','xa'])
+        inverse = np.identity(8)
+        for i in range(20):
+            features = np.array([ c*a for c in [1,i%3,1/(i+1)] for a in [1,i%2] ] + [1,i%2])[[6,7,0,1,2,3,4,5]]
+            learner.learn([1,i%3,1/(i+1)], [1,i%2], i%4, 1)
+            w = inverse @ features
+            inverse -= np.outer(w,w)/(1+w@features)
+        S = learner._B_inv_sqrt
+        self.assertTrue(np.allclose(inverse, S @ S.T))
+
+    def test_diagonal_learn_something(self):
+        learner = LinTSLearner(v=0.2, features='a', diagonal=True)
+        for _ in range(30):
+            learner.learn([1,2,3], (1,0,0), 1/4, 1/3)
+            learner.learn([1,2,3], (0,1,0), 4/4, 1/3)
+            learner.learn([1,2,3], (0,0,1), 3/4, 1/3)
+        self.assertEqual(learner._mu_hat.shape, (3,))
+        self.assertEqual(learner._B_inv_sqrt.shape, (3,))
+        self.assertAlmostEqual(learner._mu_hat[0], 1/4, delta=.05)
+        self.assertAlmostEqual(learner._mu_hat[1], 4/4, delta=.05)
+        self.assertAlmostEqual(learner._mu_hat[2], 3/4, delta=.05)
+
+    def test_unexplored_one_hot_actions_tie(self):
+        learner = LinTSLearner(v=0)
+        actions = [(1,0,0),(0,1,0),(0,0,1)]
+        for i in range(10):
+            context = [i%3+1,(i*7)%5+1]
+            learner.learn(context, actions[0], (i%4)/3, 1/3)
+            #actions that have never been played are symmetric so they must tie exactly
+            probs = [learner.score(context, actions, a) for a in actions]
+            self.assertEqual(probs[1], probs[2])
+            self.assertIn(probs[1], [0,1/2,1/3])
+
+    def test_diagonal_exact_for_one_hot(self):
+        import numpy as np
+        full = LinTSLearner(features=['xa'])
+        diag = LinTSLearner(features=['xa'], diagonal=True)
+        for i in range(20):
+            context = [int(i%3==j) for j in range(3)]
+            action  = (int(i%2==0),int(i%2==1))
+            full.learn(context, action, i%4, 1)
+            diag.learn(context, action, i%4, 1)
+        self.assertTrue(np.allclose(full._mu_hat, diag._mu_hat))
+        self.assertTrue(np.allclose(np.diag(full._B_inv_sqrt @ full._B_inv_sqrt.T), diag._B_inv_sqrt**2))
+
+    def test_batch_learn(self):
+        import numpy as np
+        class Batch(list): is_batch=True
+        batched    = LinTSLearner(features=['a','xa'])
+        sequential = LinTSLearner(features=['a','xa'])
+        contexts, actions, rewards = [[1,2],[3,4],[5,6]], [(1,0),(0,1),(1,0)], [1,0,.5]
+        batched.learn(Batch(contexts),Batch(actions),Batch(rewards),Batch([1,1,1]))
+        for c,a,r in zip(contexts,actions,rewards): sequential.learn(c,a,r,1)
+        self.assertTrue(np.allclose(batched._mu_hat, sequential._mu_hat))
+        self.assertTrue(np.allclose(batched._B_inv_sqrt, sequential._B_inv_sqrt))
+
+    def test_batch_predict_and_score(self):
+        class Batch(list): is_batch=True
+        learner = LinTSLearner(v=0.2,features=['a','xa'])
+        learner.learn([1,2], (1,0), 1, 1)
+        actions = Batch([[(1,0),(0,1)],[(1,0),(0,1),(1,1)]])
+        preds   = learner.predict(Batch([[1,2],[3,4]]), actions)
+        scores  = learner.score(Batch([[1,2],[3,4]]), actions, Batch([a for a,_ in preds]))
+        self.assertEqual(2, len(preds))
+        self.assertIn(preds[0][0], actions[0])
+        self.assertIn(preds[1][0], actions[1])
+        self.assertEqual([p for _,p in preds], scores)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
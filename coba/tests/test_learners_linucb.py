@@ -24,14 +24,14 @@ class LinUCBLearner_Tests(unittest.TestCase):
         self.assertAlmostEqual(counts[(id(actions[1]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertAlmostEqual(counts[(id(actions[2]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertEqual(learner._theta.shape, (5,))
-        self.assertEqual(learner._A_inv.shape, (5,5))
+        self.assertEqual(learner._A_inv_sqrt.shape, (5,5))
 
     def test_score(self):
         learner = LinUCBLearner()
         learner.learn(None, 1, 1, .5)
         self.assertEqual(1/3,learner.score(None, [1,1,1],1))
         self.assertEqual(learner._theta.shape, (2,))
-        self.assertEqual(learner._A_inv.shape, (2,2))
+        self.assertEqual(learner._A_inv_sqrt.shape, (2,2))
 
     def test_none_context(self):
         learner = LinUCBLearner()
@@ -44,7 +44,7 @@ class LinUCBLearner_Tests(unittest.TestCase):
         self.assertAlmostEqual(counts[(id(actions[1]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertAlmostEqual(counts[(id(actions[2]),.33)]/sum(counts.values()),.33, delta=.05)
         self.assertEqual(learner._theta.shape, (2,))
-        self.assertEqual(learner._A_inv.shape, (2,2))
+        self.assertEqual(learner._A_inv_sqrt.shape, (2,2))
 
     def test_exploration_bound_greed(self):
         learner = LinUCBLearner(alpha=0.2)
@@ -69,7 +69,7 @@ class LinUCBLearner_Tests(unittest.TestCase):
             learner.learn([1,2,3], (0,1,0), 4/4, 1/3)
             learner.learn([1,2,3], (0,0,1), 3/4, 1/3)
         self.assertEqual(learner._theta.shape, (3,))
-        self.assertEqual(learner._A_inv.shape, (3,3))
+        self.assertEqual(learner._A_inv_sqrt.shape, (3,3))
         self.assertAlmostEqual(learner._theta[0], 1/4, delta=.05)
         self.assertAlmostEqual(learner._theta[1], 4/4, delta=.05)
         self.assertAlmostEqual(learner._theta[2], 3/4, delta=.05)
@@ -90,5 +90,80 @@ class LinUCBLearner_Tests(unittest.TestCase):
         expected = {'family':'LinUCB', 'alpha':0.2, 'features':['a','xa'], 'seed':1}
         self.assertEqual(actual,expected)
 
+    def test_params_diagonal(self):
+        actual = LinUCBLearner(alpha=0.2,features=['a','xa'],diagonal=True).params
+        expected = {'family':'LinUCB', 'alpha':0.2, 'features':['a','xa'], 'seed':1, 'diagonal':True}
+        self.assertEqual(actual,expected)
+
+    def test_square_root_matches_inverse(self):
+        import numpy as np
+        learner = LinUCBLearner(features=['a','xa'])
+        inverse = np.identity(8)
+        for i in range(20):
+            features = np.array([ c*a for c in [1,i%3,1/(i+1)] for a in [1,i%2] ] + [1,i%2])[[6,7,0,1,2,3,4,5]]
+            learner.learn([1,i%3,1/(i+1)], [1,i%2], i%4, 1)
+            w = inverse @ features
+            inverse -= np.outer(w,w)/(1+w@features)
+        S = learner._A_inv_sqrt
+        self.assertTrue(np.allclose(inverse, S @ S.T))
+
+    def test_diagonal_learn_something(self):
+        learner = LinUCBLearner(alpha=0.2, features='a', diagonal=True)
+        for _ in range(30):
+            learner.learn([1,2,3], (1,0,0), 1/4, 1/3)
+            learner.learn([1,2,3], (0,1,0), 4/4, 1/3)
+            learner.learn([1,2,3], (0,0,1), 3/4, 1/3)
+        self.assertEqual(learner._theta.shape, (3,))
+        self.assertEqual(learner._A_inv_sqrt.shape, (3,))
+        self.assertAlmostEqual(learner._theta[0], 1/4, delta=.05)
+        self.assertAlmostEqual(learner._theta[1], 4/4, delta=.05)
+        self.assertAlmostEqual(learner._theta[2], 3/4, delta=.05)
+
+    def test_unexplored_one_hot_actions_tie(self):
+        learner = LinUCBLearner()
+        actions = [(1,0,0),(0,1,0),(0,0,1)]
+        for i in range(10):
+            context = [i%3+1,(i*7)%5+1]
+            learner.learn(context, actions[0], (i%4)/3, 1/3)
+            #actions that have never been played are symmetric so they must tie exactly
+            probs = [learner.score(context, actions, a) for a in actions]
+            self.assertEqual(probs[1], probs[2])
+            self.assertIn(probs[1], [0,1/2,1/3])
+
+    def test_diagonal_exact_for_one_hot(self):
+        import numpy as np
+        full = LinUCBLearner(features=['xa'])
+        diag = LinUCBLearner(features=['xa'], diagonal=True)
+        for i in range(20):
+            context = [int(i%3==j) for j in range(3)]
+            action  = (int(i%2==0),int(i%2==1))
+            full.learn(context, action, i%4, 1)
+            diag.learn(context, action, i%4, 1)
+        self.assertTrue(np.allclose(full._theta, diag._theta))
+        self.assertTrue(np.allclose(np.diag(full._A_inv_sqrt @ full._A_inv_sqrt.T), diag._A_inv_sqrt**2))
+
+    def test_batch_learn(self):
+        import numpy as np
+        class Batch(list): is_batch=True
+        batched    = LinUCBLearner(features=['a','xa'])
+        sequential = LinUCBLearner(features=['a','xa'])
+        contexts, actions, rewards = [[1,2],[3,4],[5,6]], [(1,0),(0,1),(1,0)], [1,0,.5]
+        batched.learn(Batch(contexts),Batch(actions),Batch(rewards),Batch([1,1,1]))
+        for c,a,r in zip(contexts,actions,rewards): sequential.learn(c,a,r,1)
+        self.assertTrue(np.allclose(batched._theta, sequential._theta))
+        self.assertTrue(np.allclose(batched._A_inv_sqrt, sequential._A_inv_sqrt))
+
+    def test_batch_predict_and_score(self):
+        class Batch(list): is_batch=True
+        learner = LinUCBLearner(alpha=0.2,features=['a','xa'])
+        learner.learn([1,2], (1,0), 1, 1)
+        actions = Batch([[(1,0),(0,1)],[(1,0),(0,1),(1,1)]])
+        preds   = learner.predict(Batch([[1,2],[3,4]]), actions)
+        scores  = learner.score(Batch([[1,2],[3,4]]), actions, Batch([a for a,_ in preds]))
+        self.assertEqual(2, len(preds))
+        self.assertIn(preds[0][0], actions[0])
+        self.assertIn(preds[1][0], actions[1])
+        self.assertEqual([p for _,p in preds], scores)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
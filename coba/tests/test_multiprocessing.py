@@ -158,6 +158,16 @@ class CobaMultiprocessor_ProcessFilter_Tests(unittest.TestCase):
         self.assertIsInstance(CobaContext.logger, IndentLogger)
         self.assertIsInstance(CobaContext.cacher, MemoryCacher)
         self.assertIsInstance(CobaContext.store , dict)
+
+    def test_cache_memory_set_correctly(self):
+        CobaContext.logger = NullLogger()
+        CobaContext.cache_memory = None
+
+        try:
+            list(CobaMultiprocessor.ProcessFilter(Identity(),IndentLogger(),MemoryCacher(),{},ListSink(),1000).filter([1]))
+            self.assertEqual(1000, CobaContext.cache_memory)
+        finally:
+            CobaContext.cache_memory = None
         self.assertIsInstance(CobaContext.logger.sink, ListSink)
 
     def test_exception_logged_but_not_thrown(self):
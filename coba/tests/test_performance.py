@@ -89,6 +89,13 @@ class Performance_Tests(unittest.TestCase):
         a       = [1,2,3]
         self._assert_call_time(lambda: encoder.encode(x=x,a=a), .030, print_time, number=1000)
 
+    @unittest.skipUnless(PackageChecker.numpy(strict=False), "numpy is not installed")
+    def test_dense_interaction_xxa_encodes_performance(self):
+        encoder = InteractionsEncoder(["x","a","xa","xxa"])
+        x       = list(range(10))
+        a       = [[int(i==j) for i in range(10)] for j in range(10)]
+        self._assert_call_time(lambda: encoder.encodes(x=x,a=a), .1, print_time, number=1000)
+
     def test_sparse_interaction_abc_encode_performance(self):
         encoder = InteractionsEncoder(["aabc"])
         a       = dict(zip(map(str,range(5)), count()))
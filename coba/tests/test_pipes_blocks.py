@@ -0,0 +1,134 @@
+import pickle
+import unittest
+
+from pathlib import Path
+
+from coba.exceptions import CobaException
+from coba.primitives import Categorical
+from coba.pipes import ArffReader, LazyDense, LazySparse
+from coba.pipes.blocks import RowBlockSink, RowBlockSource, is_blocks
+
+class RowBlock_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path = Path("coba/tests/.temp/rows.blk")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists(): self.path.unlink()
+
+    def tearDown(self) -> None:
+        if self.path.exists(): self.path.unlink()
+
+    def _roundtrip(self, rows, block_size=2**14):
+        RowBlockSink(self.path, block_size).write(rows)
+        return list(RowBlockSource(self.path).read())
+
+    def test_empty(self):
+        self.assertEqual([], self._roundtrip([]))
+        self.assertTrue(is_blocks(self.path))
+
+    def test_is_blocks(self):
+        self.assertFalse(is_blocks("coba/tests/.temp/not_there.blk"))
+        self.path.write_text("abc")
+        self.assertFalse(is_blocks(self.path))
+
+    def test_dense_typed_columns(self):
+        rows = [[1.5,1,'a',None],[2.5,2,'b',True]]
+        out  = self._roundtrip(rows)
+        self.assertEqual(rows, list(map(list,out)))
+        self.assertIsInstance(out[0][1], int)
+        self.assertIsInstance(out[0][0], float)
+
+    def test_dense_categorical(self):
+        levels = ['x','y','z']
+        rows   = [[Categorical('x',levels)],[None],[Categorical('z',levels)]]
+        out    = self._roundtrip(rows)
+        self.assertEqual(rows, list(map(list,out)))
+        self.assertIsInstance(out[0][0], Categorical)
+        self.assertEqual(levels, out[2][0].levels)
+        self.assertEqual(2, out[2][0].as_int)
+        self.assertEqual((0,0,1), out[2][0].as_onehot)
+
+    def test_dense_headers_and_missing(self):
+        rows = [LazyDense([1.,2.],None,{'a':0,'b':1},False), LazyDense([3.,4.],None,{'a':0,'b':1},True)]
+        out  = self._roundtrip(rows)
+        self.assertEqual([2.,4.], [r['b'] for r in out])
+        self.assertEqual([False,True], [r.missing for r in out])
+
+    def test_dense_without_missing(self):
+        out = self._roundtrip([[1.],[2.]])
+        self.assertFalse(hasattr(out[0],'missing'))
+
+    def test_dense_differing_lengths(self):
+        with self.assertRaises(CobaException):
+            self._roundtrip([[1.],[2.,3.]])
+
+    def test_failed_write_keeps_old_file(self):
+        RowBlockSink(self.path).write([[1.],[2.]])
+        with self.assertRaises(CobaException):
+            RowBlockSink(self.path).write([[1.],[2.,3.]])
+        self.assertEqual([[1.],[2.]], list(map(list,RowBlockSource(self.path).read())))
+        self.assertFalse(Path(f"{self.path}.tmp").exists())
+
+    def test_sparse(self):
+        levels = ['0','b']
+        rows = [{'a':1.,'c':Categorical('b',levels)},{},{'b':'x','c':Categorical('0',levels)}]
+        out  = self._roundtrip(rows)
+        self.assertEqual(rows, [dict(r.items()) for r in out])
+        self.assertIsInstance(out[2]['c'], Categorical)
+        self.assertEqual({'a','c'}, set(out[0].keys()))
+
+    def test_sparse_missing(self):
+        rows = [LazySparse({'a':1.},missing=False),LazySparse({'a':None},missing=True)]
+        out  = self._roundtrip(rows)
+        self.assertEqual([False,True], [r.missing for r in out])
+        self.assertEqual([(('a',1.),),(('a',None),)], [r.items() for r in out])
+
+    def test_multiple_blocks(self):
+        levels = ['a','b']
+        rows   = [[float(i),Categorical(levels[i%2],levels)] for i in range(7)]
+        out    = self._roundtrip(rows, block_size=3)
+        self.assertEqual(rows, list(map(list,out)))
+
+    def test_rows_are_picklable(self):
+        out = self._roundtrip([LazyDense([1.,2.],None,{'a':0,'b':1},False)])
+        row = pickle.loads(pickle.dumps(out[0]))
+        self.assertEqual([1.,2.], list(row))
+        self.assertEqual(2., row['b'])
+
+    def test_arff_rows(self):
+        lines = [
+            "@relation test",
+            "@attribute a numeric",
+            "@attribute b {x,y}",
+            "@attribute c string",
+            "@data",
+            "1,x,abc",
+            "?,y,?",
+        ]
+        rows = list(ArffReader().filter(lines))
+        out  = self._roundtrip(rows)
+        self.assertEqual([list(r) for r in rows], [list(r) for r in out])
+        self.assertEqual([r.missing for r in rows], [r.missing for r in out])
+        self.assertEqual('y', out[1]['b'])
+
+    def test_corrupted_block(self):
+        RowBlockSink(self.path).write([[1.],[2.]])
+        with open(self.path,'r+b') as f:
+            f.seek(-1,2)
+            f.write(b'x')
+        with self.assertRaises(CobaException):
+            list(RowBlockSource(self.path).read())
+
+    def test_truncated_block(self):
+        RowBlockSink(self.path).write([[1.],[2.]])
+        with open(self.path,'r+b') as f: f.truncate(self.path.stat().st_size-3)
+        with self.assertRaises(CobaException):
+            list(RowBlockSource(self.path).read())
+
+    def test_not_blocks(self):
+        self.path.write_text("abc")
+        with self.assertRaises(CobaException):
+            list(RowBlockSource(self.path).read())
+
+if __name__ == '__main__':
+    unittest.main()
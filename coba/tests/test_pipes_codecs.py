@@ -0,0 +1,109 @@
+import unittest
+import unittest.mock
+
+from pathlib import Path
+
+from coba.exceptions import CobaException
+from coba.registry import JsonMakerV1, CobaRegistry
+from coba.utilities import PackageChecker
+from coba.context import DiskCacher
+from coba.pipes.codecs import GzipCodec, Bz2Codec, LzmaCodec, ZstdCodec, Lz4Codec, detect_codec, open_file
+
+class Codec_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path = Path("coba/tests/.temp/codec.txt")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists(): self.path.unlink()
+
+    def tearDown(self) -> None:
+        if self.path.exists(): self.path.unlink()
+
+    def _test_roundtrip(self, codec):
+        with open_file(self.path, 'wt', codec) as f: f.write('a\n')
+        with open_file(self.path, 'at', GzipCodec()) as f: f.write('b\n')
+
+        self.assertIsInstance(detect_codec(self.path), type(codec))
+        with open_file(self.path, 'rt') as f: self.assertEqual(['a\n','b\n'], list(f))
+        with open_file(self.path, 'rb') as f: self.assertEqual(b'a\nb\n', f.read())
+
+    def test_gzip(self):
+        self._test_roundtrip(GzipCodec(1))
+        self.assertEqual({'codec':'gzip','level':1}, GzipCodec(1).params)
+
+    def test_bz2(self):
+        self._test_roundtrip(Bz2Codec(1))
+        self.assertEqual({'codec':'bz2','level':1}, Bz2Codec(1).params)
+
+    def test_lzma(self):
+        self._test_roundtrip(LzmaCodec(0))
+        self.assertEqual({'codec':'lzma','level':0}, LzmaCodec(0).params)
+
+    @unittest.skipUnless(PackageChecker.zstandard(strict=False), "zstandard is not installed so we must skip this test.")
+    def test_zstd(self):
+        self._test_roundtrip(ZstdCodec(1))
+
+    @unittest.skipUnless(PackageChecker.lz4(strict=False), "lz4 is not installed so we must skip this test.")
+    def test_lz4(self):
+        self._test_roundtrip(Lz4Codec(1))
+
+    def test_plain(self):
+        with open_file(self.path, 'wt') as f: f.write('BZh91AY\n')
+        with open_file(self.path, 'at', GzipCodec()) as f: f.write('b\n')
+
+        self.assertIsNone(detect_codec(self.path))
+        with open_file(self.path, 'rt') as f: self.assertEqual(['BZh91AY\n','b\n'], list(f))
+
+    def test_detect_missing_file(self):
+        self.assertIsNone(detect_codec("coba/tests/.temp/not_there.txt"))
+
+    def test_plus_mode(self):
+        with open_file(self.path, 'a+', Bz2Codec()) as f: f.write('a\n')
+        with open_file(self.path, 'rt+') as f: self.assertEqual(['a\n'], list(f))
+
+    def test_append_uses_matching_codec(self):
+        with open_file(self.path, 'wt', GzipCodec()) as f: f.write('a\n')
+
+        codec = GzipCodec(1)
+        with unittest.mock.patch.object(codec, '_open', wraps=codec._open) as spy:
+            with open_file(self.path, 'at', codec) as f: f.write('b\n')
+
+        spy.assert_called_once()
+        with open_file(self.path, 'rt') as f: self.assertEqual(['a\n','b\n'], list(f))
+
+    def test_append_ignores_other_codec(self):
+        with open_file(self.path, 'wt', Bz2Codec()) as f: f.write('a\n')
+
+        codec = GzipCodec(1)
+        with unittest.mock.patch.object(codec, '_open', wraps=codec._open) as spy:
+            with open_file(self.path, 'at', codec) as f: f.write('b\n')
+
+        spy.assert_not_called()
+        self.assertIsInstance(detect_codec(self.path), Bz2Codec)
+
+    def test_empty_append_uses_codec(self):
+        self.path.touch()
+        with open_file(self.path, 'ab', LzmaCodec()) as f: f.write(b'a')
+        self.assertIsInstance(detect_codec(self.path), LzmaCodec)
+
+    def test_cacher_config(self):
+        cacher = JsonMakerV1(CobaRegistry.registry).make({"DiskCacher": {"cache_dir": "coba/tests/.temp/codec_cache", "codec": {"Bz2Codec": 1}}})
+        try:
+            with cacher.get_set("test.csv", ["a","b"]) as out:
+                self.assertEqual(["a\n","b\n"], list(out))
+            self.assertIsInstance(detect_codec(cacher._cache_path("test.csv")), Bz2Codec)
+            self.assertEqual("test.csv.gz", cacher._cache_path("test.csv").name)
+        finally:
+            cacher.rmv("test.csv")
+
+    def test_cacher_reads_other_codecs(self):
+        cacher = DiskCacher("coba/tests/.temp/codec_cache", LzmaCodec())
+        try:
+            cacher.get_set("test.csv", ["a"])
+            with DiskCacher("coba/tests/.temp/codec_cache").get_set("test.csv", None) as out:
+                self.assertEqual(["a\n"], list(out))
+        finally:
+            cacher.rmv("test.csv")
+
+if __name__ == '__main__':
+    unittest.main()
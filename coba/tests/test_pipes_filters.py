@@ -1,3 +1,4 @@
+import pickle
 import unittest
 import unittest.mock
 
@@ -130,6 +131,45 @@ class Shuffle_Tests(unittest.TestCase):
         with self.assertRaises(ValueError):
             Shuffle('A')
 
+    def test_bad_max_items(self):
+        with self.assertRaises(ValueError):
+            Shuffle(1,0)
+
+        with self.assertRaises(ValueError):
+            Shuffle(1,'A')
+
+    def test_max_items_in_memory(self):
+        self.assertEqual(list(Shuffle(40).filter(range(10))), list(Shuffle(40,10).filter(range(10))))
+
+    def test_max_items_spilled(self):
+        shuffled = list(Shuffle(40,10).filter(range(1000)))
+        self.assertEqual(list(range(1000)), sorted(shuffled))
+        self.assertNotEqual(list(range(1000)), shuffled)
+        self.assertEqual(shuffled, list(Shuffle(40,10).filter(range(1000))))
+        self.assertNotEqual(shuffled, list(Shuffle(41,10).filter(range(1000))))
+
+    def test_max_items_spilled_objects(self):
+        items = [ {'a':[i]} for i in range(100) ]
+        shuffled = list(Shuffle(1,3).filter(items))
+        self.assertCountEqual(items, shuffled)
+
+    def test_sequence_not_copied(self):
+        class CountSequence(list):
+            n_iters = 0
+            def __iter__(self):
+                self.n_iters += 1
+                return super().__iter__()
+
+        items = CountSequence(range(100))
+        self.assertEqual(list(Shuffle(40).filter(list(range(100)))), list(Shuffle(40).filter(items)))
+        self.assertEqual(list(Shuffle(40).filter(iter(range(100)))), list(Shuffle(40).filter(items)))
+        self.assertEqual(0, items.n_iters)
+        self.assertEqual(list(range(100)), items)
+
+    def test_params(self):
+        self.assertEqual({'shuffle_seed':1}, Shuffle(1).params)
+        self.assertEqual({'shuffle_seed':1, 'shuffle_max_items':5}, Shuffle(1,5).params)
+
 class Take_Tests(unittest.TestCase):
 
     def test_bad_count(self):
@@ -520,5 +560,92 @@ class Cache_Tests(unittest.TestCase):
         self.assertEqual([],cache._cache)
         self.assertEqual([],list(cache.filter([1,2,3,4])))
 
+    def test_cache_no_budget_not_spilled(self):
+        CobaContext.cache_memory = None
+        cache = Cache(2)
+        list(cache.filter(range(1000)))
+        self.assertIsNone(cache._file)
+        self.assertEqual(list(range(1000)), cache._cache)
+
+class CacheMemory_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        CobaContext.cache_memory = None
+
+    def tearDown(self) -> None:
+        CobaContext.cache_memory = None
+
+    def test_least_recently_used_spilled(self):
+        CobaContext.cache_memory = 5_000
+        cache1 = Cache(10)
+        cache2 = Cache(10)
+
+        self.assertEqual(list(range(100)), list(cache1.filter(range(100))))
+        self.assertIsNone(cache1._file)
+
+        self.assertEqual(list(range(100,200)), list(cache2.filter(range(100,200))))
+        self.assertIsNotNone(cache1._file)
+        self.assertIsNone(cache1._cache)
+        self.assertIsNone(cache2._file)
+
+        self.assertEqual(list(range(100)), list(cache1.filter(None)))
+        self.assertEqual(list(range(100)), list(cache1.filter(None)))
+        self.assertEqual(list(range(100,200)), list(cache2.filter(None)))
+
+    def test_touch_changes_spill_order(self):
+        CobaContext.cache_memory = 10_000
+        cache1 = Cache(10)
+        cache2 = Cache(10)
+        cache3 = Cache(10)
+
+        list(cache1.filter(range(100)))
+        list(cache2.filter(range(100)))
+        list(cache1.filter(None))
+        list(cache3.filter(range(100)))
+
+        self.assertIsNone(cache1._file)
+        self.assertIsNotNone(cache2._file)
+        self.assertIsNone(cache3._file)
+
+    def test_spilled_while_filling(self):
+        CobaContext.cache_memory = 1_000
+        cache = Cache(10)
+
+        self.assertEqual(list(range(100)), list(cache.filter(range(100))))
+        self.assertIsNotNone(cache._file)
+        self.assertEqual(list(range(100)), list(cache.filter(None)))
+
+    def test_spilled_interleaved_reads(self):
+        CobaContext.cache_memory = 1_000
+        cache = Cache(10)
+        list(cache.filter(range(100)))
+
+        reader1 = iter(cache.filter(None))
+        reader2 = iter(cache.filter(None))
+        self.assertEqual([(i,i) for i in range(100)], list(zip(reader1,reader2)))
+
+    def test_spilled_pickle(self):
+        CobaContext.cache_memory = 1_000
+        cache = Cache(10)
+        list(cache.filter([{'a':i} for i in range(100)]))
+        self.assertIsNotNone(cache._file)
+
+        CobaContext.cache_memory = None
+        unpickled = pickle.loads(pickle.dumps(cache))
+        self.assertIsNone(unpickled._file)
+        self.assertEqual([{'a':i} for i in range(100)], list(unpickled.filter(None)))
+
+    def test_unpickled_cache_counted(self):
+        cache = Cache(10)
+        list(cache.filter(range(100)))
+
+        CobaContext.cache_memory = 6_000
+        unpickled1 = pickle.loads(pickle.dumps(cache))
+        unpickled2 = pickle.loads(pickle.dumps(cache))
+
+        self.assertIsNotNone(unpickled1._file)
+        self.assertIsNone(unpickled2._file)
+        self.assertEqual(list(range(100)), list(unpickled1.filter(None)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
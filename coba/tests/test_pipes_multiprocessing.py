@@ -6,13 +6,15 @@ import pickle
 import multiprocessing as mp
 import threading as mt
 
+from queue import Queue
+
 from typing import Iterable, Any
 
 from coba.utilities  import PackageChecker
 from coba.exceptions import CobaException
 from coba.pipes      import Identity
 
-from coba.pipes.multiprocessing import Multiprocessor, Pickler, Unpickler, EventSetter, Foreach, Safe
+from coba.pipes.multiprocessing import Multiprocessor, Pickler, Unpickler, EventSetter, Foreach, Safe, AffinityRouter
 
 spawn_context = mp.get_context("spawn")
 
@@ -39,6 +41,10 @@ class ProcessNameFilter:
     def filter(self, items: Iterable[Any]) -> Iterable[Any]:
         yield f"pid-{spawn_context.current_process().pid}"
 
+class ItemProcessNameFilter:
+    def filter(self, item: Any) -> Any:
+        yield (item, f"pid-{spawn_context.current_process().pid}")
+
 class BarrierNameFilter:
     def __init__(self, n):
         self._barrier = spawn_context.Barrier(n)
@@ -54,6 +60,11 @@ class ExceptionFilter:
     def filter(self, items: Iterable[Any]) -> Iterable[Any]:
         raise self._exc
 
+class OddExceptionFilter:
+    def filter(self, item: int) -> int:
+        if item % 2: raise Exception("Exception Filter")
+        return item
+
 class Foreach_Tests(unittest.TestCase):
     def test_simple(self):
         #Why does it work this way? What problem was I trying to solve?
@@ -62,6 +73,41 @@ class Foreach_Tests(unittest.TestCase):
         self.assertEqual(list(Foreach(Identity()).filter([[1,2,3]])),[[1,2,3]])
         self.assertEqual(list(Foreach(Identity()).filter([iter([1,2,3])])),[1,2,3])
 
+class AffinityRouter_Tests(unittest.TestCase):
+
+    def _items(self, queue):
+        items = []
+        while not queue.empty(): items.append(pickle.loads(queue.get()))
+        return items
+
+    def test_same_key_same_queue(self):
+        queues = [Queue(),Queue()]
+        AffinityRouter(queues, lambda i: i[0]).write([('a',1),('b',1),('a',2),('b',2)])
+        self.assertEqual([('a',1),('a',2)], self._items(queues[0]))
+        self.assertEqual([('b',1),('b',2)], self._items(queues[1]))
+
+    def test_new_key_skips_full_queue(self):
+        queues = [Queue(maxsize=1),Queue(maxsize=3)]
+        AffinityRouter(queues, lambda i: i[0]).write([('a',1),('b',1),('b',2),('c',1)])
+        self.assertEqual([('a',1)], self._items(queues[0]))
+        self.assertEqual([('b',1),('b',2),('c',1)], self._items(queues[1]))
+
+    def test_close(self):
+        queues = [Queue(maxsize=1),Queue()]
+        router = AffinityRouter(queues, lambda i: i[0])
+        router.write([('a',1)])
+        router.close(0)
+        router.write([('a',2),('b',1)])
+        self.assertEqual([], self._items(queues[0]))
+        self.assertEqual([('a',2),('b',1)], self._items(queues[1]))
+
+    def test_all_closed(self):
+        queues = [Queue(maxsize=1)]
+        router = AffinityRouter(queues, lambda i: i)
+        router.close(0)
+        router.write([1,2])
+        self.assertEqual([], self._items(queues[0]))
+
 class Multiprocessor_Tests(unittest.TestCase):
 
     def test_single_process(self):
@@ -102,6 +148,31 @@ class Multiprocessor_Tests(unittest.TestCase):
         items = list(Multiprocessor(BarrierNameFilter(2), 2).filter(range(2)))
         self.assertEqual(len(set(items)), 2)
 
+    def test_multiprocess_affinity(self):
+        items = list(Multiprocessor(ItemProcessNameFilter(), 2, affinity=lambda i: i%2).filter(range(8)))
+        self.assertCountEqual([i for i,_ in items], range(8))
+        self.assertEqual(len(set(pid for i,pid in items if i%2==0)), 1)
+        self.assertEqual(len(set(pid for i,pid in items if i%2==1)), 1)
+
+    def test_multiprocess_affinity_none_key(self):
+        items = list(Multiprocessor(ItemProcessNameFilter(), 2, affinity=lambda i: None).filter(range(4)))
+        self.assertCountEqual([i for i,_ in items], range(4))
+
+    def test_multiprocess_affinity_singleperchild(self):
+        items = list(Multiprocessor(ItemProcessNameFilter(), 2, 1, affinity=lambda i: i%2).filter(range(4)))
+        self.assertCountEqual([i for i,_ in items], range(4))
+        self.assertEqual(len(set(pid for _,pid in items)), 4)
+
+    def test_filter_exception_affinity_many_items(self):
+        with self.assertRaises(Exception) as e:
+            list(Multiprocessor(OddExceptionFilter(), 2, affinity=lambda i: i%2).filter(range(20)))
+        self.assertIn("Exception Filter", str(e.exception))
+
+    def test_filter_exception_affinity(self):
+        with self.assertRaises(Exception) as e:
+            list(Multiprocessor(ExceptionFilter(), 2, 1, affinity=lambda i: i).filter(range(4)))
+        self.assertIn("Exception Filter", str(e.exception))
+
     def test_filter_exception(self):
         with self.assertRaises(Exception) as e:
             list(Multiprocessor(ExceptionFilter(), 2, 1).filter(range(4)))
@@ -1,4 +1,5 @@
 import unittest
+import unittest.mock
 
 from coba.exceptions import CobaException
 
@@ -40,6 +41,80 @@ class ArffReader_Tests(unittest.TestCase):
 
         self.assertEqual(expected, list(ArffReader().filter(lines)))
 
+    def test_numeric_dense_data(self):
+        lines = [
+            "@relation test",
+            "@attribute A numeric",
+            "@attribute B real",
+            "@attribute C integer",
+            "@data",
+            "1,2.5,3",
+            "% a comment",
+            "4, 5,6",
+        ]
+
+        rows = list(ArffReader().filter(lines))
+        self.assertEqual([[1,2.5,3],[4,5,6]], rows)
+        self.assertEqual([False,False], [r.missing for r in rows])
+        self.assertEqual(5, rows[1]['B'])
+
+    def test_numeric_dense_data_tabs(self):
+        lines = [
+            "@relation test",
+            "@attribute A numeric",
+            "@attribute B numeric",
+            "@data",
+            "1\t2",
+            "3\t4",
+        ]
+
+        self.assertEqual([[1,2],[3,4]], list(ArffReader().filter(lines)))
+
+    def test_numeric_dense_data_fallback(self):
+        lines = [
+            "@relation test",
+            "@attribute A numeric",
+            "@attribute B numeric",
+            "@data",
+            "1,2",
+            "?,4",
+            "'5',6",
+            "7,",
+        ]
+
+        rows = list(ArffReader().filter(lines))
+        self.assertEqual([[1,2],[None,4],[5,6],[7,None]], rows)
+        self.assertEqual([False,True,False,False], [r.missing for r in rows])
+
+    def test_numeric_dense_data_wrong_columns(self):
+        lines = [
+            "@relation test",
+            "@attribute A numeric",
+            "@attribute B numeric",
+            "@data",
+            "1,2,3",
+            "4",
+        ]
+
+        rows = list(ArffReader().filter(lines))
+        with self.assertRaises(CobaException):
+            list(rows[0])
+
+    def test_numeric_dense_data_many_blocks(self):
+        lines = [
+            "@relation test",
+            "@attribute A numeric",
+            "@attribute B numeric",
+            "@data",
+        ]
+
+        lines += [ f"{i},{i}" if i != 3 else "?,3" for i in range(10) ]
+
+        with unittest.mock.patch.object(ArffReader,'_block_size',3):
+            rows = list(ArffReader().filter(lines))
+
+        self.assertEqual([[i,i] if i != 3 else [None,3] for i in range(10)], rows)
+
     def test_capital_data(self):
         lines = [
             "@relation test",
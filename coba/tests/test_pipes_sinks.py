@@ -2,11 +2,14 @@ import unittest
 import unittest.mock
 import pickle
 import gzip
+import bz2
+import lzma
 
 from pathlib import Path
 
 from coba.context import NullLogger, CobaContext
 
+from coba.pipes.codecs import Bz2Codec, LzmaCodec
 from coba.pipes.sinks import DiskSink, ListSink, QueueSink, NullSink, ConsoleSink, LambdaSink, FiltersSink
 
 CobaContext.logger = NullLogger()
@@ -166,6 +169,19 @@ class DiskSink_Tests(unittest.TestCase):
         lines = gzip.decompress(Path("coba/tests/.temp/test.gz").read_bytes()).decode('utf-8').splitlines()
         self.assertEqual(["a","b","c"], lines)
 
+    def test_with_codec(self):
+        sink = DiskSink("coba/tests/.temp/test.log", codec=Bz2Codec())
+        sink.write("a")
+        sink.write(["b","c"])
+        lines = bz2.decompress(Path("coba/tests/.temp/test.log").read_bytes()).decode('utf-8').splitlines()
+        self.assertEqual(["a","b","c"], lines)
+
+    def test_append_keeps_codec(self):
+        DiskSink("coba/tests/.temp/test.gz", codec=LzmaCodec()).write("a")
+        DiskSink("coba/tests/.temp/test.gz").write("b")
+        lines = lzma.decompress(Path("coba/tests/.temp/test.gz").read_bytes()).decode('utf-8').splitlines()
+        self.assertEqual(["a","b"], lines)
+
     def test_is_picklable(self):
         pickle.dumps(DiskSink("coba/tests/.temp/test.gz"))
 
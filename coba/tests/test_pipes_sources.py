@@ -2,6 +2,7 @@ import unittest
 import unittest.mock
 import pickle
 import gzip
+import lzma
 
 from urllib import request, error
 from queue import Queue
@@ -159,6 +160,10 @@ class DiskSource_Tests(unittest.TestCase):
         Path("coba/tests/.temp/test.gz").write_bytes(gzip.compress(b'a\nb\nc'))
         self.assertEqual(["a","b","c"], list(DiskSource("coba/tests/.temp/test.gz").read()))
 
+    def test_detects_codec_sans_extension(self):
+        Path("coba/tests/.temp/test.log").write_bytes(lzma.compress(b'a\nb\nc'))
+        self.assertEqual(["a","b","c"], list(DiskSource("coba/tests/.temp/test.log").read()))
+
     def test_is_picklable(self):
         pickle.dumps(DiskSource("coba/tests/.temp/test.gz"))
 
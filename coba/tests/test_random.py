@@ -1,4 +1,5 @@
 import unittest
+import unittest.mock
 import pickle
 
 from collections import Counter
@@ -230,5 +231,47 @@ class CobaRandom_Tests(unittest.TestCase):
         cr = pickle.loads(pickle.dumps(coba.random.CobaRandom(seed=5)))
         self.assertEqual(5, cr._seed)
 
+    def test_randoms_bulk_identical(self):
+        rng1 = coba.random.CobaRandom(seed=3)
+        rng2 = coba.random.CobaRandom(seed=3)
+        expected = [rng1.random(2,5) for _ in range(40000)] + [rng1.random() for _ in range(10)]
+        self.assertEqual(expected, rng2.randoms(39997,2,5) + rng2.randoms(3,2,5) + rng2.randoms(10))
+
+    def test_randoms_bulk_after_partial_block(self):
+        rng1 = coba.random.CobaRandom(seed=3)
+        rng2 = coba.random.CobaRandom(seed=3)
+        expected = [rng1.random() for _ in range(300)]
+        self.assertEqual(expected, [rng2.random() for _ in range(5)] + rng2.randoms(200) + [rng2.random() for _ in range(95)])
+
+    def test_shuffle_bulk_identical(self):
+        expected = coba.random.CobaRandom(seed=3).shuffle(range(1000))
+        with unittest.mock.patch.object(PackageChecker,'numpy',return_value=False):
+            self.assertEqual(expected, coba.random.CobaRandom(seed=3).shuffle(range(1000)))
+
+    def test_choicews(self):
+        seqs    = [[1,2,3],[4,5],[6,7,8,9]]*100
+        weights = [[.1,.2,.7],[0,1],[.25,.25,.5,0]]*100
+
+        rng1 = coba.random.CobaRandom(seed=3)
+        rng2 = coba.random.CobaRandom(seed=3)
+
+        expected = tuple(map(list,zip(*map(rng1.choicew,seqs,weights))))
+        self.assertEqual(expected, tuple(rng2.choicews(seqs,weights)))
+        self.assertEqual(expected[0][:3], coba.random.CobaRandom(seed=3).choicews(seqs[:3],weights[:3])[0])
+
+    def test_choicews_empty(self):
+        self.assertEqual(([],[]), coba.random.choicews([],[]))
+
+    def test_choicews_zero_weight(self):
+        with self.assertRaises(ValueError) as r:
+            coba.random.choicews([[1,2]]*100,[[1,0]]*99+[[0,0]])
+        self.assertEqual("The sum of weights cannot be zero.", str(r.exception))
+
+    def test_choicews_diff_len(self):
+        with self.assertRaises(ValueError):
+            coba.random.choicews([[1,2]],[[1,0],[1,0]])
+        with self.assertRaises(ValueError):
+            coba.random.choicews([[1,2]]*100,[[1]]*100)
+
 if __name__ == '__main__':
     unittest.main()
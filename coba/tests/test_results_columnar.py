@@ -0,0 +1,187 @@
+import os
+import unittest
+
+from pathlib import Path
+
+from coba.exceptions import CobaException
+from coba.results.core import Result, Table, Missing
+from coba.results.columnar import SegmentedColumn, RepeatSegment, ColumnarEncode, ColumnarSink, ColumnarSource, is_columnar
+
+class SegmentedColumn_Tests(unittest.TestCase):
+
+    def test_len(self):
+        self.assertEqual(5, len(SegmentedColumn([[1,2],[],[3,4,5]])))
+
+    def test_getitem(self):
+        col = SegmentedColumn([[1,2],[],[3,4,5]])
+        self.assertEqual([1,2,3,4,5], [col[i] for i in range(5)])
+        self.assertEqual(5, col[-1])
+        with self.assertRaises(IndexError):
+            col[5]
+
+    def test_slice(self):
+        col = SegmentedColumn([[1,2],[],[3,4,5]])
+        self.assertEqual([2,3,4], col[1:4])
+        self.assertEqual([1,2,3,4,5], col[:])
+        self.assertEqual([1,3,5], col[::2])
+        self.assertEqual([], col[3:1])
+
+    def test_iter(self):
+        self.assertEqual([1,2,3,4,5], list(SegmentedColumn([[1,2],range(3,6)])))
+
+    def test_eq(self):
+        self.assertEqual(SegmentedColumn([[1,2],[3]]), [1,2,3])
+        self.assertNotEqual(SegmentedColumn([[1,2],[3]]), [1,2])
+
+    def test_setitem(self):
+        segment = [1,2]
+        col = SegmentedColumn([segment,range(3,6)])
+        col[0] = 0
+        col[1:3] = map(col.__getitem__,[2,1])
+        self.assertEqual([0,3,2,4,5], list(col))
+        self.assertEqual([1,2], segment)
+
+    def test_extend(self):
+        col = SegmentedColumn([[1,2],RepeatSegment(3,2)])
+        col.extend([4,5])
+        self.assertEqual(6, len(col))
+        self.assertEqual([1,2,3,3,4,5], list(col))
+        self.assertEqual([3,4], col[3:5])
+
+class RepeatSegment_Tests(unittest.TestCase):
+
+    def test_simple(self):
+        seg = RepeatSegment('a',3)
+        self.assertEqual(3, len(seg))
+        self.assertEqual('a', seg[2])
+        self.assertEqual(['a','a'], seg[1:])
+        self.assertEqual(['a','a','a'], list(seg))
+        with self.assertRaises(IndexError):
+            seg[3]
+
+class Columnar_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path = Path("coba/tests/.temp/columnar.cbr")
+        if self.path.exists(): self.path.unlink()
+
+    def tearDown(self) -> None:
+        if self.path.exists(): self.path.unlink()
+
+    def _write(self, transactions):
+        ColumnarSink(self.path).write(ColumnarEncode().filter(transactions))
+
+    def test_empty(self):
+        self._write([])
+        res = ColumnarSource(self.path).read()
+        self.assertEqual(res.environments,Table(columns=['environment_id']))
+        self.assertEqual(res.learners    ,Table(columns=['learner_id']))
+        self.assertEqual(res.evaluators  ,Table(columns=['evaluator_id']))
+        self.assertEqual(res.interactions,Table(columns=['environment_id', 'learner_id', 'evaluator_id', 'index']))
+
+    def test_is_columnar(self):
+        self._write([])
+        self.assertTrue(is_columnar(self.path))
+        self.assertFalse(is_columnar("coba/tests/.temp/not_there.cbr"))
+
+    def test_params(self):
+        self._write([["T0",{'n_learners':1}],["T1",0,{'a':1,'c':[1]}],["T2",0,{'b':2}],["T3",0,{'c':3}]])
+        res = ColumnarSource(self.path).read()
+        self.assertEqual({'n_learners':1}, res.experiment)
+        self.assertEqual(res.environments,Table(columns=['environment_id','a','c']).insert([[0,1,(1,)]]))
+        self.assertEqual(res.learners    ,Table(columns=['learner_id','b']).insert([[0,2]]))
+        self.assertEqual(res.evaluators  ,Table(columns=['evaluator_id','c']).insert([[0,3]]))
+
+    def test_interaction_rows(self):
+        self._write([["T4",(0,1,0),[{'reward':1.5,'action':[1,2]},{'reward':2,'action':[3,4]}]]])
+        res = ColumnarSource(self.path).read()
+        self.assertEqual(('environment_id','learner_id','evaluator_id','index','action','reward'), res.interactions.columns)
+        self.assertEqual([(0,1,0,1,(1,2),1.5),(0,1,0,2,(3,4),2)], list(res.interactions))
+
+    def test_interaction_columns(self):
+        self._write([["T4",(0,1,0),{'reward':[1,2],'flag':[True,False],'name':['a',None]}]])
+        res = ColumnarSource(self.path).read()
+        self.assertEqual([1,2], list(res.interactions['reward']))
+        self.assertIsInstance(res.interactions['reward'][0], int)
+        self.assertEqual([True,False], list(res.interactions['flag']))
+        self.assertEqual(['a',None], list(res.interactions['name']))
+
+    def test_interactions_sorted_and_padded(self):
+        self._write([
+            ["T4",(1,0,0),[{'reward':3},{'reward':4}]],
+            ["T4",(0,0,0),[{'reward':1,'other':5}]],
+            ["T4",(0,1,0),[]],
+        ])
+        res = ColumnarSource(self.path).read()
+        expected = [(0,0,0,1,5,1),(1,0,0,1,Missing,3),(1,0,0,2,Missing,4)]
+        self.assertEqual(expected, list(res.interactions))
+        self.assertEqual([(1,0,0,2,Missing,4)], list(res.interactions.where(index=2)))
+
+    def test_interactions_index(self):
+        self._write([
+            ["T4",(0,0,0),[{'reward':1},{'reward':2}]],
+            ["T4",(0,1,0),[{'reward':3}]],
+        ])
+        res = ColumnarSource(self.path).read()
+        res.interactions.index('learner_id','index')
+        self.assertEqual(('learner_id','index'), res.interactions.indexes)
+        self.assertEqual([(0,0,0,1,1),(0,0,0,2,2),(0,1,0,1,3)], list(res.interactions))
+        self.assertEqual([(0,0,0,2,2)], list(res.interactions.where(index=2)))
+
+    def test_interactions_insert(self):
+        self._write([["T4",(0,0,0),[{'reward':1},{'reward':2}]]])
+        res = ColumnarSource(self.path).read()
+        res.interactions.insert([{'environment_id':1,'learner_id':0,'evaluator_id':0,'index':1,'reward':3,'other':4}])
+        expected = [(0,0,0,1,1,Missing),(0,0,0,2,2,Missing),(1,0,0,1,3,4)]
+        self.assertEqual(expected, list(res.interactions))
+
+    def test_interactions_groupby(self):
+        self._write([
+            ["T4",(0,0,0),[{'reward':1},{'reward':2}]],
+            ["T4",(1,0,0),[{'reward':3}]],
+        ])
+        res = ColumnarSource(self.path).read()
+        groups = list(res.interactions.groupby(1,'reward'))
+        self.assertEqual([((0,),[1,2]),((1,),[3])], groups)
+
+    def test_matches_transactions(self):
+        transactions = [
+            ["T0",{'n_learners':1}],
+            ["T1",0,{'a':1}],
+            ["T2",0,{'b':2}],
+            ["T3",0,{'c':3}],
+            ["T4",(0,0,0),[{'reward':.5,'action':[1,0]},{'reward':1,'action':[0,1]}]]
+        ]
+        self._write(transactions)
+        from coba.results.core import TransactionEncode, TransactionDecode, TransactionResult
+        expected = TransactionResult().filter(TransactionDecode().filter(TransactionEncode(None).filter(transactions)))
+        actual   = Result.from_file(str(self.path))
+        self.assertEqual(expected, actual)
+
+    def test_torn_record_dropped_and_truncated(self):
+        self._write([["T4",(0,0,0),[{'reward':1}]]])
+        size = os.path.getsize(self.path)
+        self._write([["T4",(1,0,0),[{'reward':2}]]])
+
+        with open(self.path,'r+b') as f: f.truncate(os.path.getsize(self.path)-3)
+        self.assertEqual([1], list(ColumnarSource(self.path).read().interactions['reward']))
+
+        self._write([])
+        self.assertEqual(size, os.path.getsize(self.path))
+
+    def test_corrupt_last_record_dropped(self):
+        self._write([["T4",(0,0,0),[{'reward':1}]],["T4",(1,0,0),[{'reward':2}]]])
+        with open(self.path,'r+b') as f:
+            f.seek(-1,2)
+            f.write(b'x')
+        self.assertEqual([1], list(ColumnarSource(self.path).read().interactions['reward']))
+
+    def test_not_columnar(self):
+        self.path.write_text('["version",4]')
+        with self.assertRaises(CobaException):
+            self._write([])
+        with self.assertRaises(CobaException):
+            ColumnarSource(self.path).read()
+
+if __name__ == '__main__':
+    unittest.main()
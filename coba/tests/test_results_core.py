@@ -1,15 +1,18 @@
+import sys
 import unittest
 import unittest.mock
 
+from pathlib import Path
+
 from statistics import mean
 
 from coba.utilities import PackageChecker
 from coba.pipes import ListSink
-from coba.context import CobaContext, IndentLogger, BasicLogger
+from coba.context import CobaContext, IndentLogger, BasicLogger, NullLogger
 from coba.exceptions import CobaException, CobaExit
 
-from coba.results.core import TransactionEncode,TransactionDecode,TransactionResult
-from coba.results.core import Result, Table, View, Missing
+from coba.results.core import TransactionEncode,TransactionDecode,TransactionRangeDecode,TransactionResult
+from coba.results.core import Result, LazyResult, Table, View, Missing
 from coba.results.core import MatplotPlotter, Points
 from coba.results.core import moving_average
 from coba.results.errors import BootstrapCI
@@ -141,6 +144,9 @@ class TransactionEncode_Tests(unittest.TestCase):
     def test_interactions(self):
         self.assertEqual(list(TransactionEncode(None).filter([['T4',[1,0],[{"R1":3},{"R1":4}]]])),['["version",4]',r'["I",[1,0],{"_packed":{"R1":[3,4]}}]'])
 
+    def test_interaction_columns(self):
+        self.assertEqual(list(TransactionEncode(None).filter([['T4',[1,0],{"R2":[5,6],"R1":[3,4]}]])),['["version",4]',r'["I",[1,0],{"_packed":{"R1":[3,4],"R2":[5,6]}}]'])
+
     def test_interaction_uneven_dictionaries(self):
         self.assertEqual(list(TransactionEncode(None).filter([['T4',[1,0],[{"R1":3},{"R2":4}]]])),['["version",4]',r'["I",[1,0],{"_packed":{"R1":[3,null],"R2":[null,4]}}]'])
 
@@ -151,6 +157,45 @@ class TransactionDecode_Tests(unittest.TestCase):
     def test_one_row(self):
         self.assertEqual(list(TransactionDecode().filter(['["version",4]','{"a":1}'])), [["version",4],{"a":1}])
 
+class TransactionRangeDecode_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path = Path("coba/tests/.temp/range.log")
+        self.path.write_text('["version",4]\n["E",0,{"a":1}]\n\n["I",[0,1,0],{"_packed":{"action":[[1,2]],"reward":[1]}}]\n')
+
+    def tearDown(self) -> None:
+        if self.path.exists(): self.path.unlink()
+
+    def test_ranges(self):
+        ranges = TransactionRangeDecode.ranges(str(self.path),3)
+        self.assertEqual(0, ranges[0][1])
+        self.assertEqual(self.path.stat().st_size, ranges[-1][2])
+        self.assertEqual([r[2] for r in ranges[:-1]], [r[1] for r in ranges[1:]])
+        self.assertEqual(list(range(len(ranges))), [r[0] for r in ranges])
+
+    def test_ranges_more_than_lines(self):
+        ranges = TransactionRangeDecode.ranges(str(self.path),100)
+        self.assertLessEqual(len(ranges),4)
+        self.assertEqual(self.path.stat().st_size, ranges[-1][2])
+
+    def test_filter(self):
+        decoded = [ trx for r in TransactionRangeDecode.ranges(str(self.path),3) for trx in TransactionRangeDecode(str(self.path)).filter(r)[1] ]
+        expected = [["version",4],["E",0,{"a":1}],["I",[0,1,0],{"_packed":{"action":[(1,2)],"reward":[1]}}]]
+        self.assertEqual(expected, decoded)
+
+    def test_ordered(self):
+        arrived = []
+        def blocks():
+            for block in [(1,['b']),(0,['a']),(3,['d']),(2,['c'])]:
+                arrived.append(block[0])
+                yield block
+
+        ordered = TransactionRangeDecode.ordered(blocks())
+        self.assertEqual(['a'], next(ordered))
+        self.assertEqual([1,0], arrived)
+        self.assertEqual(['b'], next(ordered))
+        self.assertEqual([['c'],['d']], list(ordered))
+
 class View_Tests(unittest.TestCase):
 
     def test_listview(self):
@@ -523,6 +568,48 @@ class Table_Tests(unittest.TestCase):
         ])
         pandas.testing.assert_frame_equal(expected_df,table.where(a='A').to_pandas())
 
+    def test_index_mixed_str_column(self):
+        table = Table(columns=['a','b']).insert([('b',2),('a',1),('b',1),('a',2)]).index('a','b')
+        self.assertEqual(list(table), [('a',1),('a',2),('b',1),('b',2)])
+
+    def test_index_missing_column_values(self):
+        table = Table(columns=['a','b']).insert([{'a':2,'b':1},{'a':1}]).index('a')
+        self.assertEqual(list(table), [(1,Missing),(2,1)])
+
+    def test_where_float_column(self):
+        table = Table(columns=['a']).insert([[1.5],[2],[.5],[3.5]])
+        self.assertEqual(list(table.where(a={'>':1})['a']), [1.5,2,3.5])
+        self.assertEqual(list(table.where(a=[2,.5])['a']), [2,.5])
+        self.assertEqual(list(table.where(comparison='!in',a=[2,.5])['a']), [1.5,3.5])
+
+    def test_where_numeric_column_str_arg(self):
+        table = Table(columns=['a']).insert([[1],[2]])
+        self.assertEqual(list(table.where(a='1')['a']), [])
+
+    def test_random_matches_sans_numpy(self):
+        from random import Random
+        rng  = Random(1)
+        rows = [(rng.randint(0,5),rng.choice('abc'),rng.random()) for _ in range(300)]
+
+        def run():
+            table = Table(columns=['a','b','c']).insert(rows).index('a','b','c')
+            return list(table), list(table.groupby(2,'count')), list(table.where(c={'<':.5})), list(table.where(a=[1,3]))
+
+        with unittest.mock.patch('coba.utilities.PackageChecker.numpy', return_value=False):
+            expected = run()
+
+        self.assertEqual(expected, run())
+
+@unittest.skipUnless(PackageChecker.numpy(strict=False), "numpy is not installed so the tests above already run without it.")
+class Table_Sans_Numpy_Tests(Table_Tests):
+    """Run all Table tests using the pure python implementation."""
+
+    def setUp(self) -> None:
+        #a None entry in sys.modules makes any unguarded import of numpy fail
+        for patcher in [unittest.mock.patch('coba.utilities.PackageChecker.numpy', return_value=False), unittest.mock.patch.dict(sys.modules, {'numpy':None})]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
 @unittest.skipUnless(PackageChecker.matplotlib(strict=False), "this test requires matplotlib")
 class MatplotPlotter_Tests(unittest.TestCase):
 
@@ -1502,6 +1589,18 @@ class Result_Tests(unittest.TestCase):
         self.assertEqual(1, len(filtered_result.evaluators))
         self.assertEqual(1, len(filtered_result.interactions))
 
+    def test_filter_env_without_numpy(self):
+        envs = [['environment_id'],[1],[2]]
+        lrns = [['learner_id'    ],[1],[2]]
+        vals = [['evaluator_id'  ],[1],[2]]
+        ints = [['environment_id','learner_id','evaluator_id'],[1,1,1],[2,1,1],[1,2,1]]
+
+        with unittest.mock.patch.dict(sys.modules, {'numpy':None}):
+            filtered_result = Result(envs, lrns, vals, ints).filter_env(environment_id=2)
+
+        self.assertEqual([(2,)], list(filtered_result.environments))
+        self.assertEqual([(2,1,1)], list(filtered_result.interactions))
+
     def test_filter_env_no_change(self):
 
         envs = [['environment_id'],[1],[2]]
@@ -3155,6 +3254,85 @@ class Result_Tests(unittest.TestCase):
         self.assertAlmostEqual(l,0.34996429,delta=.001)
         self.assertAlmostEqual(h,0.34996429,delta=.001)
 
+class Result_FromFile_Tests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path = Path("coba/tests/.temp/lazy.log")
+        transactions = [
+            ["T0",{'n_learners':2}],
+            ["T1",0,{'source':'a'}],
+            ["T1",1,{'source':'b'}],
+            ["T2",0,{'family':'x'}],
+            ["T2",1,{'family':'y'}],
+            ["T3",0,{'eval':'p'}],
+            ["T4",(0,0,0),[{'reward':1},{'reward':2}]],
+            ["T4",(0,1,0),[{'reward':3},{'reward':4}]],
+            ["T4",(1,0,0),[{'reward':5,'action':[1,2]}]],
+            ["T4",(1,1,0),[{'reward':6}]],
+            ["T4",(1,1,1),[]],
+        ]
+        self.path.write_text("\n".join(TransactionEncode(None).filter(transactions)))
+
+    def tearDown(self) -> None:
+        if self.path.exists(): self.path.unlink()
+
+    def assertSameResult(self, expected: Result, actual: Result):
+        #lazy results never see columns that only exist for interactions which were filtered out
+        strip = lambda table: [ {k:v for k,v in row.items() if v is not Missing} for row in table.to_dicts() ]
+        for table in ['environments','learners','evaluators','interactions']:
+            self.assertEqual(strip(getattr(expected,table)), strip(getattr(actual,table)))
+
+    def test_matches_eager(self):
+        eager = Result.from_file(str(self.path))
+        lazy  = Result.from_file(str(self.path),lazy=True)
+        self.assertIsInstance(lazy, LazyResult)
+        self.assertSameResult(eager, lazy)
+        self.assertEqual(eager.experiment, lazy.experiment)
+
+    def test_filter_lrn(self):
+        eager = Result.from_file(str(self.path)).filter_lrn(family='y')
+        lazy  = Result.from_file(str(self.path),lazy=True).filter_lrn(family='y')
+        self.assertSameResult(eager, lazy)
+
+    def test_filter_env_then_val(self):
+        eager = Result.from_file(str(self.path)).filter_env(source='b').filter_val(eval='p')
+        lazy  = Result.from_file(str(self.path),lazy=True).filter_env(source='b').filter_val(eval='p')
+        self.assertSameResult(eager, lazy)
+
+    def test_where(self):
+        eager = Result.from_file(str(self.path)).where(family='x')
+        lazy  = Result.from_file(str(self.path),lazy=True).where(family='x')
+        self.assertSameResult(eager, lazy)
+
+    def test_filter_none(self):
+        CobaContext.logger = NullLogger()
+        lazy = Result.from_file(str(self.path),lazy=True).filter_lrn(family='z')
+        self.assertEqual(0, len(lazy.learners))
+        self.assertEqual(0, len(lazy.environments))
+        self.assertEqual(0, len(lazy.interactions))
+
+    def test_filtered_interactions_not_decoded(self):
+        lines = self.path.read_text().split("\n")
+        lines = [ line[:-5]+"#" if line.startswith('["I",[0,0,0]') else line for line in lines ]
+        self.path.write_text("\n".join(lines))
+
+        lazy = Result.from_file(str(self.path),lazy=True).filter_lrn(learner_id=1)
+        self.assertEqual([(0,1,0,1,3),(0,1,0,2,4),(1,1,0,1,6)], list(lazy.interactions))
+
+    def test_filter_after_load(self):
+        lazy = Result.from_file(str(self.path),lazy=True)
+        self.assertEqual(6, len(lazy.interactions))
+        self.assertEqual(4, len(lazy.filter_env(source='a').interactions))
+
+    def test_str(self):
+        self.assertEqual("{'Learners': 2, 'Environments': 2, 'Interactions': 6}", str(Result.from_file(str(self.path),lazy=True)))
+
+    def test_processes(self):
+        eager    = Result.from_file(str(self.path))
+        parallel = Result.from_file(str(self.path),processes=2)
+        self.assertSameResult(eager, parallel)
+        self.assertEqual(eager.experiment, parallel.experiment)
+
 class moving_average_Tests(unittest.TestCase):
 
     def test_weights(self):
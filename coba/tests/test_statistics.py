@@ -3,7 +3,7 @@ import unittest
 from math import isnan
 
 from coba.statistics import mean, stdev, var, iqr, percentile, phi
-from coba.statistics import OnlineVariance, OnlineMean
+from coba.statistics import OnlineVariance, OnlineMean, OnlineQuantile
 
 class iqr_Tests(unittest.TestCase):
     def test_simple_exclusive(self):
@@ -101,6 +101,12 @@ class OnlineVariance_Tests(unittest.TestCase):
             online.update(number)
         self.assertAlmostEqual(online.variance, var(test_set))
 
+    def test_mean(self):
+        online = OnlineVariance()
+        self.assertTrue(isnan(online.mean))
+        for number in [1,2,6]: online.update(number)
+        self.assertAlmostEqual(3, online.mean)
+
     def test_100_floats_update_variance(self):
         test_set = [ i/3 for i in range(0,100) ]
         online = OnlineVariance()
@@ -108,6 +114,31 @@ class OnlineVariance_Tests(unittest.TestCase):
             online.update(number)
         self.assertAlmostEqual(online.variance, var(test_set), places=12)
 
+class OnlineQuantile_Tests(unittest.TestCase):
+    def test_no_updates_quantile_nan(self):
+        self.assertTrue(isnan(OnlineQuantile(.5).quantile))
+
+    def test_few_updates_exact(self):
+        online = OnlineQuantile(.25)
+        for number in [4,1,8,2]: online.update(number)
+        self.assertEqual(percentile([4,1,8,2],.25), online.quantile)
+
+    def test_many_updates_estimate(self):
+        test_set = [ (i*7919) % 1000 for i in range(1000) ]
+        for q in [.1,.5,.9]:
+            online = OnlineQuantile(q)
+            for number in test_set: online.update(number)
+            self.assertAlmostEqual(percentile(test_set,q), online.quantile, delta=10)
+
+    def test_updates_outside_range(self):
+        online = OnlineQuantile(.5)
+        for number in [1,2,3,4,5,-10,100,3]: online.update(number)
+        self.assertTrue(1 <= online.quantile <= 5)
+
+    def test_bad_quantile(self):
+        with self.assertRaises(AssertionError):
+            OnlineQuantile(2)
+
 class OnlineMean_Tests(unittest.TestCase):
     def test_no_updates_variance_nan(self):
         online = OnlineMean()
@@ -143,6 +174,12 @@ class OnlineMean_Tests(unittest.TestCase):
             online.update(number)
         self.assertAlmostEqual(online.mean, mean(test_set))
 
+    def test_mean(self):
+        online = OnlineVariance()
+        self.assertTrue(isnan(online.mean))
+        for number in [1,2,6]: online.update(number)
+        self.assertAlmostEqual(3, online.mean)
+
     def test_100_floats_update_variance(self):
         test_set = [ i/3 for i in range(0,100) ]
         online = OnlineMean()
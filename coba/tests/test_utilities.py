@@ -54,6 +54,14 @@ class PackageChecker_sans_package_Tests(unittest.TestCase):
         self.assertEqual(False,PackageChecker.cloudpickle("",strict=False))
         with self.assertRaises(CobaExit): PackageChecker.cloudpickle("")
 
+    def test_check_zstandard_support(self):
+        self.assertEqual(False,PackageChecker.zstandard("",strict=False))
+        with self.assertRaises(CobaExit): PackageChecker.zstandard("")
+
+    def test_check_lz4_support(self):
+        self.assertEqual(False,PackageChecker.lz4("",strict=False))
+        with self.assertRaises(CobaExit): PackageChecker.lz4("")
+
     def test_submodule_missing(self):
         with unittest.mock.patch('importlib.util.find_spec', side_effect=ModuleNotFoundError()):
             self.assertEqual(False,PackageChecker.matplotlib("",strict=False))
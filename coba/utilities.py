@@ -102,6 +102,28 @@ class PackageChecker:
         """
         return PackageChecker._check(caller_name, "cloudpickle", strict=strict)
 
+    @staticmethod
+    def zstandard(caller_name:str = None, strict:bool = True) -> None:
+        """Raise ImportError with detailed error message if zstandard is not installed.
+
+        Functionality requiring zstandard should call this helper and then lazily import.
+
+        Args:
+            caller_name: The name of the caller that requires zstandard.
+        """
+        return PackageChecker._check(caller_name, "zstandard", strict=strict)
+
+    @staticmethod
+    def lz4(caller_name:str = None, strict:bool = True) -> None:
+        """Raise ImportError with detailed error message if lz4 is not installed.
+
+        Functionality requiring lz4 should call this helper and then lazily import.
+
+        Args:
+            caller_name: The name of the caller that requires lz4.
+        """
+        return PackageChecker._check(caller_name, "lz4.frame", "lz4", strict=strict)
+
     def _check(caller_name:str, module_name:str, pkg_name:str = None, strict:bool = True):
         """
         Remarks: